@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoTemplate.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# 需在 Django 初始化後才能匯入
+from app.utils.dashboard_events import DASHBOARD_EVENTS_PATH, dashboard_events_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # 儀表板 SSE 串流由原生 ASGI 應用處理，其餘請求交給 Django
+    if scope['type'] == 'http' and scope['path'] == DASHBOARD_EVENTS_PATH:
+        await dashboard_events_app(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
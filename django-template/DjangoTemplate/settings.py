@@ -272,6 +272,38 @@ if DEBUG:
 DATA_UPLOAD_MAX_MEMORY_SIZE = None
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880
 
+# 處理中鎖定列超過此秒數視為殘留（worker 中途終止），可由新請求接手
+UPLOAD_IN_FLIGHT_STALE_SECONDS = 600
+
+# 儀表板統計快取秒數（資料異動時會因版本號改變而自動失效）
+DASHBOARD_STATS_CACHE_TIMEOUT = 3600
+# 儀表板 SSE 串流（ASGI）檢查資料版本的間隔與心跳秒數
+DASHBOARD_EVENTS_POLL_SECONDS = 2
+DASHBOARD_EVENTS_HEARTBEAT_SECONDS = 15
+
+# 變更摘要只回傳早於「目前時間減去此秒數」的異動，讓進行中的交易有時間提交
+CHANGE_FEED_SETTLE_SECONDS = 5
+# 刪除記錄的墓碑保留天數；同步進度早於此期限的游標需重新完整同步
+CHANGE_FEED_TOMBSTONE_RETENTION_DAYS = 30
+
+# 用戶活動記錄由背景執行緒批次寫入；測試時設為 True 改為呼叫時立即寫入
+ACTIVITY_LOG_SYNC = env.bool('ACTIVITY_LOG_SYNC', default=False)
+ACTIVITY_LOG_BUFFER = {
+    'QUEUE_SIZE': 10000,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,
+}
+
+# 上傳准入控制（名額與佇列存於資料庫，所有 worker 共用）
+UPLOAD_ADMISSION = {
+    'GLOBAL_LIMIT': 2,      # 同時處理的上傳數量上限
+    'PER_USER_LIMIT': 1,    # 每位使用者同時處理的上傳數量上限
+    'QUEUE_SIZE': 4,        # 等待佇列長度上限，超過時回傳 429
+    'QUEUE_TIMEOUT': 30,    # 排隊票證未輪詢時保留的秒數
+    'QUEUE_POLL': 2,        # 排隊中 429 回應的 Retry-After 秒數（輪詢間隔）
+    'RETRY_AFTER': 15,      # 佇列已滿時 429 回應的 Retry-After 秒數
+}
+
 SIMPLEUI_CONFIG = {
     'system_keep': False,  # 隱藏系統預設，使用自定義分類
     'language': 'zh-hans',  # 設定語言為中文，避免載入英文語言檔案
@@ -393,12 +425,24 @@ CORS_ORIGIN_WHITELIST = [
 
 LOGIN_URL = '/'
 
+# 預設快取必須由所有 worker 共用：資料版本號（app/utils/data_version.py）存放在預設快取，
+# 若使用行程內的 LocMemCache，各 worker 的版本號各自獨立，儀表板快取不會失效、ETag 也會不一致。
+# 可用 CACHE_URL 指定共用快取（例如 redis://127.0.0.1:6379/1 或 dbcache://django_cache）
 USES_S3 = os.getenv('STORAGE') == 's3'
 if USES_S3:
     STATIC_URL = ""
     STATICFILES_STORAGE = 'app.storages.StaticStorage'
     AWS_STORAGE_BUCKET_NAME = 's3.bucket.name'
+    # 多台主機部署時暫存目錄不共用，預設使用資料庫快取（部署時需執行 python manage.py createcachetable）
+    CACHES = {
+        'default': env.cache('CACHE_URL', default='dbcache://django_cache')
+    }
+elif env('CACHE_URL', default=None):
+    CACHES = {
+        'default': env.cache('CACHE_URL')
+    }
 else:
+    # 單一主機：同一暫存目錄由該主機的所有 worker 共用
     CACHES = {
         'default': {
             'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
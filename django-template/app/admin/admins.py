@@ -14,6 +14,7 @@ import json
 from app.models import AdminUser, User, GreenBeanInboundRecord, RawMaterialWarehouseRecord, RawMaterialMonthlySummary, FileUploadRecord, UploadRecordRelation
 from app.utils.activity_logger import log_user_activity
 from app.utils.green_bean_utils import get_green_bean_names
+from app.utils.search import search_green_bean_records, search_raw_material_records
 
 
 class GreenBeanInboundRecordForm(forms.ModelForm):
@@ -154,6 +155,13 @@ class GreenBeanInboundRecordAdmin(admin.ModelAdmin):
     ]
     readonly_fields = ['id', 'created_at', 'updated_at']
     date_hierarchy = 'record_time'
+
+    def get_search_results(self, request, queryset, search_term):
+        """以 FULLTEXT 索引搜尋，多個關鍵字須全部符合"""
+        for term in search_term.split():
+            queryset = search_green_bean_records(queryset, term)
+        return queryset, False
+
     def has_module_permission(self, request):
         perms = [
             'app.view_greenbeaninboundrecord', 'app.add_greenbeaninboundrecord', 'app.change_greenbeaninboundrecord', 'app.delete_greenbeaninboundrecord'
@@ -501,6 +509,12 @@ class RawMaterialWarehouseRecordAdmin(admin.ModelAdmin):
     ]
     readonly_fields = ['id', 'created_at', 'updated_at', 'get_dynamic_fields_formatted']
     date_hierarchy = 'record_date'
+
+    def get_search_results(self, request, queryset, search_term):
+        """以 FULLTEXT 索引搜尋，多個關鍵字須全部符合"""
+        for term in search_term.split():
+            queryset = search_raw_material_records(queryset, term)
+        return queryset, False
     
     def get_dynamic_fields_display(self, obj):
         """在列表中顯示動態欄位的摘要"""
@@ -647,10 +661,10 @@ class RawMaterialMonthlySummaryAdmin(admin.ModelAdmin):
     list_display = [
         'year', 'month', 'total_inventory_value',
         'total_incoming_stock', 'total_outgoing_stock',
-        'total_current_inventory'
+        'total_current_inventory', 'record_count'
     ]
     list_filter = ['year', 'month']
-    readonly_fields = ['id', 'created_at', 'updated_at']
+    readonly_fields = ['id', 'record_count', 'inventory_count', 'created_at', 'updated_at']
     def has_module_permission(self, request):
         perms = [
             'app.view_rawmaterialmonthlysummary', 'app.add_rawmaterialmonthlysummary', 'app.change_rawmaterialmonthlysummary', 'app.delete_rawmaterialmonthlysummary'
@@ -676,7 +690,8 @@ class RawMaterialMonthlySummaryAdmin(admin.ModelAdmin):
         ('統計資訊', {
             'fields': (
                 'total_inventory_value', 'total_incoming_stock',
-                'total_outgoing_stock', 'total_current_inventory'
+                'total_outgoing_stock', 'total_current_inventory',
+                'record_count', 'inventory_count'
             )
         }),
         ('系統資訊', {
@@ -689,10 +704,18 @@ class RawMaterialMonthlySummaryAdmin(admin.ModelAdmin):
 @admin.register(FileUploadRecord)
 class FileUploadRecordAdmin(admin.ModelAdmin):
     """檔案上傳記錄管理"""
-    list_display = ['file_name', 'file_type', 'upload_time', 'uploaded_by', 'records_count', 'status', 'get_related_records_count']
+    list_display = [
+        'file_name', 'file_type', 'upload_time', 'uploaded_by', 'records_count',
+        'get_record_time_range', 'total_measured_weight_kg', 'abnormal_count', 'rejected_rows',
+        'status', 'get_related_records_count'
+    ]
     list_filter = ['file_type', 'status', 'upload_time']
     search_fields = ['file_name', 'file_hash']
-    readonly_fields = ['id', 'file_hash', 'upload_time', 'file_size', 'get_related_records_count']
+    readonly_fields = [
+        'id', 'file_hash', 'upload_time', 'file_size', 'get_related_records_count',
+        'record_time_min', 'record_time_max', 'total_measured_weight_kg',
+        'abnormal_count', 'distinct_item_count', 'rejected_rows'
+    ]
     ordering = ['-upload_time']
     actions = ['delete_with_related_records']
     def has_module_permission(self, request):
@@ -716,6 +739,17 @@ class FileUploadRecordAdmin(admin.ModelAdmin):
     get_related_records_count.short_description = '關聯記錄'
     get_related_records_count.admin_order_field = 'id'
     
+    def get_record_time_range(self, obj):
+        """顯示上傳資料的記錄時間範圍（匯入時計算）"""
+        if not obj.record_time_min:
+            return '-'
+        start = obj.record_time_min.strftime('%Y-%m-%d')
+        end = obj.record_time_max.strftime('%Y-%m-%d') if obj.record_time_max else start
+        return start if start == end else f'{start} ~ {end}'
+    
+    get_record_time_range.short_description = '記錄時間範圍'
+    get_record_time_range.admin_order_field = 'record_time_min'
+    
     def delete_with_related_records(self, request, queryset):
         """批量刪除上傳記錄及其相關資料"""
         from django.db import transaction
@@ -953,6 +987,12 @@ class FileUploadRecordAdmin(admin.ModelAdmin):
         ('上傳資訊', {
             'fields': ('upload_time', 'uploaded_by', 'records_count', 'get_related_records_count')
         }),
+        ('上傳統計', {
+            'fields': (
+                'record_time_min', 'record_time_max', 'total_measured_weight_kg',
+                'abnormal_count', 'distinct_item_count', 'rejected_rows'
+            )
+        }),
         ('處理狀態', {
             'fields': ('status', 'error_message')
         }),
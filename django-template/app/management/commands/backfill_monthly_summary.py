@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from app.utils.rollups import backfill_raw_material_monthly_summary
+
+
+class Command(BaseCommand):
+    help = '由原料倉記錄回填原料月度統計'
+
+    def handle(self, *args, **options):
+        self.stdout.write('回填原料月度統計...')
+        count = backfill_raw_material_monthly_summary()
+        self.stdout.write(self.style.SUCCESS(f'原料月度統計已回填，共 {count} 個月份'))
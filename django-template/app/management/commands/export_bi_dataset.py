@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.utils.bi_export import DEFAULT_BATCH_SIZE, EXPORT_FORMATS, export_bi_dataset
+
+
+class Command(BaseCommand):
+    help = '匯出生豆入庫與原料倉資料集（Parquet 或 Arrow IPC）供 BI 使用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='輸出目錄')
+        parser.add_argument(
+            '--format',
+            choices=list(EXPORT_FORMATS),
+            default='parquet',
+            help='輸出格式（預設 parquet）',
+        )
+        parser.add_argument(
+            '--table',
+            choices=['green_bean', 'raw_material', 'all'],
+            default='all',
+            help='要匯出的資料表（預設全部）',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'每批讀取的筆數（預設 {DEFAULT_BATCH_SIZE}）',
+        )
+
+    def handle(self, *args, **options):
+        table = options['table']
+        tables = ('green_bean', 'raw_material') if table == 'all' else (table,)
+
+        try:
+            results = export_bi_dataset(
+                options['output_dir'],
+                export_format=options['format'],
+                tables=tables,
+                batch_size=options['batch_size'],
+            )
+        except ImportError:
+            raise CommandError('需要安裝 pyarrow 才能匯出 BI 資料集')
+
+        for path, count in results.items():
+            self.stdout.write(self.style.SUCCESS(f'{path}: {count} 筆'))
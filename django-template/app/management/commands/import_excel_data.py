@@ -6,6 +6,7 @@ from datetime import datetime
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from app.models.models import GreenBeanInboundRecord, RawMaterialWarehouseRecord, RawMaterialMonthlySummary
+from app.utils.rollups import rollup_batch
 
 
 class Command(BaseCommand):
@@ -60,7 +61,7 @@ class Command(BaseCommand):
             df = pd.read_excel(file_path)
             self.stdout.write(f'找到 {len(df)} 筆記錄')
 
-            with transaction.atomic():
+            with transaction.atomic(), rollup_batch():
                 records_created = 0
                 for index, row in df.iterrows():
                     try:
@@ -132,7 +133,7 @@ class Command(BaseCommand):
 
             self.stdout.write(f'找到 {len(valid_rows)} 筆有效記錄')
 
-            with transaction.atomic():
+            with transaction.atomic(), rollup_batch():
                 records_created = 0
                 for index, row in valid_rows:
                     try:
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from app.utils.rollups import rebuild_green_bean_daily_rollups, rebuild_raw_material_daily_rollups
+
+
+class Command(BaseCommand):
+    help = '由生豆入庫與原料倉記錄重新產生每日彙總表'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--table',
+            choices=['green_bean', 'raw_material', 'all'],
+            default='all',
+            help='要重建的彙總表（預設全部）',
+        )
+
+    def handle(self, *args, **options):
+        table = options['table']
+
+        if table in ('green_bean', 'all'):
+            self.stdout.write('重建生豆入庫每日彙總...')
+            count = rebuild_green_bean_daily_rollups()
+            self.stdout.write(self.style.SUCCESS(f'生豆入庫每日彙總已重建，共 {count} 筆'))
+
+        if table in ('raw_material', 'all'):
+            self.stdout.write('重建原料倉每日彙總...')
+            count = rebuild_raw_material_daily_rollups()
+            self.stdout.write(self.style.SUCCESS(f'原料倉每日彙總已重建，共 {count} 筆'))
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.7 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_fix_initial_migration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileuploadrecord',
+            name='record_time_min',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='最早記錄時間'),
+        ),
+        migrations.AddField(
+            model_name='fileuploadrecord',
+            name='record_time_max',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='最晚記錄時間'),
+        ),
+        migrations.AddField(
+            model_name='fileuploadrecord',
+            name='total_measured_weight_kg',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True, verbose_name='量測重量合計(kg)'),
+        ),
+        migrations.AddField(
+            model_name='fileuploadrecord',
+            name='abnormal_count',
+            field=models.IntegerField(default=0, verbose_name='異常記錄數'),
+        ),
+        migrations.AddField(
+            model_name='fileuploadrecord',
+            name='distinct_item_count',
+            field=models.IntegerField(default=0, verbose_name='不重複品項數'),
+        ),
+        migrations.AddField(
+            model_name='fileuploadrecord',
+            name='rejected_rows',
+            field=models.IntegerField(default=0, verbose_name='略過列數'),
+        ),
+    ]
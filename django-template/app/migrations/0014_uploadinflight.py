@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-19 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0013_fileuploadrecord_upload_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadInFlight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_hash', models.CharField(max_length=64, unique=True, verbose_name='檔案雜湊值')),
+                ('file_type', models.CharField(max_length=50, verbose_name='檔案類型')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, verbose_name='處理識別碼')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='開始時間')),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='上傳者')),
+            ],
+            options={
+                'verbose_name': '處理中的上傳',
+                'verbose_name_plural': '處理中的上傳',
+                'db_table': 'app_upload_in_flight',
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.1.7 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_uploadinflight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GreenBeanDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(blank=True, db_index=True, null=True, verbose_name='日期')),
+                ('green_bean_name', models.CharField(blank=True, default='', max_length=100, verbose_name='生豆名稱')),
+                ('green_bean_storage_silo', models.CharField(blank=True, default='', max_length=50, verbose_name='生豆入庫筒倉')),
+                ('record_count', models.IntegerField(default=0, verbose_name='記錄數')),
+                ('weighed_count', models.IntegerField(default=0, verbose_name='有量測重量記錄數')),
+                ('total_measured_weight_kg', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='量測重量合計(kg)')),
+                ('abnormal_count', models.IntegerField(default=0, verbose_name='異常記錄數')),
+            ],
+            options={
+                'verbose_name': '生豆入庫每日彙總',
+                'verbose_name_plural': '生豆入庫每日彙總',
+                'db_table': 'app_green_bean_daily_rollup',
+                'ordering': ['-day'],
+                'unique_together': {('day', 'green_bean_name', 'green_bean_storage_silo')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RawMaterialDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, verbose_name='日期')),
+                ('product_code', models.CharField(blank=True, default='', max_length=50, verbose_name='品號')),
+                ('product_name', models.CharField(blank=True, default='', max_length=100, verbose_name='品名')),
+                ('record_count', models.IntegerField(default=0, verbose_name='記錄數')),
+                ('inventory_count', models.IntegerField(default=0, verbose_name='有庫存數量記錄數')),
+                ('total_incoming_stock', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='進貨合計')),
+                ('total_outgoing_stock', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='領用合計')),
+                ('total_current_inventory', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='當前庫存合計')),
+            ],
+            options={
+                'verbose_name': '原料倉每日彙總',
+                'verbose_name_plural': '原料倉每日彙總',
+                'db_table': 'app_raw_material_daily_rollup',
+                'ordering': ['-day'],
+                'unique_together': {('day', 'product_code', 'product_name')},
+            },
+        ),
+    ]
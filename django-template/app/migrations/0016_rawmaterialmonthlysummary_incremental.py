@@ -0,0 +1,40 @@
+# Generated by Django 4.1.7 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+def remove_duplicate_months(apps, schema_editor):
+    """同一年月只保留最後更新的一筆，才能建立唯一索引"""
+    RawMaterialMonthlySummary = apps.get_model('app', 'RawMaterialMonthlySummary')
+    seen = set()
+    for summary in RawMaterialMonthlySummary.objects.order_by('year', 'month', '-updated_at'):
+        key = (summary.year, summary.month)
+        if key in seen:
+            summary.delete()
+        else:
+            seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rawmaterialmonthlysummary',
+            name='record_count',
+            field=models.IntegerField(default=0, verbose_name='記錄數'),
+        ),
+        migrations.AddField(
+            model_name='rawmaterialmonthlysummary',
+            name='inventory_count',
+            field=models.IntegerField(default=0, verbose_name='有庫存數量記錄數'),
+        ),
+        migrations.RunPython(remove_duplicate_months, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='rawmaterialmonthlysummary',
+            unique_together={('year', 'month')},
+        ),
+    ]
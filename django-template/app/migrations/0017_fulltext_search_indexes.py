@@ -0,0 +1,52 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:40
+
+from django.db import migrations
+
+
+# (資料表, 索引名稱, 欄位)，需與 app/utils/search.py 一致
+FULLTEXT_INDEXES = [
+    (
+        'app_green_bean_inbound_record',
+        'ft_green_bean_search',
+        ['green_bean_name', 'order_number', 'green_bean_code', 'green_bean_batch_number', 'ico_code'],
+    ),
+    (
+        'app_raw_material_warehouse_record',
+        'ft_raw_material_search',
+        ['product_name', 'product_code', 'factory_batch_number', 'international_batch_number'],
+    ),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    """建立 ngram FULLTEXT 索引（只有 MySQL，其他資料庫搜尋時使用 icontains）"""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    # 停用停用詞，避免含有英文停用詞的 n-gram（例如品號中的 "an"）不被索引
+    schema_editor.execute('SET SESSION innodb_ft_enable_stopword = OFF')
+    for table, index_name, columns in FULLTEXT_INDEXES:
+        column_sql = ', '.join(schema_editor.quote_name(column) for column in columns)
+        schema_editor.execute(
+            f'ALTER TABLE {schema_editor.quote_name(table)} '
+            f'ADD FULLTEXT INDEX {schema_editor.quote_name(index_name)} ({column_sql}) WITH PARSER ngram'
+        )
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, index_name, _ in FULLTEXT_INDEXES:
+        schema_editor.execute(
+            f'ALTER TABLE {schema_editor.quote_name(table)} DROP INDEX {schema_editor.quote_name(index_name)}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_rawmaterialmonthlysummary_incremental'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
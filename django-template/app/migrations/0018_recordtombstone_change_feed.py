@@ -0,0 +1,39 @@
+# Generated by Django 4.1.7 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_fulltext_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(choices=[('green_bean', '生豆入庫記錄'), ('raw_material', '原料倉記錄')], max_length=20, verbose_name='資料表')),
+                ('record_id', models.UUIDField(verbose_name='記錄 ID')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='刪除時間')),
+            ],
+            options={
+                'verbose_name': '已刪除記錄',
+                'verbose_name_plural': '已刪除記錄',
+                'db_table': 'app_record_tombstone',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recordtombstone',
+            index=models.Index(fields=['table', 'deleted_at', 'id'], name='tombstone_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='greenbeaninboundrecord',
+            index=models.Index(fields=['updated_at', 'id'], name='green_bean_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rawmaterialwarehouserecord',
+            index=models.Index(fields=['updated_at', 'id'], name='raw_material_updated_idx'),
+        ),
+    ]
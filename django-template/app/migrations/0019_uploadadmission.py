@@ -0,0 +1,46 @@
+# Generated by Django 4.1.7 on 2026-10-19 19:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0018_recordtombstone_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadAdmission',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('slot', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='全域名額')),
+                ('user_slot', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='使用者名額')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='排隊時間')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始處理時間')),
+                ('expires_at', models.DateTimeField(verbose_name='失效時間')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='上傳者')),
+            ],
+            options={
+                'verbose_name': '上傳准入',
+                'verbose_name_plural': '上傳准入',
+                'db_table': 'app_upload_admission',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='uploadadmission',
+            index=models.Index(fields=['expires_at'], name='upload_admission_expires_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='uploadadmission',
+            constraint=models.UniqueConstraint(fields=('slot',), name='upload_admission_slot_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='uploadadmission',
+            constraint=models.UniqueConstraint(fields=('user', 'user_slot'), name='upload_admission_user_slot_unique'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.7 on 2026-10-19 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_uploadadmission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadadmission',
+            name='queue_slot',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='佇列位置'),
+        ),
+        migrations.AddConstraint(
+            model_name='uploadadmission',
+            constraint=models.UniqueConstraint(fields=('queue_slot',), name='upload_admission_queue_slot_unique'),
+        ),
+    ]
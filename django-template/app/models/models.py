@@ -90,6 +90,10 @@ class GreenBeanInboundRecord(models.Model):
         verbose_name = '生豆入庫記錄'
         verbose_name_plural = '生豆入庫記錄'
         ordering = ['-record_time']
+        indexes = [
+            # 變更摘要（change feed）依 (updated_at, id) 讀取
+            models.Index(fields=['updated_at', 'id'], name='green_bean_updated_idx'),
+        ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
@@ -138,6 +142,10 @@ class RawMaterialWarehouseRecord(models.Model):
         verbose_name = '原料倉進出記錄'
         verbose_name_plural = '原料倉進出記錄'
         ordering = ['-created_at']
+        indexes = [
+            # 變更摘要（change feed）依 (updated_at, id) 讀取
+            models.Index(fields=['updated_at', 'id'], name='raw_material_updated_idx'),
+        ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
@@ -176,6 +184,7 @@ class RawMaterialMonthlySummary(models.Model):
         verbose_name = '原料月度統計'
         verbose_name_plural = '原料月度統計'
         ordering = ['-year', '-month']
+        unique_together = ['year', 'month']
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     year = models.IntegerField('年度')
@@ -186,6 +195,8 @@ class RawMaterialMonthlySummary(models.Model):
     total_incoming_stock = models.DecimalField('總進貨量', max_digits=12, decimal_places=2, null=True, blank=True)
     total_outgoing_stock = models.DecimalField('總出貨量', max_digits=12, decimal_places=2, null=True, blank=True)
     total_current_inventory = models.DecimalField('總當前庫存', max_digits=12, decimal_places=2, null=True, blank=True)
+    record_count = models.IntegerField('記錄數', default=0)
+    inventory_count = models.IntegerField('有庫存數量記錄數', default=0)
     
     created_at = models.DateTimeField('建立時間', auto_now_add=True)
     updated_at = models.DateTimeField('更新時間', auto_now=True)
@@ -194,6 +205,51 @@ class RawMaterialMonthlySummary(models.Model):
         return f"{self.year}年{self.month}月統計"
 
 
+class GreenBeanDailyRollup(models.Model):
+    """生豆入庫每日彙總（日期 × 生豆名稱 × 筒倉），由記錄異動時增量維護"""
+    class Meta:
+        db_table = 'app_green_bean_daily_rollup'
+        verbose_name = '生豆入庫每日彙總'
+        verbose_name_plural = '生豆入庫每日彙總'
+        ordering = ['-day']
+        unique_together = ['day', 'green_bean_name', 'green_bean_storage_silo']
+
+    day = models.DateField('日期', null=True, blank=True, db_index=True)  # 記錄時間的日期，無記錄時間為空
+    green_bean_name = models.CharField('生豆名稱', max_length=100, blank=True, default='')
+    green_bean_storage_silo = models.CharField('生豆入庫筒倉', max_length=50, blank=True, default='')
+
+    record_count = models.IntegerField('記錄數', default=0)
+    weighed_count = models.IntegerField('有量測重量記錄數', default=0)
+    total_measured_weight_kg = models.DecimalField('量測重量合計(kg)', max_digits=14, decimal_places=2, default=0)
+    abnormal_count = models.IntegerField('異常記錄數', default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.green_bean_name} {self.green_bean_storage_silo}"
+
+
+class RawMaterialDailyRollup(models.Model):
+    """原料倉每日彙總（日期 × 品項），由記錄異動時增量維護"""
+    class Meta:
+        db_table = 'app_raw_material_daily_rollup'
+        verbose_name = '原料倉每日彙總'
+        verbose_name_plural = '原料倉每日彙總'
+        ordering = ['-day']
+        unique_together = ['day', 'product_code', 'product_name']
+
+    day = models.DateField('日期', db_index=True)  # 記錄日期，無記錄日期時為建立日期
+    product_code = models.CharField('品號', max_length=50, blank=True, default='')
+    product_name = models.CharField('品名', max_length=100, blank=True, default='')
+
+    record_count = models.IntegerField('記錄數', default=0)
+    inventory_count = models.IntegerField('有庫存數量記錄數', default=0)
+    total_incoming_stock = models.DecimalField('進貨合計', max_digits=14, decimal_places=2, default=0)
+    total_outgoing_stock = models.DecimalField('領用合計', max_digits=14, decimal_places=2, default=0)
+    total_current_inventory = models.DecimalField('當前庫存合計', max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.product_code} {self.product_name}"
+
+
 # 檔案上傳記錄模型
 class FileUploadRecordQuerySet(models.QuerySet):
     """自定義查詢集，支援批量刪除相關記錄"""
@@ -201,8 +257,9 @@ class FileUploadRecordQuerySet(models.QuerySet):
     def delete(self):
         """批量刪除時也刪除相關記錄"""
         from django.db import transaction
+        from app.utils.rollups import rollup_batch
         
-        with transaction.atomic():
+        with transaction.atomic(), rollup_batch():
             from app.models import UploadRecordRelation, GreenBeanInboundRecord
             
             deleted_records = 0
@@ -284,15 +341,24 @@ class FileUploadRecord(models.Model):
     error_message = models.TextField('錯誤訊息', blank=True, null=True)
     # 新增：用於還原功能的記錄ID列表
     created_record_ids = models.JSONField('創建的記錄ID列表', default=list, blank=True)
-    
+
+    # 上傳統計（於匯入時由記憶體中的資料計算，歷史頁面不需再彙總記錄表）
+    record_time_min = models.DateTimeField('最早記錄時間', null=True, blank=True)
+    record_time_max = models.DateTimeField('最晚記錄時間', null=True, blank=True)
+    total_measured_weight_kg = models.DecimalField('量測重量合計(kg)', max_digits=14, decimal_places=2, null=True, blank=True)
+    abnormal_count = models.IntegerField('異常記錄數', default=0)
+    distinct_item_count = models.IntegerField('不重複品項數', default=0)
+    rejected_rows = models.IntegerField('略過列數', default=0)
+
     def __str__(self):
         return f"{self.file_name} - {self.get_status_display()}"
     
     def delete(self, using=None, keep_parents=False):
         """覆寫刪除方法，確保同時刪除相關記錄"""
         from django.db import transaction
+        from app.utils.rollups import rollup_batch
         
-        with transaction.atomic():
+        with transaction.atomic(), rollup_batch():
             # 刪除相關的生豆入庫記錄
             from app.models import UploadRecordRelation, GreenBeanInboundRecord
             
@@ -362,6 +428,80 @@ class UploadRecordRelation(models.Model):
         return f"{self.upload_record.file_name} -> {self.content_type}:{self.object_id}"
 
 
+class UploadInFlight(models.Model):
+    """處理中的上傳（以檔案雜湊值作為跨 worker 的鎖）"""
+    class Meta:
+        db_table = 'app_upload_in_flight'
+        verbose_name = '處理中的上傳'
+        verbose_name_plural = '處理中的上傳'
+
+    file_hash = models.CharField('檔案雜湊值', max_length=64, unique=True)
+    file_type = models.CharField('檔案類型', max_length=50)
+    started_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='上傳者')
+    token = models.UUIDField('處理識別碼', default=uuid.uuid4, editable=False)
+    started_at = models.DateTimeField('開始時間', auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.file_type}:{self.file_hash[:12]}"
+
+
+class UploadAdmission(models.Model):
+    """
+    上傳准入名額與等待佇列（跨 worker 共用）
+
+    slot 不為空的資料列是處理中的上傳，slot 與 (user, user_slot) 的唯一限制保證全域與每位使用者的上限；
+    slot 為空的資料列是排隊中的票證，依 created_at 排序，queue_slot 的唯一限制保證佇列長度上限
+    """
+    class Meta:
+        db_table = 'app_upload_admission'
+        verbose_name = '上傳准入'
+        verbose_name_plural = '上傳准入'
+        constraints = [
+            models.UniqueConstraint(fields=['slot'], name='upload_admission_slot_unique'),
+            models.UniqueConstraint(fields=['user', 'user_slot'], name='upload_admission_user_slot_unique'),
+            models.UniqueConstraint(fields=['queue_slot'], name='upload_admission_queue_slot_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='upload_admission_expires_idx'),
+        ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='上傳者')
+    slot = models.PositiveSmallIntegerField('全域名額', null=True, blank=True)
+    user_slot = models.PositiveSmallIntegerField('使用者名額', null=True, blank=True)
+    queue_slot = models.PositiveSmallIntegerField('佇列位置', null=True, blank=True)
+    created_at = models.DateTimeField('排隊時間', auto_now_add=True)
+    started_at = models.DateTimeField('開始處理時間', null=True, blank=True)
+    expires_at = models.DateTimeField('失效時間')
+
+    def __str__(self):
+        state = f"slot {self.slot}" if self.slot is not None else "queued"
+        return f"{self.user_id}:{state}"
+
+
+class RecordTombstone(models.Model):
+    """已刪除記錄的墓碑，供變更摘要（change feed）通知客戶端刪除"""
+    TABLE_CHOICES = [
+        ('green_bean', '生豆入庫記錄'),
+        ('raw_material', '原料倉記錄'),
+    ]
+
+    class Meta:
+        db_table = 'app_record_tombstone'
+        verbose_name = '已刪除記錄'
+        verbose_name_plural = '已刪除記錄'
+        indexes = [
+            models.Index(fields=['table', 'deleted_at', 'id'], name='tombstone_feed_idx'),
+        ]
+
+    table = models.CharField('資料表', max_length=20, choices=TABLE_CHOICES)
+    record_id = models.UUIDField('記錄 ID')
+    deleted_at = models.DateTimeField('刪除時間', auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.table}:{self.record_id}"
+
+
 class UserActivityLog(models.Model):
     """用戶活動記錄"""
     ACTION_CHOICES = [
@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
@@ -64,9 +68,7 @@ class RawMaterialWarehouseRecordSerializer(serializers.ModelSerializer):
             'id', 'product_code', 'product_name', 'factory_batch_number',
             'international_batch_number', 'standard_weight_kg',
             'previous_month_inventory', 'incoming_stock', 'outgoing_stock',
-            'current_inventory', 'pending_processing',
-            'opened_quality_external_remaining', 'external_sales',
-            'record_date', 'created_at', 'updated_at'
+            'current_inventory', 'record_date', 'created_at', 'updated_at'
         ]
 
 
@@ -77,5 +79,71 @@ class RawMaterialMonthlySummarySerializer(serializers.ModelSerializer):
         fields = [
             'id', 'year', 'month', 'total_inventory_value',
             'total_incoming_stock', 'total_outgoing_stock',
-            'total_current_inventory', 'created_at', 'updated_at'
+            'total_current_inventory', 'record_count', 'inventory_count',
+            'created_at', 'updated_at'
         ]
+
+
+def parse_field_projection(value, serializer_class):
+    """
+    解析 ?fields= 欄位投影參數（逗號分隔）
+
+    Args:
+        value: 參數值，空值表示不投影
+        serializer_class: ModelSerializer，可選欄位為其 Meta.fields
+
+    Returns:
+        list: 欄位名稱（依請求順序、不重複）；未指定時為 None
+
+    Raises:
+        ValueError: 包含不支援的欄位
+    """
+    if not value:
+        return None
+    allowed = serializer_class.Meta.fields
+    fields = []
+    for name in (field.strip() for field in value.split(',')):
+        if not name or name in fields:
+            continue
+        if name not in allowed:
+            raise ValueError(f'不支援的欄位: {name}')
+        fields.append(name)
+    return fields or None
+
+
+def _to_representation(value):
+    """輸出與 ModelSerializer 預設欄位相同的表示方式"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def serialize_values(rows, fields):
+    """
+    將 values() 查詢結果序列化（不建立模型實例、不經過 DRF 欄位）
+
+    Args:
+        rows: values() 回傳的字典
+        fields: 輸出的欄位（rows 可包含額外欄位，例如分頁用的排序欄位）
+    """
+    return [{name: _to_representation(row[name]) for name in fields} for row in rows]
+
+
+def serialize_columnar(rows, columns):
+    """
+    將 values_list() 查詢結果序列化為欄式格式，欄位名稱只出現一次
+
+    Args:
+        rows: values_list() 回傳的資料列，前 len(columns) 個值依序對應 columns
+        columns: 輸出的欄位
+
+    Returns:
+        dict: {'columns': [...], 'rows': [[...], ...]}
+    """
+    width = len(columns)
+    return {
+        'columns': list(columns),
+        'rows': [[_to_representation(value) for value in row[:width]] for row in rows],
+    }
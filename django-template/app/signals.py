@@ -1,10 +1,67 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from app.models import AdminUser
+from app.models import AdminUser, GreenBeanInboundRecord, RawMaterialWarehouseRecord
+from app.models.models import RawMaterialMonthlySummary
+from app.utils.change_feed import record_tombstone
+from app.utils.data_version import GREEN_BEAN, RAW_MATERIAL, mark_records_changed
+from app.utils.rollups import track_record_post_delete, track_record_post_save, track_record_pre_save
 
 
 @receiver([post_save], sender=AdminUser)
 def post_save_post(sender, instance, created, **kwargs):
     if created:
         pass
+
+
+@receiver([post_save, post_delete], sender=GreenBeanInboundRecord)
+def green_bean_record_changed(sender, instance, **kwargs):
+    """生豆入庫記錄異動時遞增資料版本，讓儀表板快取失效"""
+    mark_records_changed(GREEN_BEAN)
+
+
+@receiver([post_save, post_delete], sender=RawMaterialWarehouseRecord)
+def raw_material_record_changed(sender, instance, **kwargs):
+    """原料倉記錄異動時遞增資料版本，讓儀表板快取失效"""
+    mark_records_changed(RAW_MATERIAL)
+
+
+@receiver([post_save, post_delete], sender=RawMaterialMonthlySummary)
+def raw_material_summary_changed(sender, instance, **kwargs):
+    """月度統計手動修改（例如總庫存價值）時也遞增原料倉資料版本，讓庫存統計的 ETag 失效"""
+    mark_records_changed(RAW_MATERIAL)
+
+
+@receiver([pre_save], sender=GreenBeanInboundRecord)
+@receiver([pre_save], sender=RawMaterialWarehouseRecord)
+def record_rollup_pre_save(sender, instance, raw=False, **kwargs):
+    """修改記錄前保留舊值，供每日彙總扣除"""
+    if not raw:
+        track_record_pre_save(instance)
+
+
+@receiver([post_save], sender=GreenBeanInboundRecord)
+@receiver([post_save], sender=RawMaterialWarehouseRecord)
+def record_rollup_post_save(sender, instance, raw=False, **kwargs):
+    """新增或修改記錄後更新每日彙總"""
+    if not raw:
+        track_record_post_save(instance)
+
+
+@receiver([post_delete], sender=GreenBeanInboundRecord)
+@receiver([post_delete], sender=RawMaterialWarehouseRecord)
+def record_rollup_post_delete(sender, instance, **kwargs):
+    """刪除記錄後扣除每日彙總"""
+    track_record_post_delete(instance)
+
+
+@receiver([post_delete], sender=GreenBeanInboundRecord)
+def green_bean_record_tombstone(sender, instance, **kwargs):
+    """刪除生豆入庫記錄時留下墓碑，供變更摘要通知客戶端"""
+    record_tombstone(GREEN_BEAN, instance.pk)
+
+
+@receiver([post_delete], sender=RawMaterialWarehouseRecord)
+def raw_material_record_tombstone(sender, instance, **kwargs):
+    """刪除原料倉記錄時留下墓碑，供變更摘要通知客戶端"""
+    record_tombstone(RAW_MATERIAL, instance.pk)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+用戶活動記錄緩衝測試
+"""
+import queue
+from unittest import mock
+
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.test import TestCase, override_settings
+
+from app.models.models import User, UserActivityLog
+from app.utils import activity_buffer
+from app.utils.activity_buffer import ActivityLogBuffer, enqueue_activity_event, write_activity_events
+
+
+class ActivityBufferTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buffer-user', 'buffer@example.com', 'password')
+
+    def _event(self, description, log_entry=True):
+        return {
+            'activity': {'user_id': self.user.pk, 'action': 'create', 'description': description, 'details': {}},
+            'log_entry': {
+                'user_id': self.user.pk, 'action_flag': ADDITION, 'object_repr': description, 'change_message': '',
+            } if log_entry else None,
+        }
+
+    def _buffer(self, maxsize=100):
+        # 不啟動背景執行緒，由測試直接呼叫 flush 寫入
+        buffer = ActivityLogBuffer()
+        buffer._queue = queue.Queue(maxsize=maxsize)
+        patcher = mock.patch.object(buffer, '_ensure_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return buffer
+
+    def test_write_events_in_bulk(self):
+        write_activity_events([self._event('a'), self._event('b', log_entry=False)])
+        self.assertEqual(
+            sorted(UserActivityLog.objects.values_list('description', flat=True)), ['a', 'b']
+        )
+        self.assertEqual(list(LogEntry.objects.values_list('object_repr', flat=True)), ['a'])
+
+    def test_bad_event_falls_back_to_single_writes(self):
+        bad = self._event('bad')
+        bad['activity']['no_such_field'] = 1
+        write_activity_events([self._event('a'), bad, self._event('b')])
+        self.assertEqual(
+            sorted(UserActivityLog.objects.values_list('description', flat=True)), ['a', 'b']
+        )
+
+    def test_flush_writes_queued_events(self):
+        buffer = self._buffer()
+        for index in range(3):
+            buffer.put(self._event(f'event-{index}'))
+        self.assertFalse(UserActivityLog.objects.exists())
+
+        buffer.flush()
+        self.assertEqual(UserActivityLog.objects.count(), 3)
+        self.assertEqual(LogEntry.objects.count(), 3)
+        self.assertTrue(buffer._queue.empty())
+
+    def test_full_queue_writes_directly(self):
+        buffer = self._buffer(maxsize=1)
+        buffer.put(self._event('queued'))
+        buffer.put(self._event('overflow'))
+        self.assertEqual(list(UserActivityLog.objects.values_list('description', flat=True)), ['overflow'])
+
+    def test_drain_stops_at_batch_size_and_keeps_stop_marker(self):
+        buffer = self._buffer()
+        for index in range(4):
+            buffer._queue.put(index)
+        self.assertEqual(buffer._drain('first', 3), ['first', 0, 1])
+
+        buffer._queue.put(activity_buffer._STOP)
+        self.assertEqual(buffer._drain('first', 10), ['first', 2, 3])
+        self.assertIs(buffer._queue.get_nowait(), activity_buffer._STOP)
+
+    @override_settings(ACTIVITY_LOG_SYNC=False)
+    def test_enqueue_waits_for_commit(self):
+        with mock.patch.object(activity_buffer._buffer, 'put') as put:
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue_activity_event(self._event('a'))
+                put.assert_not_called()
+            put.assert_called_once()
+
+    @override_settings(ACTIVITY_LOG_SYNC=True)
+    def test_sync_mode_writes_immediately(self):
+        enqueue_activity_event(self._event('sync'))
+        self.assertTrue(UserActivityLog.objects.filter(description='sync').exists())
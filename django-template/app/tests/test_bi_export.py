@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+BI 資料集匯出測試
+"""
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.test import SimpleTestCase, TestCase
+
+from app.models.models import RawMaterialWarehouseRecord
+from app.utils.bi_export import (
+    RAW_MATERIAL_MOVEMENT_COLUMNS,
+    _DatasetWriter,
+    export_raw_material_records,
+    flatten_raw_material_movements,
+)
+from app.views.erp_export_views import dynamic_column
+
+
+def _row(dynamic_fields, record_date=date(2025, 10, 31), created_at=datetime(2025, 11, 3, 9, 0)):
+    return {
+        'id': 'record-1',
+        'product_code': 'P1',
+        'product_name': '砂糖',
+        'record_date': record_date,
+        'created_at': created_at,
+        'dynamic_fields': dynamic_fields,
+    }
+
+
+class FlattenMovementsTests(SimpleTestCase):
+
+    def _movements(self, row):
+        return {movement['source_key']: movement for movement in flatten_raw_material_movements(row)}
+
+    def test_movement_dates(self):
+        movements = self._movements(_row({
+            '10/5_入庫': '3',
+            '10/6_領用': 1.5,
+            '10/31掛11/1帳_入庫': '2',
+            '11/2_轉出': '4',
+        }))
+        self.assertEqual(movements['10/5_入庫']['movement_date'], date(2025, 10, 5))
+        self.assertEqual(movements['10/6_領用']['quantity'], 1.5)
+        # 十月記錄中的下個月欄位仍屬同一年
+        self.assertEqual(movements['10/31掛11/1帳_入庫']['movement_date'], date(2025, 11, 1))
+        self.assertTrue(movements['10/31掛11/1帳_入庫']['carry_over'])
+        self.assertEqual(movements['11/2_轉出']['movement_date'], date(2025, 11, 2))
+        self.assertFalse(movements['11/2_轉出']['carry_over'])
+
+    def test_year_matches_xlsx_export(self):
+        fields = {'12/31_入庫': '1', '1/2_入庫': '1', '12/31掛1/1帳_入庫': '1', '6/1_入庫': '1'}
+        for record_date in (date(2025, 1, 15), date(2025, 10, 31), date(2025, 12, 31)):
+            for key, movement in self._movements(_row(fields, record_date=record_date)).items():
+                year, _ = dynamic_column(key, record_date)
+                self.assertEqual(movement['movement_date'].year, year, (key, record_date))
+
+    def test_skips_non_movement_and_non_numeric_fields(self):
+        movements = self._movements(_row({
+            '小計_入庫': '10',
+            '11/1_備註': '1',
+            '11/1_入庫': '',
+            '11/2_入庫': None,
+            '11/3_入庫': '5',
+        }))
+        self.assertEqual(list(movements), ['11/3_入庫'])
+
+    def test_falls_back_to_created_at_and_invalid_dates(self):
+        movements = self._movements(_row({'11/3_入庫': '1', '2/30_入庫': '1'}, record_date=None))
+        self.assertEqual(movements['11/3_入庫']['movement_date'], date(2025, 11, 3))
+        self.assertIsNone(movements['2/30_入庫']['movement_date'])
+
+
+class DatasetWriterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _write(self, export_format, batches):
+        path = os.path.join(self.tmpdir.name, f'movements.{export_format}')
+        writer = _DatasetWriter(pa, path, RAW_MATERIAL_MOVEMENT_COLUMNS, export_format)
+        try:
+            for batch in batches:
+                writer.write(batch)
+        finally:
+            writer.close()
+        return path, writer.rows
+
+    def test_arrow_ipc_round_trip(self):
+        rows = flatten_raw_material_movements(_row({'10/5_入庫': '3', '10/6_領用': Decimal('1.25')}))
+        path, written = self._write('arrow', [rows[:1], [], rows[1:]])
+        self.assertEqual(written, 2)
+
+        with pa.ipc.open_file(path) as reader:
+            table = reader.read_all()
+        self.assertEqual(reader.num_record_batches, 2)
+        self.assertEqual(table.schema.field('movement_date').type, pa.date32())
+        self.assertEqual(table.schema.field('quantity').type, pa.float64())
+        self.assertEqual(sorted(table.column('quantity').to_pylist()), [1.25, 3.0])
+
+    def test_parquet_keeps_nulls(self):
+        rows = flatten_raw_material_movements(_row({'2/30_入庫': '1'}))
+        path, _ = self._write('parquet', [rows])
+        table = pq.read_table(path)
+        self.assertEqual(table.column('movement_date').to_pylist(), [None])
+        self.assertEqual(table.column('record_id').to_pylist(), ['record-1'])
+
+
+class RawMaterialExportTests(TestCase):
+
+    def test_records_and_movements(self):
+        record = RawMaterialWarehouseRecord.objects.create(
+            product_code='P1', product_name='砂糖', record_date=date(2025, 10, 31),
+            incoming_stock=Decimal('5'), dynamic_fields={'10/31掛11/1帳_入庫': '2', '小計_入庫': '2'},
+        )
+        RawMaterialWarehouseRecord.objects.create(product_code='P2', product_name='奶粉')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            records_path = os.path.join(tmpdir, 'records.parquet')
+            movements_path = os.path.join(tmpdir, 'movements.parquet')
+            counts = export_raw_material_records(records_path, movements_path, 'parquet', batch_size=1)
+            records = pq.read_table(records_path)
+            movements = pq.read_table(movements_path)
+
+        self.assertEqual(counts, (2, 1))
+        self.assertEqual(sorted(records.column('product_code').to_pylist()), ['P1', 'P2'])
+        self.assertEqual(movements.column('record_id').to_pylist(), [str(record.pk)])
+        self.assertEqual(movements.column('movement_date').to_pylist(), [date(2025, 11, 1)])
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+變更摘要（change feed）測試
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from app.models.models import GreenBeanInboundRecord, RecordTombstone, User
+from app.serializers.user_serializer import GreenBeanInboundRecordSerializer
+from app.utils.change_feed import CursorExpired, get_changes
+from app.utils.data_version import GREEN_BEAN
+from app.utils.pagination import encode_cursor
+
+
+def _changes(cursor=None, limit=500):
+    return get_changes(
+        GreenBeanInboundRecord, GREEN_BEAN, GreenBeanInboundRecordSerializer.Meta.fields,
+        cursor=cursor, limit=limit
+    )
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(TestCase):
+
+    def _create_records(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [GreenBeanInboundRecord.objects.create(order_number=f'A{index}') for index in range(count)]
+
+    def test_pages_through_changes(self):
+        records = self._create_records(5)
+        seen, cursor = [], None
+        while True:
+            feed = _changes(cursor, limit=2)
+            seen.extend(row['id'] for row in feed['changes'])
+            cursor = feed['next_cursor']
+            if not feed['has_more']:
+                break
+        self.assertCountEqual(seen, [record.pk for record in records])
+        # 沒有新的異動時回傳空結果，游標不變
+        feed = _changes(cursor)
+        self.assertEqual(feed['changes'], [])
+        self.assertEqual(feed['deleted'], [])
+
+    def test_deletes_are_written_once_at_commit(self):
+        records = self._create_records(3)
+        cursor = _changes()['next_cursor']
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                GreenBeanInboundRecord.objects.filter(pk__in=[record.pk for record in records]).delete()
+                # 交易提交前不寫入墓碑
+                self.assertFalse(RecordTombstone.objects.exists())
+        # 同一交易的刪除只登記一個提交回呼
+        tombstone_callbacks = [callback for callback in callbacks if 'tombstone' in repr(callback)]
+        self.assertLessEqual(len(tombstone_callbacks), 1)
+        self.assertEqual(RecordTombstone.objects.filter(table=GREEN_BEAN).count(), 3)
+
+        feed = _changes(cursor)
+        self.assertCountEqual(feed['deleted'], [str(record.pk) for record in records])
+
+    def test_rolled_back_delete_leaves_no_tombstone(self):
+        record = self._create_records(1)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    record.delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(RecordTombstone.objects.exists())
+
+    def test_old_tombstones_are_pruned(self):
+        old = RecordTombstone.objects.create(table=GREEN_BEAN, record_id=uuid.uuid4())
+        RecordTombstone.objects.filter(pk=old.pk).update(deleted_at=datetime.now() - timedelta(days=365))
+        record = self._create_records(1)[0]
+        record_id = record.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delete()
+        self.assertEqual(list(RecordTombstone.objects.values_list('record_id', flat=True)), [record_id])
+
+    def test_expired_cursor_requires_resync(self):
+        cursor = encode_cursor({
+            'u': None, 'id': None, 'd': None, 'tid': None,
+            's': (datetime.now() - timedelta(days=365)).isoformat(),
+        })
+        with self.assertRaises(CursorExpired):
+            _changes(cursor)
+
+    def test_tampered_cursor_raises_value_error(self):
+        cursor = encode_cursor({'u': '2026-01-01T00:00:00', 'id': 'x', 'd': None, 'tid': None, 's': None})
+        with self.assertRaises(ValueError):
+            _changes(cursor)
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedApiTests(TestCase):
+
+    url = '/erp/api/green-bean-records/changes/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def test_expired_cursor_returns_gone(self):
+        cursor = encode_cursor({
+            'u': None, 'id': None, 'd': None, 'tid': None,
+            's': (datetime.now() - timedelta(days=365)).isoformat(),
+        })
+        response = self.client.get(self.url, {'cursor': cursor})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.data['resync'])
+
+    def test_tampered_cursor_returns_bad_request(self):
+        response = self.client.get(self.url, {'cursor': encode_cursor({'u': 'x'})})
+        self.assertEqual(response.status_code, 400)
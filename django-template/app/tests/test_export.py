@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ERP 資料匯出測試
+"""
+import io
+from datetime import date
+
+from django.test import SimpleTestCase, TestCase
+from openpyxl import load_workbook
+
+from app.models.models import RawMaterialWarehouseRecord, User
+from app.views.erp_export_views import dynamic_column, dynamic_column_header, dynamic_column_sort_key
+
+
+class DynamicColumnTests(SimpleTestCase):
+
+    def test_year_follows_record_date(self):
+        self.assertEqual(dynamic_column('11/5_入庫', date(2025, 11, 30)), (2025, '11/5_入庫'))
+        # 一月記錄中的十二月欄位屬於前一年，十二月記錄中的一月掛帳欄位屬於下一年
+        self.assertEqual(dynamic_column('12/31_入庫', date(2026, 1, 31)), (2025, '12/31_入庫'))
+        self.assertEqual(dynamic_column('12/31掛1/1帳_入庫', date(2025, 12, 31)), (2026, '12/31掛1/1帳_入庫'))
+        self.assertEqual(dynamic_column('小計_入庫', date(2026, 1, 31)), (None, '小計_入庫'))
+        self.assertEqual(dynamic_column('11/5_入庫', None), (None, '11/5_入庫'))
+
+    def test_columns_sort_across_year_boundary(self):
+        columns = [
+            (2026, '1/2_入庫'),
+            (None, '小計_入庫'),
+            (2025, '12/31_領用'),
+            (2026, '12/31掛1/1帳_入庫'),
+            (2025, '12/31_入庫'),
+            (2026, '1/1_入庫'),
+            (None, '備註'),
+        ]
+        self.assertEqual(sorted(columns, key=dynamic_column_sort_key), [
+            (2025, '12/31_入庫'),
+            (2025, '12/31_領用'),
+            (2026, '12/31掛1/1帳_入庫'),
+            (2026, '1/1_入庫'),
+            (2026, '1/2_入庫'),
+            (None, '小計_入庫'),
+            (None, '備註'),
+        ])
+
+    def test_header_adds_year_only_across_years(self):
+        self.assertEqual(dynamic_column_header((2025, '12/31_入庫'), False), '12/31_入庫')
+        self.assertEqual(dynamic_column_header((2025, '12/31_入庫'), True), '2025/12/31_入庫')
+        self.assertEqual(dynamic_column_header((None, '小計_入庫'), True), '小計_入庫')
+
+
+class RawMaterialXlsxExportTests(TestCase):
+
+    url = '/erp/api/raw-material-records/export/xlsx/'
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def _export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        return list(workbook['原料倉記錄'].values)
+
+    def test_same_day_in_different_years_gets_separate_columns(self):
+        RawMaterialWarehouseRecord.objects.create(
+            product_code='P1', record_date=date(2025, 1, 31), dynamic_fields={'1/5_入庫': 1}
+        )
+        RawMaterialWarehouseRecord.objects.create(
+            product_code='P1', record_date=date(2025, 12, 31), dynamic_fields={'12/31_入庫': 2}
+        )
+        RawMaterialWarehouseRecord.objects.create(
+            product_code='P1', record_date=date(2026, 1, 31), dynamic_fields={'1/5_入庫': 3, '小計_入庫': 3}
+        )
+        rows = self._export()
+        header = rows[0]
+        dynamic_headers = list(header[-4:])
+        self.assertEqual(dynamic_headers, ['2025/1/5_入庫', '2025/12/31_入庫', '2026/1/5_入庫', '小計_入庫'])
+        # 資料列依建立時間排序
+        self.assertEqual([row[-4:] for row in rows[1:]], [
+            (1, None, None, None),
+            (None, 2, None, None),
+            (None, None, 3, 3),
+        ])
+
+    def test_single_year_keeps_original_headers(self):
+        RawMaterialWarehouseRecord.objects.create(
+            product_code='P1', record_date=date(2025, 11, 30), dynamic_fields={'11/5_入庫': 1, '11/1_領用': 2}
+        )
+        header = self._export()[0]
+        self.assertEqual(list(header[-2:]), ['11/1_領用', '11/5_入庫'])
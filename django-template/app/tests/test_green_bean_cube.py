@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+生豆入庫記錄 Cube 測試
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.test import TransactionTestCase
+
+from app.models.models import GreenBeanInboundRecord, RecordTombstone
+from app.utils.green_bean_cube import GreenBeanCube
+
+
+class GreenBeanCubeTests(TransactionTestCase):
+    """資料版本與墓碑在交易提交後才更新，因此使用 TransactionTestCase"""
+
+    def _create(self, name, weight, day=1):
+        return GreenBeanInboundRecord.objects.create(
+            green_bean_name=name,
+            measured_weight_kg=Decimal(weight),
+            record_time=datetime(2026, 1, day, 8, 0),
+        )
+
+    def _totals(self, cube):
+        return {row['green_bean_name']: (row['count'], row['weight']) for row in cube.query(group_by=['green_bean_name'])}
+
+    def test_group_by_and_filter(self):
+        self._create('耶加雪菲', '10', day=1)
+        self._create('耶加雪菲', '20', day=2)
+        self._create('曼特寧', '5', day=2)
+        cube = GreenBeanCube()
+        self.assertEqual(self._totals(cube), {'耶加雪菲': (2, 30.0), '曼特寧': (1, 5.0)})
+
+        rows = cube.query(filters={'green_bean_name': ['耶加雪菲']}, group_by=['day'])
+        self.assertEqual([(row['day'], row['count']) for row in rows], [('2026-01-01', 1), ('2026-01-02', 1)])
+
+        rows = cube.query(group_by=['day'], day_granularity='month')
+        self.assertEqual([(row['day'], row['count'], row['weight']) for row in rows], [('2026-01', 3, 35.0)])
+
+    def test_refresh_picks_up_updates(self):
+        record = self._create('耶加雪菲', '10')
+        cube = GreenBeanCube()
+        self.assertEqual(self._totals(cube), {'耶加雪菲': (1, 10.0)})
+
+        record.measured_weight_kg = Decimal('12')
+        record.save()
+        self.assertEqual(self._totals(cube), {'耶加雪菲': (1, 12.0)})
+
+    def test_late_commit_with_older_updated_at(self):
+        # 長交易中的記錄 updated_at 早於其他較快提交的修改，提交後仍須讀入 Cube
+        record = self._create('耶加雪菲', '10')
+        cube = GreenBeanCube()
+        cube.query()
+
+        saved_at = datetime.now()
+        record.measured_weight_kg = Decimal('11')
+        record.save()
+        self.assertEqual(self._totals(cube), {'耶加雪菲': (1, 11.0)})
+
+        late = self._create('曼特寧', '5')
+        GreenBeanInboundRecord.objects.filter(pk=late.pk).update(updated_at=saved_at)
+        self.assertEqual(self._totals(cube), {'耶加雪菲': (1, 11.0), '曼特寧': (1, 5.0)})
+
+    def test_delete_and_insert_same_count(self):
+        # 刪除與新增筆數相同時，筆數不變，仍必須移除已刪除的記錄
+        old = self._create('耶加雪菲', '10')
+        self._create('曼特寧', '5')
+        cube = GreenBeanCube()
+        cube.query()
+
+        old.delete()
+        self._create('哥倫比亞', '7')
+        self.assertEqual(self._totals(cube), {'曼特寧': (1, 5.0), '哥倫比亞': (1, 7.0)})
+        self.assertEqual(cube.info()['records'], 2)
+
+    def test_rebuilds_when_tombstones_may_be_pruned(self):
+        record = self._create('耶加雪菲', '10')
+        cube = GreenBeanCube()
+        cube.query()
+        cube.tombstone_watermark = datetime(2000, 1, 1)
+
+        record.delete()
+        RecordTombstone.objects.all().delete()
+        self.assertEqual(self._totals(cube), {})
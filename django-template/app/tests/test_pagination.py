@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+分頁工具測試
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase, TestCase
+
+from app.models.models import GreenBeanInboundRecord
+from app.utils.pagination import (
+    count_total,
+    decode_cursor,
+    encode_cursor,
+    iterate_keyset,
+    keyset_paginate,
+    parse_page_size,
+)
+
+
+class CursorTests(SimpleTestCase):
+    """游標編碼與解碼"""
+
+    def test_round_trip(self):
+        values = {'v': '2026-01-01T08:00:00', 'id': str(uuid.uuid4())}
+        self.assertEqual(decode_cursor(encode_cursor(values)), values)
+
+    def test_fields_are_converted(self):
+        record_id = uuid.uuid4()
+        cursor = encode_cursor({'v': '2026-01-01T08:00:00', 'id': str(record_id)})
+        values = decode_cursor(cursor, {'v': datetime.fromisoformat, 'id': uuid.UUID})
+        self.assertEqual(values, {'v': datetime(2026, 1, 1, 8, 0), 'id': record_id})
+
+    def test_null_value_is_kept(self):
+        cursor = encode_cursor({'v': None, 'id': str(uuid.uuid4())})
+        values = decode_cursor(cursor, {'v': datetime.fromisoformat, 'id': uuid.UUID})
+        self.assertIsNone(values['v'])
+
+    def test_malformed_cursor_raises_value_error(self):
+        for cursor in ('not-a-cursor', '!!!', encode_cursor(['v', 'id'])):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    decode_cursor(cursor)
+
+    def test_tampered_fields_raise_value_error(self):
+        fields = {'v': datetime.fromisoformat, 'id': uuid.UUID}
+        for values in (
+            {'v': 'yesterday', 'id': str(uuid.uuid4())},
+            {'v': '2026-01-01T08:00:00', 'id': 'not-a-uuid'},
+            {'v': 20260101, 'id': str(uuid.uuid4())},
+            {'v': '2026-01-01T08:00:00', 'id': ['x']},
+            {'v': '2026-01-01T08:00:00'},
+        ):
+            with self.subTest(values=values):
+                with self.assertRaises(ValueError):
+                    decode_cursor(encode_cursor(values), fields)
+
+
+class ParsePageSizeTests(SimpleTestCase):
+
+    def test_defaults_and_limits(self):
+        self.assertEqual(parse_page_size(None), 20)
+        self.assertEqual(parse_page_size('abc'), 20)
+        self.assertEqual(parse_page_size('0'), 1)
+        self.assertEqual(parse_page_size('500'), 100)
+        self.assertEqual(parse_page_size('50'), 50)
+
+
+class KeysetPaginateTests(TestCase):
+    """依 (record_time, id) 的 keyset 分頁"""
+
+    @classmethod
+    def setUpTestData(cls):
+        start = datetime(2026, 1, 1, 8, 0)
+        # 兩筆記錄時間相同，另有一筆沒有記錄時間
+        times = [start, start + timedelta(hours=1), start + timedelta(hours=1), start + timedelta(hours=2), None]
+        for index, record_time in enumerate(times):
+            GreenBeanInboundRecord.objects.create(order_number=f'A{index}', record_time=record_time)
+
+    def _collect(self, queryset, page_size, descending=True):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_paginate(queryset, 'record_time', cursor=cursor, page_size=page_size, descending=descending)
+            seen.extend(row.pk for row in rows)
+            if cursor is None:
+                return seen
+
+    def test_pages_match_full_ordering(self):
+        # 沒有記錄時間的資料排在最後
+        expected = list(
+            GreenBeanInboundRecord.objects.filter(record_time__isnull=False)
+            .order_by('-record_time', '-id').values_list('pk', flat=True)
+        ) + list(GreenBeanInboundRecord.objects.filter(record_time__isnull=True).values_list('pk', flat=True))
+        for page_size in (1, 2, 3, 10):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(self._collect(GreenBeanInboundRecord.objects.all(), page_size), expected)
+
+    def test_ascending_pages(self):
+        queryset = GreenBeanInboundRecord.objects.filter(record_time__isnull=False)
+        expected = list(queryset.order_by('record_time', 'id').values_list('pk', flat=True))
+        self.assertEqual(self._collect(queryset, 2, descending=False), expected)
+
+    def test_iterate_keyset_reads_everything(self):
+        rows = list(iterate_keyset(GreenBeanInboundRecord.objects.values('id', 'record_time'), 'record_time', batch_size=2))
+        self.assertEqual(len(rows), 5)
+
+    def test_tampered_cursor_raises_value_error(self):
+        cursor = encode_cursor({'v': '2026-01-01T08:00:00', 'id': 'not-a-uuid'})
+        with self.assertRaises(ValueError):
+            keyset_paginate(GreenBeanInboundRecord.objects.all(), 'record_time', cursor=cursor)
+
+
+class CountTotalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            GreenBeanInboundRecord.objects.create(order_number=f'A{index}')
+
+    def test_modes(self):
+        queryset = GreenBeanInboundRecord.objects.all()
+        self.assertEqual(count_total(queryset), {'total_count': None, 'total_count_exact': False})
+        self.assertEqual(count_total(queryset, 'exact'), {'total_count': 5, 'total_count_exact': True})
+        self.assertEqual(count_total(queryset, 'estimate', cap=3), {'total_count': 3, 'total_count_exact': False})
+        self.assertEqual(count_total(queryset, 'estimate', cap=10), {'total_count': 5, 'total_count_exact': True})
+        self.assertEqual(
+            count_total(queryset, 'exact', unfiltered_count=lambda: 42),
+            {'total_count': 42, 'total_count_exact': True}
+        )
+        with self.assertRaises(ValueError):
+            count_total(queryset, 'all')
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+記錄列表 API 測試
+"""
+from datetime import datetime, timedelta
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from app.models.models import GreenBeanInboundRecord, User
+from app.utils.data_version import GREEN_BEAN, bump_data_version
+from app.utils.pagination import encode_cursor
+
+
+class GreenBeanRecordsApiTests(TestCase):
+    """生豆入庫記錄 API"""
+
+    url = '/erp/api/green-bean-records/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        start = datetime(2026, 1, 1, 8, 0)
+        for index in range(5):
+            GreenBeanInboundRecord.objects.create(
+                order_number=f'A{index:03d}',
+                green_bean_name='耶加雪菲',
+                record_time=start + timedelta(hours=index),
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_keyset_pages_cover_all_records(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(record['order_number'] for record in response.data['data'])
+            cursor = response.data['pagination']['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, ['A004', 'A003', 'A002', 'A001', 'A000'])
+
+    def test_columnar_layout(self):
+        response = self.client.get(self.url, {'layout': 'columnar', 'fields': 'order_number,green_bean_name'})
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        self.assertEqual(data['columns'], ['order_number', 'green_bean_name'])
+        self.assertEqual(data['rows'][0], ['A004', '耶加雪菲'])
+
+    def test_field_projection(self):
+        response = self.client.get(self.url, {'fields': 'order_number'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data'][0], {'order_number': 'A004'})
+
+    def test_unknown_layout_is_rejected(self):
+        response = self.client.get(self.url, {'layout': 'rows'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['success'])
+
+    def test_tampered_cursor_is_rejected(self):
+        for cursor in ('not-a-cursor', encode_cursor({'v': 'yesterday', 'id': 'x'})):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.data['success'])
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(self.url, {'page_size': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # 資料異動後版本遞增（實際在交易提交後遞增，TestCase 中不會提交）
+        bump_data_version(GREEN_BEAN)
+        response = self.client.get(self.url, {'page_size': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_error_response_has_no_validators(self):
+        response = self.client.get(self.url, {'layout': 'rows'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+彙總表增量維護測試：signals 增量更新的結果需與重建結果相同
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.test import TestCase
+
+from app.models.models import (
+    GreenBeanDailyRollup,
+    GreenBeanInboundRecord,
+    RawMaterialDailyRollup,
+    RawMaterialMonthlySummary,
+    RawMaterialWarehouseRecord,
+)
+from app.utils.rollups import (
+    backfill_raw_material_monthly_summary,
+    rebuild_green_bean_daily_rollups,
+    rebuild_raw_material_daily_rollups,
+    rollup_batch,
+)
+
+
+def _snapshot(model, key_fields, value_fields):
+    # 無日期的紀錄彙總在 day 為 None 的資料列，排序時以字串比較避免 None 無法比較
+    return sorted(
+        (
+            tuple(row[name] for name in key_fields + value_fields)
+            for row in model.objects.filter(record_count__gt=0).values(*key_fields, *value_fields)
+        ),
+        key=lambda values: [str(value) for value in values]
+    )
+
+
+GREEN_BEAN_KEY = ['day', 'green_bean_name', 'green_bean_storage_silo']
+GREEN_BEAN_VALUES = ['record_count', 'weighed_count', 'total_measured_weight_kg', 'abnormal_count']
+RAW_MATERIAL_KEY = ['day', 'product_code', 'product_name']
+RAW_MATERIAL_VALUES = ['record_count', 'inventory_count', 'total_incoming_stock', 'total_outgoing_stock', 'total_current_inventory']
+MONTHLY_KEY = ['year', 'month']
+
+
+class GreenBeanRollupTests(TestCase):
+
+    def _assert_matches_rebuild(self):
+        incremental = _snapshot(GreenBeanDailyRollup, GREEN_BEAN_KEY, GREEN_BEAN_VALUES)
+        rebuild_green_bean_daily_rollups()
+        self.assertEqual(incremental, _snapshot(GreenBeanDailyRollup, GREEN_BEAN_KEY, GREEN_BEAN_VALUES))
+
+    def test_create_update_delete(self):
+        first = GreenBeanInboundRecord.objects.create(
+            green_bean_name='耶加雪菲', green_bean_storage_silo='S1',
+            record_time=datetime(2026, 1, 1, 8, 0), measured_weight_kg=Decimal('10.25'),
+        )
+        second = GreenBeanInboundRecord.objects.create(
+            green_bean_name='耶加雪菲', green_bean_storage_silo='S1',
+            record_time=datetime(2026, 1, 1, 9, 0), is_abnormal=True,
+        )
+        GreenBeanInboundRecord.objects.create(green_bean_name='曼特寧', record_time=None)
+
+        row = GreenBeanDailyRollup.objects.get(day=date(2026, 1, 1), green_bean_name='耶加雪菲')
+        self.assertEqual(
+            (row.record_count, row.weighed_count, row.total_measured_weight_kg, row.abnormal_count),
+            (2, 1, Decimal('10.25'), 1)
+        )
+
+        # 修改會扣除舊值並加入新值（移到另一天）
+        first.record_time = datetime(2026, 1, 2, 8, 0)
+        first.measured_weight_kg = Decimal('11')
+        first.save()
+        second.delete()
+
+        self.assertFalse(GreenBeanDailyRollup.objects.filter(day=date(2026, 1, 1)).exists())
+        self._assert_matches_rebuild()
+
+    def test_batch_merges_deltas(self):
+        with transaction.atomic(), rollup_batch():
+            for index in range(5):
+                GreenBeanInboundRecord.objects.create(
+                    green_bean_name='耶加雪菲', record_time=datetime(2026, 1, 1, 8, index),
+                    measured_weight_kg=Decimal('1.10'),
+                )
+            # 批次中尚未寫入彙總表
+            self.assertFalse(GreenBeanDailyRollup.objects.exists())
+        row = GreenBeanDailyRollup.objects.get()
+        self.assertEqual((row.record_count, row.total_measured_weight_kg), (5, Decimal('5.50')))
+
+        with transaction.atomic(), rollup_batch():
+            GreenBeanInboundRecord.objects.filter(record_time__minute__lt=3).delete()
+        self._assert_matches_rebuild()
+
+
+class RawMaterialRollupTests(TestCase):
+
+    def test_daily_and_monthly_match_rebuild(self):
+        record = RawMaterialWarehouseRecord.objects.create(
+            product_code='P1', product_name='砂糖', record_date=date(2026, 1, 31),
+            incoming_stock=Decimal('5'), current_inventory=Decimal('12'),
+        )
+        RawMaterialWarehouseRecord.objects.create(
+            product_code='P2', product_name='奶粉', record_date=date(2026, 2, 1),
+            outgoing_stock=Decimal('2'),
+        )
+        record.record_date = date(2026, 2, 3)
+        record.save()
+
+        daily = _snapshot(RawMaterialDailyRollup, RAW_MATERIAL_KEY, RAW_MATERIAL_VALUES)
+        monthly = _snapshot(RawMaterialMonthlySummary, MONTHLY_KEY, RAW_MATERIAL_VALUES)
+        self.assertEqual([row[:2] for row in monthly], [(2026, 2)])
+
+        rebuild_raw_material_daily_rollups()
+        backfill_raw_material_monthly_summary()
+        self.assertEqual(daily, _snapshot(RawMaterialDailyRollup, RAW_MATERIAL_KEY, RAW_MATERIAL_VALUES))
+        self.assertEqual(monthly, _snapshot(RawMaterialMonthlySummary, MONTHLY_KEY, RAW_MATERIAL_VALUES))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+記錄序列化測試
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase
+
+from app.models.models import GreenBeanInboundRecord, RawMaterialWarehouseRecord
+from app.serializers.user_serializer import (
+    GreenBeanInboundRecordSerializer,
+    RawMaterialWarehouseRecordSerializer,
+    parse_field_projection,
+    serialize_columnar,
+    serialize_values,
+)
+
+
+class ParseFieldProjectionTests(SimpleTestCase):
+
+    def test_keeps_request_order_without_duplicates(self):
+        self.assertEqual(
+            parse_field_projection('order_number, green_bean_name,order_number,', GreenBeanInboundRecordSerializer),
+            ['order_number', 'green_bean_name']
+        )
+
+    def test_empty_means_no_projection(self):
+        self.assertIsNone(parse_field_projection('', GreenBeanInboundRecordSerializer))
+        self.assertIsNone(parse_field_projection(' , ', GreenBeanInboundRecordSerializer))
+
+    def test_unknown_field_is_rejected(self):
+        with self.assertRaises(ValueError):
+            parse_field_projection('order_number,password', GreenBeanInboundRecordSerializer)
+
+
+class SerializeValuesTests(TestCase):
+    """values() 序列化的輸出需與 ModelSerializer 相同"""
+
+    def test_green_bean_matches_model_serializer(self):
+        record = GreenBeanInboundRecord.objects.create(
+            order_number='A001',
+            green_bean_name='耶加雪菲',
+            record_time=datetime(2026, 1, 2, 8, 30),
+            measured_weight_kg=Decimal('60.50'),
+            is_abnormal=True,
+        )
+        fields = list(GreenBeanInboundRecordSerializer.Meta.fields)
+        expected = dict(GreenBeanInboundRecordSerializer(record).data)
+        row = GreenBeanInboundRecord.objects.filter(pk=record.pk).values(*fields).get()
+        self.assertEqual(serialize_values([row], fields), [expected])
+
+    def test_raw_material_matches_model_serializer(self):
+        record = RawMaterialWarehouseRecord.objects.create(
+            product_code='P001',
+            product_name='砂糖',
+            current_inventory=Decimal('12.00'),
+            dynamic_fields={'11/5_入庫': 3},
+        )
+        fields = list(RawMaterialWarehouseRecordSerializer.Meta.fields)
+        expected = dict(RawMaterialWarehouseRecordSerializer(record).data)
+        row = RawMaterialWarehouseRecord.objects.filter(pk=record.pk).values(*fields).get()
+        self.assertEqual(serialize_values([row], fields), [expected])
+
+    def test_extra_row_keys_are_dropped(self):
+        rows = [{'order_number': 'A001', 'record_time': datetime(2026, 1, 2), 'id': 'x'}]
+        self.assertEqual(serialize_values(rows, ['order_number']), [{'order_number': 'A001'}])
+
+
+class SerializeColumnarTests(SimpleTestCase):
+
+    def test_columns_appear_once_and_extra_values_are_dropped(self):
+        rows = [
+            ('A001', Decimal('60.50'), datetime(2026, 1, 2, 8, 30), 'id-1'),
+            ('A002', None, None, 'id-2'),
+        ]
+        self.assertEqual(serialize_columnar(rows, ['order_number', 'measured_weight_kg', 'record_time']), {
+            'columns': ['order_number', 'measured_weight_kg', 'record_time'],
+            'rows': [
+                ['A001', '60.50', '2026-01-02T08:30:00'],
+                ['A002', None, None],
+            ],
+        })
+
+    def test_empty_page(self):
+        self.assertEqual(serialize_columnar([], ['order_number']), {'columns': ['order_number'], 'rows': []})
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+時間序列降採樣測試
+"""
+import numpy as np
+from django.test import SimpleTestCase
+
+from app.utils.timeseries import lttb_indices, minmax_indices
+
+
+class MinMaxIndicesTests(SimpleTestCase):
+
+    def test_never_exceeds_threshold(self):
+        rng = np.random.default_rng(0)
+        y = rng.normal(size=200)
+        for threshold in range(2, 60):
+            with self.subTest(threshold=threshold):
+                indices = minmax_indices(y, threshold)
+                self.assertLessEqual(len(indices), threshold)
+                self.assertEqual(indices[0], 0)
+                self.assertEqual(indices[-1], len(y) - 1)
+                self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_odd_threshold_uses_every_slot(self):
+        y = np.sin(np.linspace(0, 20, 500))
+        self.assertEqual(len(minmax_indices(y, 3)), 3)
+        self.assertEqual(len(minmax_indices(y, 7)), 7)
+
+    def test_keeps_spikes(self):
+        y = np.zeros(1000)
+        y[123] = 50
+        y[876] = -50
+        indices = minmax_indices(y, 10)
+        self.assertIn(123, indices)
+        self.assertIn(876, indices)
+
+    def test_short_series_is_returned_unchanged(self):
+        self.assertEqual(list(minmax_indices([1, 2, 3], 10)), [0, 1, 2])
+
+
+class LttbIndicesTests(SimpleTestCase):
+
+    def test_returns_threshold_points(self):
+        x = np.arange(300)
+        y = np.sin(x / 10)
+        indices = lttb_indices(x, y, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 299)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_keeps_spike(self):
+        x = np.arange(1000)
+        y = np.zeros(1000)
+        y[500] = 100
+        self.assertIn(500, lttb_indices(x, y, 20))
+
+    def test_short_series_is_returned_unchanged(self):
+        self.assertEqual(list(lttb_indices([0, 1], [5, 6], 10)), [0, 1])
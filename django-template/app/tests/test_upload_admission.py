@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+上傳准入控制測試
+"""
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.http import JsonResponse
+from django.db.models import QuerySet
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from app.models.models import UploadAdmission, User
+from app.utils.upload_admission import (
+    _enqueue,
+    acquire_upload_slot,
+    get_admission_config,
+    get_upload_queue_status,
+    release_upload_slot,
+    upload_admission,
+)
+
+
+ADMISSION = {'GLOBAL_LIMIT': 2, 'PER_USER_LIMIT': 1, 'QUEUE_SIZE': 2, 'QUEUE_TIMEOUT': 30, 'QUEUE_POLL': 2}
+
+
+@override_settings(UPLOAD_ADMISSION=ADMISSION)
+class UploadAdmissionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(f'user{index}', f'user{index}@example.com', 'password')
+            for index in range(4)
+        ]
+
+    def _acquire(self, user, ticket=None):
+        return acquire_upload_slot(user, ticket, get_admission_config())
+
+    def test_limits_queue_and_handoff(self):
+        a, b, c, d = self.users
+
+        first, position = self._acquire(a)
+        self.assertIsNone(position)
+        # 同一使用者第二個上傳超過每人上限，排隊
+        second_ticket, position = self._acquire(a)
+        self.assertEqual(position, 1)
+        # 其他使用者仍可使用剩下的全域名額
+        _, position = self._acquire(b)
+        self.assertIsNone(position)
+        # 全域名額用完
+        c_ticket, position = self._acquire(c)
+        self.assertEqual(position, 2)
+        # 佇列已滿
+        ticket, position = self._acquire(d)
+        self.assertIsNone(ticket)
+        self.assertEqual(position, 0)
+
+        self.assertEqual(UploadAdmission.objects.filter(slot__isnull=False).count(), 2)
+
+        # 釋放 a 的名額後，a 排隊中的票證可以開始
+        release_upload_slot(first)
+        status = get_upload_queue_status(a, str(second_ticket.pk))
+        self.assertTrue(status['ticket']['ready'])
+        admitted, position = self._acquire(a, str(second_ticket.pk))
+        self.assertIsNone(position)
+        self.assertEqual(admitted.pk, second_ticket.pk)
+
+        # c 仍在等待（全域名額已滿）
+        status = get_upload_queue_status(c, str(c_ticket.pk))
+        self.assertEqual(status['ticket']['position'], 1)
+        self.assertFalse(status['ticket']['ready'])
+
+    def test_queue_limit_holds_when_read_is_stale(self):
+        a, b, c, d = self.users
+        self._acquire(a)
+        self._acquire(b)
+        self._acquire(a)
+        self._acquire(c)
+        # 其他 worker 在讀取佇列位置與寫入之間佔滿佇列：唯一限制拒絕寫入，不會超過 QUEUE_SIZE
+        with mock.patch.object(QuerySet, 'values_list', return_value=[]):
+            self.assertIsNone(_enqueue(d, get_admission_config()))
+        self.assertEqual(UploadAdmission.objects.filter(slot__isnull=True).count(), ADMISSION['QUEUE_SIZE'])
+
+    def test_admitted_ticket_frees_queue_slot(self):
+        a, b = self.users[:2]
+        first, _ = self._acquire(a)
+        ticket, _ = self._acquire(a)
+        self.assertIsNotNone(ticket.queue_slot)
+        release_upload_slot(first)
+        self._acquire(a, str(ticket.pk))
+        self.assertIsNone(UploadAdmission.objects.get(pk=ticket.pk).queue_slot)
+
+    def test_ticket_of_another_user_is_not_honoured(self):
+        a, b = self.users[:2]
+        self._acquire(a)
+        ticket, _ = self._acquire(a)
+        other, position = self._acquire(b, str(ticket.pk))
+        self.assertIsNone(position)
+        self.assertNotEqual(other.pk, ticket.pk)
+
+    def test_expired_rows_are_purged(self):
+        a, b = self.users[:2]
+        stale, _ = self._acquire(a)
+        UploadAdmission.objects.filter(pk=stale.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        _, position = self._acquire(a)
+        self.assertIsNone(position)
+        self.assertFalse(UploadAdmission.objects.filter(pk=stale.pk).exists())
+
+    def test_invalid_ticket_is_ignored(self):
+        status = get_upload_queue_status(self.users[0], 'not-a-ticket')
+        self.assertIsNone(status['ticket'])
+
+
+@override_settings(UPLOAD_ADMISSION=dict(ADMISSION, GLOBAL_LIMIT=1))
+class UploadAdmissionContextTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user('uploader', 'uploader@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+
+        def view(request):
+            with upload_admission(request) as rejected:
+                if rejected is not None:
+                    return rejected
+                view.active = UploadAdmission.objects.filter(slot__isnull=False).count()
+                return JsonResponse({'success': True})
+        self.view = view
+
+    def _post(self, user, data=None):
+        request = self.factory.post('/upload/', data or {})
+        request.user = user
+        return self.view(request)
+
+    def test_admitted_request_releases_slot(self):
+        response = self._post(self.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.view.active, 1)
+        self.assertFalse(UploadAdmission.objects.exists())
+
+    def test_busy_returns_ticket_without_blocking(self):
+        busy, _ = acquire_upload_slot(self.other, None, get_admission_config())
+        response = self._post(self.user)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+        data = json.loads(response.content)
+        self.assertEqual(data['queue_position'], 1)
+        self.assertFalse(data['queue_full'])
+
+        release_upload_slot(busy)
+        response = self._post(self.user, {'upload_ticket': data['ticket']})
+        self.assertEqual(response.status_code, 200)
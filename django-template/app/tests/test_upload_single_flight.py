@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+相同檔案上傳合併（single-flight）測試
+"""
+import hashlib
+from datetime import timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from app.models.models import UploadAdmission, UploadInFlight, User
+from app.utils.upload_admission import acquire_upload_slot, get_admission_config
+from app.utils.upload_utils import upload_single_flight
+
+
+FILE_HASH = 'a' * 64
+
+
+class UploadSingleFlightTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('uploader', 'uploader@example.com', 'password')
+
+    def test_leader_holds_row_until_done(self):
+        with upload_single_flight(FILE_HASH, 'green_bean', self.user) as is_leader:
+            self.assertTrue(is_leader)
+            row = UploadInFlight.objects.get(file_hash=FILE_HASH)
+            self.assertEqual(row.started_by, self.user)
+        self.assertFalse(UploadInFlight.objects.exists())
+
+    def test_row_released_when_leader_fails(self):
+        with self.assertRaises(RuntimeError):
+            with upload_single_flight(FILE_HASH, 'green_bean', self.user):
+                raise RuntimeError('解析失敗')
+        self.assertFalse(UploadInFlight.objects.exists())
+
+    def test_duplicate_returns_immediately_and_keeps_row(self):
+        UploadInFlight.objects.create(file_hash=FILE_HASH, file_type='green_bean')
+        with upload_single_flight(FILE_HASH, 'green_bean', self.user) as is_leader:
+            self.assertFalse(is_leader)
+        # 重複的請求不可清除處理中請求的鎖定列
+        self.assertTrue(UploadInFlight.objects.filter(file_hash=FILE_HASH).exists())
+
+    @override_settings(UPLOAD_IN_FLIGHT_STALE_SECONDS=60)
+    def test_stale_row_is_taken_over(self):
+        stale = UploadInFlight.objects.create(file_hash=FILE_HASH, file_type='green_bean')
+        UploadInFlight.objects.filter(pk=stale.pk).update(started_at=timezone.now() - timedelta(seconds=120))
+        with upload_single_flight(FILE_HASH, 'green_bean', self.user) as is_leader:
+            self.assertTrue(is_leader)
+            self.assertNotEqual(UploadInFlight.objects.get(file_hash=FILE_HASH).pk, stale.pk)
+
+    def test_nested_duplicate_in_same_worker(self):
+        with upload_single_flight(FILE_HASH, 'green_bean', self.user) as is_leader:
+            self.assertTrue(is_leader)
+            with upload_single_flight(FILE_HASH, 'green_bean', self.user) as duplicate_is_leader:
+                self.assertFalse(duplicate_is_leader)
+            self.assertTrue(UploadInFlight.objects.filter(file_hash=FILE_HASH).exists())
+        self.assertFalse(UploadInFlight.objects.exists())
+
+
+@override_settings(UPLOAD_ADMISSION={'GLOBAL_LIMIT': 1, 'PER_USER_LIMIT': 1, 'QUEUE_SIZE': 2})
+class DuplicateUploadViewTests(TestCase):
+
+    url = '/erp/green-bean-records/upload-file/'
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.user)
+
+    def test_duplicate_does_not_take_admission_slot(self):
+        content = b'duplicate upload'
+        UploadInFlight.objects.create(file_hash=hashlib.md5(content).hexdigest(), file_type='green_bean')
+        # 唯一的名額已被其他使用者佔用
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        _, position = acquire_upload_slot(other, None, get_admission_config())
+        self.assertIsNone(position)
+
+        upload = SimpleUploadedFile('records.xlsx', content)
+        response = self.client.post(self.url, {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['coalesced'])
+        self.assertEqual(UploadAdmission.objects.count(), 1)
@@ -8,8 +8,11 @@ from app.views.erp_views import (
     green_bean_records_api,
     green_bean_names_api,
     raw_material_records_api,
+    green_bean_changes_api,
+    raw_material_changes_api,
     inventory_statistics_api,
     production_statistics_api,
+    dashboard_widgets_api,
     green_bean_records_view,
     green_bean_upload_page,
     green_bean_upload_file,
@@ -18,6 +21,9 @@ from app.views.erp_views import (
     batch_delete_green_bean_records,
     delete_upload_record,
     get_upload_records,
+    upload_history_api,
+    upload_queue_status,
+    dashboard_events_unavailable,
     activity_log_view,
     add_activity_record,
     raw_material_upload_page,
@@ -25,6 +31,12 @@ from app.views.erp_views import (
     get_raw_material_upload_records,
     delete_raw_material_upload_record
 )
+from app.views.erp_analytics_views import (
+    green_bean_timeseries_api,
+    green_bean_intake_heatmap_api,
+    green_bean_cube_api,
+)
+from app.views.erp_export_views import export_green_bean_records_csv, export_raw_material_records_xlsx
 from app.views.permission_views import permissions_redirect_view
 
 
@@ -41,10 +53,21 @@ urlpatterns = [
 
     # 資料 API
     path('api/green-bean-records/', green_bean_records_api, name='green_bean_records_api'),
+    path('api/green-bean-records/changes/', green_bean_changes_api, name='green_bean_changes_api'),
+    path('api/green-bean-records/export/csv/', export_green_bean_records_csv, name='export_green_bean_records_csv'),
     path('api/green-bean-names/', green_bean_names_api, name='green_bean_names_api'),
     path('api/raw-material-records/', raw_material_records_api, name='raw_material_records_api'),
+    path('api/raw-material-records/changes/', raw_material_changes_api, name='raw_material_changes_api'),
+    path('api/raw-material-records/export/xlsx/', export_raw_material_records_xlsx, name='export_raw_material_records_xlsx'),
     path('api/inventory-statistics/', inventory_statistics_api, name='inventory_statistics_api'),
     path('api/production-statistics/', production_statistics_api, name='production_statistics_api'),
+    path('api/dashboard-widgets/', dashboard_widgets_api, name='dashboard_widgets_api'),
+    path('api/green-bean-timeseries/', green_bean_timeseries_api, name='green_bean_timeseries_api'),
+    path('api/green-bean-intake-heatmap/', green_bean_intake_heatmap_api, name='green_bean_intake_heatmap_api'),
+    path('api/green-bean-cube/', green_bean_cube_api, name='green_bean_cube_api'),
+    path('api/upload-history/', upload_history_api, name='upload_history_api'),
+    path('api/upload-queue-status/', upload_queue_status, name='upload_queue_status'),
+    path('api/dashboard-events/', dashboard_events_unavailable, name='dashboard_events'),
     
     # 生豆入庫記錄頁面
     path('green-bean-records/', green_bean_records_view, name='green_bean_records'),
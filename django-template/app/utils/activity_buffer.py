@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+用戶活動記錄緩衝寫入
+log_user_activity 只將活動事件放入行程內的有界佇列，由背景執行緒每批以 bulk_create
+寫入 UserActivityLog 與 Django 管理員日誌（LogEntry），不佔用請求的處理時間
+
+- 事件在呼叫端的交易提交後才放入佇列，回滾的操作不會留下活動記錄
+- 佇列已滿時改為由呼叫端直接寫入（不丟棄事件）
+- 行程結束時（atexit）寫入佇列中剩餘的事件
+- settings.ACTIVITY_LOG_SYNC = True 時不使用背景執行緒與交易提交掛鉤，呼叫時立即寫入（測試用）
+
+UserActivityLog.created_at 為 auto_now_add，時間為寫入當下，最多比實際發生時間晚一個寫入間隔
+"""
+import atexit
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+
+DEFAULT_BUFFER_CONFIG = {
+    'QUEUE_SIZE': 10000,     # 佇列最多暫存的事件數
+    'BATCH_SIZE': 200,       # 每批寫入的事件數
+    'FLUSH_INTERVAL': 1.0,   # 背景執行緒最長的寫入間隔（秒）
+}
+
+_STOP = object()
+
+
+def get_buffer_config():
+    config = dict(DEFAULT_BUFFER_CONFIG)
+    config.update(getattr(settings, 'ACTIVITY_LOG_BUFFER', {}))
+    return config
+
+
+def is_sync_mode():
+    return getattr(settings, 'ACTIVITY_LOG_SYNC', False)
+
+
+def write_activity_events(events):
+    """
+    寫入活動事件（UserActivityLog 與 LogEntry 各一次 bulk_create）
+
+    整批寫入失敗時逐筆重試，只略過有問題的事件
+    """
+    from django.contrib.admin.models import LogEntry
+    from app.models.models import UserActivityLog
+
+    if not events:
+        return
+
+    def build(event_list):
+        activity_logs = [UserActivityLog(**event['activity']) for event in event_list]
+        log_entries = [LogEntry(**event['log_entry']) for event in event_list if event.get('log_entry')]
+        return activity_logs, log_entries
+
+    try:
+        activity_logs, log_entries = build(events)
+        with transaction.atomic():
+            UserActivityLog.objects.bulk_create(activity_logs)
+            LogEntry.objects.bulk_create(log_entries)
+        return
+    except Exception as e:
+        if len(events) == 1:
+            print(f"記錄用戶活動失敗: {e}")
+            return
+        print(f"批次寫入用戶活動失敗，改為逐筆寫入: {e}")
+
+    for event in events:
+        write_activity_events([event])
+
+
+class ActivityLogBuffer:
+    """單一行程內的活動事件緩衝與背景寫入執行緒"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._atexit_registered = False
+
+    def _ensure_worker(self):
+        # fork 之後子行程沒有父行程的執行緒，依 pid 判斷是否需要重新啟動
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            config = get_buffer_config()
+            self._queue = queue.Queue(maxsize=config['QUEUE_SIZE'])
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def put(self, event):
+        """放入事件；佇列已滿時由呼叫端直接寫入"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            write_activity_events([event])
+
+    def _drain(self, first, batch_size):
+        batch = [first]
+        while len(batch) < batch_size:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(event)
+        return batch
+
+    def _run(self):
+        config = get_buffer_config()
+        while True:
+            try:
+                event = self._queue.get(timeout=config['FLUSH_INTERVAL'])
+            except queue.Empty:
+                continue
+            if event is _STOP:
+                return
+            batch = self._drain(event, config['BATCH_SIZE'])
+            close_old_connections()
+            try:
+                write_activity_events(batch)
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """在目前執行緒寫入佇列中所有事件（測試或結束前使用）"""
+        if self._queue is None:
+            return
+        batch = []
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not _STOP:
+                batch.append(event)
+        write_activity_events(batch)
+
+    def shutdown(self, timeout=5):
+        """停止背景執行緒並寫入剩餘事件"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        if self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+        self.flush()
+        self._thread = None
+
+
+_buffer = ActivityLogBuffer()
+
+
+def enqueue_activity_event(event):
+    """
+    登記活動事件：同步模式立即寫入，否則於交易提交後放入緩衝佇列（不在交易中時立即放入）
+
+    Args:
+        event: {'activity': UserActivityLog 欄位, 'log_entry': LogEntry 欄位或 None}
+    """
+    if is_sync_mode():
+        write_activity_events([event])
+    else:
+        transaction.on_commit(lambda: _buffer.put(event))
+
+
+def flush_activity_logs():
+    """立即寫入緩衝中的所有活動事件"""
+    _buffer.flush()
@@ -5,13 +5,18 @@
 """
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.admin.models import LogEntry, ADDITION, CHANGE, DELETION
+from django.utils import timezone
 from app.models.models import UserActivityLog
+from app.utils.activity_buffer import enqueue_activity_event
 
 
 def log_user_activity(user, action, description, content_object=None, request=None, details=None):
     """
     記錄用戶活動
     
+    活動事件交由 activity_buffer 於交易提交後批次寫入（ACTIVITY_LOG_SYNC 為 True 時立即寫入），
+    同時寫入 Django 的管理員日誌
+    
     Args:
         user: 用戶對象
         action: 操作類型 ('create', 'update', 'delete', 'upload', 'export', 'login', 'logout')
@@ -21,16 +26,20 @@ def log_user_activity(user, action, description, content_object=None, request=No
         details: 額外詳細信息（可選）
     """
     try:
+        if user is None or user.pk is None:
+            print(f"記錄用戶活動失敗: 沒有登入的用戶 ({description})")
+            return
+        
         activity_data = {
-            'user': user,
+            'user_id': user.pk,
             'action': action,
             'description': description,
             'details': details or {}
         }
         
-        # 如果有相關對象，設置 content_type 和 object_id
+        # 如果有相關對象，設置 content_type 和 object_id（ContentType 查詢有快取）
         if content_object:
-            activity_data['content_type'] = ContentType.objects.get_for_model(content_object)
+            activity_data['content_type_id'] = ContentType.objects.get_for_model(content_object).pk
             activity_data['object_id'] = content_object.pk
         
         # 如果有請求對象，提取 IP 和 User-Agent
@@ -45,20 +54,65 @@ def log_user_activity(user, action, description, content_object=None, request=No
             activity_data['ip_address'] = ip
             activity_data['user_agent'] = request.META.get('HTTP_USER_AGENT', '')
         
-        # 創建活動記錄
-        UserActivityLog.objects.create(**activity_data)
-        
-        # 同時記錄到 Django 的管理員日誌系統
-        _log_to_django_admin(user, action, description, content_object)
+        # 放入緩衝，由背景執行緒寫入活動記錄與管理員日誌
+        enqueue_activity_event({
+            'activity': activity_data,
+            'log_entry': _build_log_entry(user, action, description, content_object)
+        })
         
     except Exception as e:
         # 記錄錯誤但不影響主要業務流程
         print(f"記錄用戶活動失敗: {e}")
 
 
+# 將我們的動作類型映射到 Django 的日誌動作
+ACTION_FLAG_MAP = {
+    'create': ADDITION,
+    'update': CHANGE,
+    'delete': DELETION,
+    'upload': ADDITION,  # 上傳視為新增
+    'export': CHANGE,    # 匯出視為變更
+    'batch_delete': DELETION,
+    'delete_upload_record': DELETION,
+}
+
+
+def _build_log_entry(user, action, description, content_object=None):
+    """
+    產生 Django 管理員日誌（LogEntry）的欄位
+    
+    Args:
+        user: 用戶對象
+        action: 操作類型
+        description: 操作描述
+        content_object: 相關的對象（可選）
+    """
+    action_flag = ACTION_FLAG_MAP.get(action, CHANGE)  # 預設為變更
+    
+    # 如果有相關對象，記錄到該對象的日誌；否則記錄到 UserActivityLog 模型
+    if content_object:
+        content_type_id = ContentType.objects.get_for_model(content_object).pk
+        object_id = str(content_object.pk)
+        object_repr = str(content_object)
+    else:
+        content_type_id = ContentType.objects.get_for_model(UserActivityLog).pk
+        object_id = None
+        object_repr = f"系統操作: {description}"
+    
+    return {
+        'action_time': timezone.now(),
+        'user_id': user.pk,
+        'content_type_id': content_type_id,
+        'object_id': object_id,
+        'object_repr': object_repr[:200],
+        'action_flag': action_flag,
+        'change_message': description
+    }
+
+
 def _log_to_django_admin(user, action, description, content_object=None):
     """
-    記錄操作到 Django 管理員日誌系統
+    立即記錄操作到 Django 管理員日誌系統
     
     Args:
         user: 用戶對象
@@ -67,39 +121,7 @@ def _log_to_django_admin(user, action, description, content_object=None):
         content_object: 相關的對象（可選）
     """
     try:
-        # 將我們的動作類型映射到 Django 的日誌動作
-        action_flag_map = {
-            'create': ADDITION,
-            'update': CHANGE,
-            'delete': DELETION,
-            'upload': ADDITION,  # 上傳視為新增
-            'export': CHANGE,    # 匯出視為變更
-            'batch_delete': DELETION,
-            'delete_upload_record': DELETION,
-        }
-        
-        action_flag = action_flag_map.get(action, CHANGE)  # 預設為變更
-        
-        # 如果有相關對象，記錄到該對象的日誌
-        if content_object:
-            LogEntry.objects.log_action(
-                user_id=user.pk,
-                content_type_id=ContentType.objects.get_for_model(content_object).pk,
-                object_id=content_object.pk,
-                object_repr=str(content_object),
-                action_flag=action_flag,
-                change_message=description
-            )
-        else:
-            # 如果沒有相關對象，記錄到 UserActivityLog 模型
-            LogEntry.objects.log_action(
-                user_id=user.pk,
-                content_type_id=ContentType.objects.get_for_model(UserActivityLog).pk,
-                object_id=None,
-                object_repr=f"系統操作: {description}",
-                action_flag=action_flag,
-                change_message=description
-            )
+        LogEntry.objects.create(**_build_log_entry(user, action, description, content_object))
     except Exception as e:
         # 記錄錯誤但不影響主要業務流程
         print(f"記錄到管理員日誌失敗: {e}")
@@ -180,10 +202,43 @@ def get_important_user_activities(user=None, limit=50):
     return queryset.order_by('-created_at')[:limit]
 
 
-def get_weekly_charts_data():
+# 儀表板趨勢圖可選的天數範圍
+CHART_WINDOW_CHOICES = (7, 14, 30, 90, 365)
+DEFAULT_CHART_WINDOW = 14
+
+
+def parse_chart_window(value):
+    """解析趨勢圖天數參數，不在可選範圍內時使用預設值"""
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_CHART_WINDOW
+    return days if days in CHART_WINDOW_CHOICES else DEFAULT_CHART_WINDOW
+
+
+def _count_records_by_day(model, start):
+    """以 created_at 的日期分組，一次查詢取得每日記錄數"""
+    from django.db.models import Count
+    from django.db.models.functions import TruncDate
+
+    rows = (
+        model.objects.filter(created_at__gte=start)
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(count=Count('id'))
+        .values_list('day', 'count')
+    )
+    return dict(rows)
+
+
+def get_weekly_charts_data(days=DEFAULT_CHART_WINDOW):
     """
     獲取生豆入庫和原料倉管理的每日統計數據，用於繪製折線圖
-    顯示過去14天的數據，包含今天到目前為止的數據
+    顯示過去指定天數的數據，包含今天到目前為止的數據
+    每個資料表只執行一次 GROUP BY 日期查詢，沒有記錄的日期補 0
+    
+    Args:
+        days: 天數範圍（CHART_WINDOW_CHOICES 其中之一）
     
     Returns:
         dict: 包含兩個系列數據的字典
@@ -192,56 +247,46 @@ def get_weekly_charts_data():
     from datetime import timedelta
     from app.models import GreenBeanInboundRecord, RawMaterialWarehouseRecord
     
+    if days not in CHART_WINDOW_CHOICES:
+        days = DEFAULT_CHART_WINDOW
+    
     now = timezone.now()
+    today = now.date()
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    
+    # 使用 created_at（記錄創建時間）而不是 record_time（業務記錄時間），因為 record_time 可能是歷史日期
+    try:
+        green_bean_counts = _count_records_by_day(GreenBeanInboundRecord, start)
+    except Exception as e:
+        print(f"計算生豆入庫每日記錄數時出現錯誤: {e}")
+        green_bean_counts = {}
+    
+    try:
+        raw_material_counts = _count_records_by_day(RawMaterialWarehouseRecord, start)
+    except Exception as e:
+        print(f"計算原料倉每日記錄數時出現錯誤: {e}")
+        raw_material_counts = {}
+    
+    # 長範圍的標籤加上年份，避免跨年時混淆
+    label_format = '%Y/%m/%d' if days > 90 else '%m/%d'
     
-    # 計算過去14天的數據（包含今天）
     days_data = []
     green_bean_data = []
     raw_material_data = []
     
-    for i in range(13, -1, -1):  # 從13天前到今天
-        # 計算該天的開始時間
-        day_start = now - timedelta(days=i)
-        day_start = day_start.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # 計算該天的結束時間
-        if i == 0:  # 今天：結束時間是現在
-            day_end = now
-            day_label = day_start.strftime('%m/%d') + '(今日)'
-        else:  # 過去的天：結束時間是當天晚上11:59:59
-            day_end = day_start + timedelta(hours=23, minutes=59, seconds=59)
-            day_label = day_start.strftime('%m/%d')
+    for i in range(days - 1, -1, -1):  # 從最早一天到今天
+        day = today - timedelta(days=i)
+        day_label = day.strftime(label_format)
+        if i == 0:
+            day_label += '(今日)'
         
         days_data.append(day_label)
-        
-        # 計算生豆入庫記錄數 - 優先使用 created_at，因為 record_time 可能是歷史日期
-        green_bean_count = 0
-        try:
-            # 使用 created_at（記錄創建時間）而不是 record_time（業務記錄時間）
-            green_bean_count = GreenBeanInboundRecord.objects.filter(
-                created_at__gte=day_start,
-                created_at__lte=day_end
-            ).count()
-            
-        except Exception as e:
-            green_bean_count = 0
-            
-        green_bean_data.append(green_bean_count)
-        
-        # 計算原料倉記錄數
-        raw_material_count = 0
-        try:
-            raw_material_count = RawMaterialWarehouseRecord.objects.filter(
-                created_at__gte=day_start,
-                created_at__lte=day_end
-            ).count()
-        except Exception as e:
-            raw_material_count = 0
-            
-        raw_material_data.append(raw_material_count)
+        green_bean_data.append(green_bean_counts.get(day, 0))
+        raw_material_data.append(raw_material_counts.get(day, 0))
     
     return {
         'weeks': days_data,  # 保持原來的鍵名以免破壞前端程式碼
+        'days': days,
         'green_bean_data': green_bean_data,
         'raw_material_data': raw_material_data
     }
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+BI 資料集匯出（Arrow IPC / Parquet）
+生豆入庫記錄、原料倉記錄與原料倉每日異動（由 dynamic_fields 攤平）以固定型別的欄式格式輸出，
+資料以 keyset 分批讀取，每批直接轉為一個 RecordBatch 寫出，記憶體用量只與批次大小有關
+
+數值欄位輸出為 float64、時間為 timestamp，讀取端可零複製轉為 NumPy / pandas
+pyarrow 只在匯出時載入
+"""
+import os
+
+from app.models.models import GreenBeanInboundRecord, RawMaterialWarehouseRecord
+from app.utils.dynamic_fields import get_record_day, key_date, parse_date_key
+from app.utils.pagination import iterate_keyset
+
+
+EXPORT_FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+DEFAULT_BATCH_SIZE = 50000
+
+# 欄位名稱 -> Arrow 型別名稱
+GREEN_BEAN_COLUMNS = [
+    ('id', 'string'),
+    ('is_abnormal', 'bool'),
+    ('record_time', 'timestamp'),
+    ('order_number', 'string'),
+    ('roasted_item_sequence', 'int32'),
+    ('green_bean_item_sequence', 'int32'),
+    ('batch_sequence', 'int32'),
+    ('execution_status', 'string'),
+    ('green_bean_batch_number', 'string'),
+    ('green_bean_code', 'string'),
+    ('green_bean_name', 'string'),
+    ('green_bean_storage_silo', 'string'),
+    ('bag_weight_kg', 'float64'),
+    ('input_bag_count', 'int32'),
+    ('required_weight_kg', 'float64'),
+    ('measured_weight_kg', 'float64'),
+    ('manual_input_weight_kg', 'float64'),
+    ('work_start_time', 'timestamp'),
+    ('work_end_time', 'timestamp'),
+    ('work_duration', 'string'),
+    ('ico_code', 'string'),
+    ('created_at', 'timestamp'),
+    ('updated_at', 'timestamp'),
+]
+
+RAW_MATERIAL_COLUMNS = [
+    ('id', 'string'),
+    ('product_code', 'string'),
+    ('product_name', 'string'),
+    ('factory_batch_number', 'string'),
+    ('international_batch_number', 'string'),
+    ('standard_weight_kg', 'float64'),
+    ('previous_month_inventory', 'float64'),
+    ('incoming_stock', 'float64'),
+    ('outgoing_stock', 'float64'),
+    ('current_inventory', 'float64'),
+    ('record_date', 'date'),
+    ('created_at', 'timestamp'),
+    ('updated_at', 'timestamp'),
+]
+
+RAW_MATERIAL_MOVEMENT_COLUMNS = [
+    ('record_id', 'string'),
+    ('product_code', 'string'),
+    ('product_name', 'string'),
+    ('movement_date', 'date'),
+    ('movement_type', 'string'),
+    ('carry_over', 'bool'),
+    ('quantity', 'float64'),
+    ('source_key', 'string'),
+]
+
+# 攤平為每日異動的異動類型
+MOVEMENT_TYPES = ('入庫', '領用', '轉出')
+
+
+def _arrow_type(pa, name):
+    return {
+        'string': pa.string(),
+        'bool': pa.bool_(),
+        'int32': pa.int32(),
+        'float64': pa.float64(),
+        'timestamp': pa.timestamp('us'),
+        'date': pa.date32(),
+    }[name]
+
+
+def _schema(pa, columns):
+    return pa.schema([(name, _arrow_type(pa, type_name)) for name, type_name in columns])
+
+
+def _convert(value, type_name):
+    """Python 值轉為對應 Arrow 型別可接受的值"""
+    if value is None:
+        return None
+    if type_name == 'string':
+        return str(value)
+    if type_name == 'float64':
+        return float(value)
+    return value
+
+
+def flatten_raw_material_movements(row):
+    """
+    將原料倉記錄的日期動態欄位攤平為每日異動
+
+    異動日期的年份與 XLSX 匯出相同，由 dynamic_fields.infer_key_year() 推得
+
+    Args:
+        row: 包含 id、product_code、product_name、record_date、created_at、dynamic_fields 的字典
+
+    Returns:
+        list: 每個異動一個字典（欄位同 RAW_MATERIAL_MOVEMENT_COLUMNS），沒有數值的欄位略過
+    """
+    movements = []
+    record_day = get_record_day(row)
+    for key, value in (row['dynamic_fields'] or {}).items():
+        parsed = parse_date_key(key)
+        if parsed is None or parsed[2] not in MOVEMENT_TYPES:
+            continue
+        _, _, movement_type, carry_over = parsed
+        try:
+            quantity = float(value)
+        except (TypeError, ValueError):
+            continue
+        movements.append({
+            'record_id': row['id'],
+            'product_code': row['product_code'],
+            'product_name': row['product_name'],
+            'movement_date': key_date(key, record_day),
+            'movement_type': movement_type,
+            'carry_over': carry_over,
+            'quantity': quantity,
+            'source_key': key,
+        })
+    return movements
+
+
+class _DatasetWriter:
+    """以固定 schema 分批寫出 Arrow IPC 或 Parquet 檔案"""
+
+    def __init__(self, pa, path, columns, export_format):
+        self.pa = pa
+        self.columns = columns
+        self.schema = _schema(pa, columns)
+        self.rows = 0
+        if export_format == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        arrays = [
+            self.pa.array([_convert(row[name], type_name) for row in rows], type=self.schema.field(name).type)
+            for name, type_name in self.columns
+        ]
+        self._writer.write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+
+
+def _batched(iterator, batch_size):
+    batch = []
+    for row in iterator:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_green_bean_records(path, export_format='parquet', batch_size=DEFAULT_BATCH_SIZE):
+    """
+    匯出生豆入庫記錄
+
+    Returns:
+        int: 匯出筆數
+    """
+    import pyarrow as pa
+
+    queryset = GreenBeanInboundRecord.objects.values(*[name for name, _ in GREEN_BEAN_COLUMNS])
+    writer = _DatasetWriter(pa, path, GREEN_BEAN_COLUMNS, export_format)
+    try:
+        rows = iterate_keyset(queryset, 'created_at', batch_size=batch_size, descending=False)
+        for batch in _batched(rows, batch_size):
+            writer.write(batch)
+    finally:
+        writer.close()
+    return writer.rows
+
+
+def export_raw_material_records(records_path, movements_path, export_format='parquet', batch_size=DEFAULT_BATCH_SIZE):
+    """
+    匯出原料倉記錄與攤平後的每日異動（同一次掃描寫出兩個檔案）
+
+    Returns:
+        tuple: (記錄筆數, 異動筆數)
+    """
+    import pyarrow as pa
+
+    fields = [name for name, _ in RAW_MATERIAL_COLUMNS] + ['dynamic_fields']
+    queryset = RawMaterialWarehouseRecord.objects.values(*fields)
+    records_writer = _DatasetWriter(pa, records_path, RAW_MATERIAL_COLUMNS, export_format)
+    movements_writer = _DatasetWriter(pa, movements_path, RAW_MATERIAL_MOVEMENT_COLUMNS, export_format)
+    try:
+        rows = iterate_keyset(queryset, 'created_at', batch_size=batch_size, descending=False)
+        for batch in _batched(rows, batch_size):
+            records_writer.write(batch)
+            movements_writer.write([
+                movement for row in batch for movement in flatten_raw_material_movements(row)
+            ])
+    finally:
+        records_writer.close()
+        movements_writer.close()
+    return records_writer.rows, movements_writer.rows
+
+
+def export_bi_dataset(output_dir, export_format='parquet', tables=('green_bean', 'raw_material'),
+                      batch_size=DEFAULT_BATCH_SIZE):
+    """
+    匯出 BI 資料集到目錄
+
+    Returns:
+        dict: {檔案路徑: 筆數}
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'不支援的匯出格式: {export_format}')
+    os.makedirs(output_dir, exist_ok=True)
+    extension = EXPORT_FORMATS[export_format]
+    results = {}
+
+    if 'green_bean' in tables:
+        path = os.path.join(output_dir, f'green_bean_records{extension}')
+        results[path] = export_green_bean_records(path, export_format, batch_size)
+
+    if 'raw_material' in tables:
+        records_path = os.path.join(output_dir, f'raw_material_records{extension}')
+        movements_path = os.path.join(output_dir, f'raw_material_movements{extension}')
+        record_count, movement_count = export_raw_material_records(
+            records_path, movements_path, export_format, batch_size
+        )
+        results[records_path] = record_count
+        results[movements_path] = movement_count
+
+    return results
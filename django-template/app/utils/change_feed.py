@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+記錄變更摘要（change feed）
+回傳游標之後新增或修改的記錄（依 (updated_at, id) 排序）以及已刪除記錄的墓碑，
+客戶端只需下載異動的部分即可同步
+
+updated_at 是在儲存時（交易提交前）決定的：長時間的上傳交易提交時，其記錄的 updated_at
+可能早於其他已回傳的記錄。因此摘要只回傳早於「安全上限」的異動——上限取目前時間減去
+CHANGE_FEED_SETTLE_SECONDS 以及處理中上傳（UploadInFlight）最早的開始時間兩者較早者，
+游標不會越過尚未提交的資料
+
+墓碑則在刪除交易提交後才一次寫入（deleted_at 即為提交時間），大量刪除不會在交易中逐筆 INSERT，
+也不會出現早於安全上限、卻尚未提交的墓碑。墓碑保留 CHANGE_FEED_TOMBSTONE_RETENTION_DAYS 天，
+同步進度早於保留期限的游標無法得知所有刪除，會要求客戶端重新完整同步
+"""
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min, Q
+
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def _get_settle_seconds():
+    return getattr(settings, 'CHANGE_FEED_SETTLE_SECONDS', 5)
+
+
+def get_safe_until():
+    """變更摘要可回傳的異動時間上限（不含）"""
+    from app.models.models import UploadInFlight
+
+    safe_until = datetime.now() - timedelta(seconds=_get_settle_seconds())
+    oldest_upload = UploadInFlight.objects.aggregate(oldest=Min('started_at'))['oldest']
+    if oldest_upload is not None and oldest_upload < safe_until:
+        safe_until = oldest_upload
+    return safe_until
+
+
+def _get_retention_days():
+    return getattr(settings, 'CHANGE_FEED_TOMBSTONE_RETENTION_DAYS', 30)
+
+
+def get_retention_cutoff():
+    """早於此時間的墓碑會被清除"""
+    return datetime.now() - timedelta(days=_get_retention_days())
+
+
+class CursorExpired(ValueError):
+    """游標的同步進度早於墓碑保留期限，客戶端需重新完整同步"""
+
+
+# 每批寫入的墓碑數
+TOMBSTONE_BATCH_SIZE = 1000
+
+_local = threading.local()
+
+
+def _write_tombstones(pending):
+    """交易提交後寫入墓碑並清除超過保留期限的墓碑"""
+    from app.models.models import RecordTombstone
+
+    try:
+        # 不包在交易中：每批在寫入當下決定 deleted_at 並立即可見
+        RecordTombstone.objects.bulk_create(
+            [RecordTombstone(table=table, record_id=record_id) for table, record_id in pending],
+            batch_size=TOMBSTONE_BATCH_SIZE
+        )
+        cutoff = get_retention_cutoff()
+        for table in {table for table, _ in pending}:
+            RecordTombstone.objects.filter(table=table, deleted_at__lt=cutoff).delete()
+    except Exception as e:
+        # 刪除已提交，墓碑寫入失敗不影響回應
+        print(f"寫入刪除墓碑失敗: {e}")
+
+
+def record_tombstone(table, record_id):
+    """
+    登記已刪除的記錄（由 post_delete signal 呼叫）
+
+    同一交易中的刪除合併為一份清單，於交易提交後一次寫入；交易回滾時不寫入
+    """
+    pending = getattr(_local, 'pending', None)
+    callback = getattr(_local, 'callback', None)
+    registered = (
+        connection.in_atomic_block and callback is not None
+        and any(entry[1] is callback for entry in connection.run_on_commit)
+    )
+    if not registered:
+        pending = []
+        callback = lambda: _write_tombstones(pending)
+        _local.pending, _local.callback = pending, callback
+        transaction.on_commit(callback)
+    pending.append((table, record_id))
+
+
+# 游標欄位：記錄的 (updated_at, id)、墓碑的 (deleted_at, tid)，
+# 以及 s：此時間之前的墓碑都已回傳給客戶端
+CURSOR_FIELDS = {
+    'u': datetime.fromisoformat,
+    'id': uuid.UUID,
+    'd': datetime.fromisoformat,
+    'tid': int,
+    's': datetime.fromisoformat,
+}
+
+
+def _position(values, value_key, id_key):
+    if values.get(value_key) is None:
+        return None
+    if values.get(id_key) is None:
+        raise ValueError('無效的分頁游標')
+    return values[value_key], values[id_key]
+
+
+def _after(queryset, field, position):
+    """(field, id) 大於游標位置的資料"""
+    if position is None:
+        return queryset
+    value, last_id = position
+    return queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': last_id}))
+
+
+def _page(queryset, field, position, safe_until, limit):
+    """
+    讀取游標之後、安全上限之前的一頁
+
+    Returns:
+        tuple: (資料列表, 新的游標位置, 是否還有更多)
+    """
+    queryset = _after(queryset.filter(**{f'{field}__lt': safe_until}), field, position)
+    rows = list(queryset.order_by(field, 'id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        last = rows[-1]
+        position = (last[field], last['id'])
+    return rows, position, has_more
+
+
+def _serialize_position(position):
+    if position is None:
+        return None, None
+    value, last_id = position
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return value, str(last_id)
+
+
+def get_changes(model, table, fields, cursor=None, limit=500):
+    """
+    取得游標之後的記錄異動與刪除
+
+    Args:
+        model: 記錄模型
+        table: data_version 中的資料表名稱（墓碑以此區分）
+        fields: 回傳的記錄欄位（需包含 id 與 updated_at）
+        cursor: 上一次回傳的 next_cursor（可選，未提供時從頭開始）
+        limit: 每次最多回傳的異動筆數與刪除筆數
+
+    Returns:
+        dict: {'changes': [...], 'deleted': [...], 'next_cursor': ..., 'has_more': bool}
+
+    Raises:
+        CursorExpired: 游標的同步進度早於墓碑保留期限
+        ValueError: 游標格式錯誤
+    """
+    from app.models.models import RecordTombstone
+
+    values = decode_cursor(cursor, CURSOR_FIELDS) if cursor else {}
+    change_position = _position(values, 'u', 'id')
+    tombstone_position = _position(values, 'd', 'tid')
+    if cursor and (values['s'] is None or values['s'] < get_retention_cutoff()):
+        raise CursorExpired('游標已過期，部分刪除記錄已清除，請重新完整同步')
+
+    safe_until = get_safe_until()
+
+    changes, change_position, more_changes = _page(
+        model.objects.values(*fields), 'updated_at', change_position, safe_until, limit
+    )
+    tombstones, tombstone_position, more_tombstones = _page(
+        RecordTombstone.objects.filter(table=table).values('id', 'record_id', 'deleted_at'),
+        'deleted_at', tombstone_position, safe_until, limit
+    )
+
+    # 墓碑已讀完時，安全上限之前的刪除都已回傳；否則只到本頁最後一個墓碑
+    synced_until = tombstone_position[0] if more_tombstones else safe_until
+
+    updated_at, last_id = _serialize_position(change_position)
+    deleted_at, tombstone_id = _serialize_position(tombstone_position)
+    next_cursor = encode_cursor({
+        'u': updated_at, 'id': last_id, 'd': deleted_at, 'tid': tombstone_id,
+        's': synced_until.isoformat(),
+    })
+
+    return {
+        'changes': changes,
+        'deleted': [str(row['record_id']) for row in tombstones],
+        'next_cursor': next_cursor,
+        'has_more': more_changes or more_tombstones,
+    }
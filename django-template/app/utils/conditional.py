@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+條件式 GET（ETag / Last-Modified）
+以資料版本號（見 data_version）與查詢參數產生驗證值，資料未異動時直接回應 304，
+不執行查詢與序列化；驗證值只需讀取快取中的版本號
+"""
+import hashlib
+from datetime import datetime, time, timezone
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from app.utils.data_version import get_data_versions
+
+
+def _validator_parts(request, tables, daily):
+    versions = get_data_versions(tables)
+    parts = [request.path, request.GET.urlencode()]
+    parts.extend(f'{table}:{versions[table]}' for table in tables)
+    if daily:
+        parts.append(datetime.now().date().isoformat())
+    return versions, parts
+
+
+def _is_success(response):
+    return 200 <= response.status_code < 300
+
+
+def conditional_on_data(*tables, daily=False):
+    """
+    裝飾器：依資料表版本號提供 ETag 與 Last-Modified，客戶端資料仍有效時回應 304
+
+    應放在權限檢查之後（最內層），未通過權限檢查的請求不會取得驗證值。
+    只有 2xx 回應帶有驗證值：錯誤回應不會被客戶端以驗證值快取，之後也不會以 304 沿用錯誤內容；
+    客戶端持有的驗證值必定來自成功的回應，因此驗證值相符時才可直接回應 304
+
+    Args:
+        tables: 回應內容依賴的資料表（data_version 中的名稱）
+        daily: 回應內容是否依賴今日日期（例如「最近 N 天」），為 True 時日期改變即失效
+    """
+    def get_validators(request):
+        versions, parts = _validator_parts(request, tables, daily)
+        etag = quote_etag(hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest())
+        # 版本號不小於異動當下的毫秒時間，可作為最後異動時間
+        last_modified = datetime.fromtimestamp(max(versions.values()) / 1000, tz=timezone.utc)
+        if daily:
+            today_start = datetime.combine(datetime.now().date(), time.min).astimezone(timezone.utc)
+            last_modified = max(last_modified, today_start)
+        return etag, int(last_modified.timestamp())
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            etag, last_modified = get_validators(request)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if not _is_success(response):
+                    return response
+
+            if not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            response.headers.setdefault('ETag', etag)
+            return response
+        return _wrapped_view
+    return decorator
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+儀表板即時更新（Server-Sent Events）
+以原生 ASGI 應用提供 SSE 串流（Django 4.1 尚不支援非同步串流回應），由 DjangoTemplate/asgi.py 掛載
+
+每個 worker 行程只有一個廣播器：定期讀取資料版本號（快取讀取），版本改變時重新計算
+該資料表的統計一次，只將有變動的欄位推送給所有訂閱中的儀表板
+"""
+import asyncio
+import json
+from datetime import datetime
+from http.cookies import SimpleCookie
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from app.utils.dashboard_stats import get_section_stats
+from app.utils.data_version import DATA_TABLES, get_data_versions
+
+
+DASHBOARD_EVENTS_PATH = '/erp/api/dashboard-events/'
+
+# 每位訂閱者最多暫存的訊息數，超過時改送完整快照
+SUBSCRIBER_QUEUE_SIZE = 50
+
+
+def _get_poll_interval():
+    return getattr(settings, 'DASHBOARD_EVENTS_POLL_SECONDS', 2)
+
+
+def _get_heartbeat_interval():
+    return getattr(settings, 'DASHBOARD_EVENTS_HEARTBEAT_SECONDS', 15)
+
+
+def _format_event(event, data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f'event: {event}\ndata: {payload}\n\n'.encode('utf-8')
+
+
+class DashboardBroadcaster:
+    """單一行程內的儀表板統計廣播器"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._snapshot = {}
+        self._state = {}
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    async def get_snapshot(self):
+        """取得目前所有資料表的統計（必要時先計算）"""
+        if len(self._snapshot) < len(DATA_TABLES):
+            await self._refresh()
+        return dict(self._snapshot)
+
+    async def _run(self):
+        # 沒有訂閱者時停止輪詢，下一個訂閱者會重新啟動
+        while self._subscribers:
+            try:
+                await self._refresh()
+            except Exception as e:
+                print(f"儀表板統計廣播更新失敗: {e}")
+            await asyncio.sleep(_get_poll_interval())
+
+    async def _refresh(self):
+        async with self._lock:
+            versions = await sync_to_async(get_data_versions)()
+            today = datetime.now().date()
+
+            for table, version in versions.items():
+                # 日期改變時今日、本週等統計也會改變
+                state = (version, today)
+                if self._state.get(table) == state:
+                    continue
+
+                stats = await sync_to_async(get_section_stats)(table)
+                previous = self._snapshot.get(table)
+                self._snapshot[table] = stats
+                self._state[table] = state
+
+                if previous is None:
+                    continue
+                changes = {key: value for key, value in stats.items() if previous.get(key) != value}
+                if changes:
+                    self._publish({'section': table, 'version': version, 'changes': changes})
+
+    def _publish(self, message):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(('stats', message))
+            except asyncio.QueueFull:
+                # 訂閱者處理太慢，清空暫存改送完整快照
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(('snapshot', None))
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = DashboardBroadcaster()
+    return _broadcaster
+
+
+class _SessionRequest:
+    """只帶有 session 的請求物件，供 django.contrib.auth.get_user 使用"""
+
+    def __init__(self, session):
+        self.session = session
+
+
+def _get_user_sections(cookie_header):
+    """
+    由 session cookie 取得使用者與可查看的資料表
+
+    Returns:
+        list: 可查看的資料表名稱；未登入時為 None
+    """
+    from importlib import import_module
+    from django.contrib.auth import get_user
+    from app.utils.permission_utils import get_user_accessible_sections
+
+    cookies = SimpleCookie()
+    cookies.load(cookie_header)
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+
+    session_store = import_module(settings.SESSION_ENGINE).SessionStore
+    user = get_user(_SessionRequest(session_store(morsel.value)))
+    if not user.is_authenticated:
+        return None
+
+    sections = get_user_accessible_sections(user)
+    return [table for table in DATA_TABLES if sections.get(table)]
+
+
+async def _send_response(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+    })
+    await send({'type': 'http.response.body', 'body': body.encode('utf-8')})
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+def _filter_snapshot(snapshot, tables):
+    return {table: snapshot[table] for table in tables if table in snapshot}
+
+
+async def dashboard_events_app(scope, receive, send):
+    """
+    儀表板統計 SSE 端點
+
+    事件：
+        snapshot: 連線時（或訂閱者落後時）傳送的完整統計 {section: {...}}
+        stats: 統計變動 {section, version, changes}
+    """
+    if scope['method'] != 'GET':
+        await _send_response(send, 405, 'Method Not Allowed')
+        return
+
+    headers = dict(scope.get('headers') or [])
+    cookie_header = headers.get(b'cookie', b'').decode('latin-1')
+    tables = await sync_to_async(_get_user_sections)(cookie_header)
+    if not tables:
+        await _send_response(send, 403, 'Forbidden')
+        return
+
+    broadcaster = get_broadcaster()
+    queue = broadcaster.subscribe()
+    disconnect_task = asyncio.ensure_future(_wait_for_disconnect(receive))
+
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        snapshot = await broadcaster.get_snapshot()
+        await send({
+            'type': 'http.response.body',
+            'body': _format_event('snapshot', _filter_snapshot(snapshot, tables)),
+            'more_body': True,
+        })
+
+        while True:
+            get_task = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {get_task, disconnect_task},
+                timeout=_get_heartbeat_interval(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+
+            if disconnect_task in done:
+                get_task.cancel()
+                break
+
+            if get_task in done:
+                event, message = get_task.result()
+                if event == 'snapshot':
+                    snapshot = await broadcaster.get_snapshot()
+                    body = _format_event('snapshot', _filter_snapshot(snapshot, tables))
+                elif message['section'] in tables:
+                    body = _format_event('stats', message)
+                else:
+                    continue
+            else:
+                get_task.cancel()
+                # 心跳註解，避免代理伺服器關閉閒置連線
+                body = b': ping\n\n'
+
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        broadcaster.unsubscribe(queue)
+        disconnect_task.cancel()
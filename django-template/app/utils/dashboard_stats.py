@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+儀表板統計服務
+每個資料表的儀表板指標以單一條件聚合查詢（Count/Sum 搭配 filter）取得，
+日期條件使用範圍比較，讓資料庫可以使用索引；生豆入庫指標讀取每日彙總表
+
+結果存放在設定的快取中，快取鍵包含資料版本號（見 data_version）與今日日期，
+上傳、編輯、刪除記錄後版本號遞增，快取自然失效
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from app.utils.data_version import GREEN_BEAN, RAW_MATERIAL, get_data_version, get_data_versions
+
+
+# 低庫存警示門檻
+LOW_INVENTORY_THRESHOLD = 100
+
+
+def _get_date_ranges():
+    """取得今日、本週、本月的起訖時間（起始含、結束不含）"""
+    today = datetime.now().date()
+    today_start = datetime.combine(today, time.min)
+    week_start = today_start - timedelta(days=today.weekday())
+    month_start = today_start.replace(day=1)
+    if month_start.month == 12:
+        next_month_start = month_start.replace(year=month_start.year + 1, month=1)
+    else:
+        next_month_start = month_start.replace(month=month_start.month + 1)
+
+    return {
+        'today_start': today_start,
+        'tomorrow_start': today_start + timedelta(days=1),
+        'week_start': week_start,
+        'month_start': month_start,
+        'next_month_start': next_month_start,
+    }
+
+
+def get_green_bean_dashboard_stats():
+    """
+    生豆入庫儀表板指標（單一查詢，讀取每日彙總表）
+
+    Returns:
+        dict: 儀表板使用的統計欄位
+    """
+    from app.models.models import GreenBeanDailyRollup
+
+    ranges = _get_date_ranges()
+    today_q = Q(day=ranges['today_start'].date())
+    week_q = Q(day__gte=ranges['week_start'].date())
+    month_q = Q(day__gte=ranges['month_start'].date(), day__lt=ranges['next_month_start'].date())
+
+    result = GreenBeanDailyRollup.objects.aggregate(
+        total_records=Sum('record_count'),
+        today_records=Sum('record_count', filter=today_q),
+        month_records=Sum('record_count', filter=month_q),
+        abnormal_records=Sum('abnormal_count'),
+        total_weight=Sum('total_measured_weight_kg'),
+        week_weight=Sum('total_measured_weight_kg', filter=week_q),
+        month_weight=Sum('total_measured_weight_kg', filter=month_q),
+        month_weighed=Sum('weighed_count', filter=month_q),
+    )
+
+    month_weighed = result['month_weighed'] or 0
+    month_avg_weight = float(result['month_weight'] or 0) / month_weighed if month_weighed else 0
+
+    return {
+        'total_green_bean_records': result['total_records'] or 0,
+        'recent_abnormal_records': result['abnormal_records'] or 0,
+        'current_month_records': result['month_records'] or 0,
+        'today_green_bean_records': result['today_records'] or 0,
+        'total_green_bean_weight': round(float(result['total_weight'] or 0), 2),
+        'week_total_weight': round(float(result['week_weight'] or 0), 2),
+        'month_avg_weight': round(month_avg_weight, 2),
+    }
+
+
+def get_raw_material_dashboard_stats():
+    """
+    原料倉儀表板指標（單一查詢）
+
+    原料倉記錄沒有記錄時間，本月出入庫次數以建立時間計算
+
+    Returns:
+        dict: 儀表板使用的統計欄位
+    """
+    from app.models.models import RawMaterialWarehouseRecord
+
+    ranges = _get_date_ranges()
+    month_q = Q(created_at__gte=ranges['month_start'], created_at__lt=ranges['next_month_start'])
+    low_inventory_q = Q(current_inventory__lt=LOW_INVENTORY_THRESHOLD, current_inventory__gt=0)
+
+    result = RawMaterialWarehouseRecord.objects.aggregate(
+        total_records=Count('id'),
+        month_records=Count('id', filter=month_q),
+        low_inventory_count=Count('id', filter=low_inventory_q),
+        total_inventory=Sum('current_inventory'),
+    )
+
+    return {
+        'total_raw_material_records': result['total_records'],
+        'current_month_raw_material_records': result['month_records'],
+        'low_inventory_count': result['low_inventory_count'],
+        'total_inventory_amount': result['total_inventory'] or 0,
+    }
+
+
+def _get_cache_timeout():
+    return getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 3600)
+
+
+def _cached(key, compute):
+    """以快取取得結果，未命中時計算並寫入"""
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, _get_cache_timeout())
+    return value
+
+
+_STATS_FUNCTIONS = {
+    GREEN_BEAN: get_green_bean_dashboard_stats,
+    RAW_MATERIAL: get_raw_material_dashboard_stats,
+}
+
+
+def get_dashboard_stats(user_permissions):
+    """
+    取得儀表板統計卡片資料（依使用者權限只包含可查看的資料表）
+
+    Args:
+        user_permissions: get_user_accessible_sections 的回傳值
+
+    Returns:
+        dict: 合併後的統計欄位
+    """
+    stats = {}
+    for table in _STATS_FUNCTIONS:
+        if user_permissions.get(table):
+            stats.update(get_section_stats(table))
+    return stats
+
+
+def get_section_stats(table):
+    """
+    取得單一資料表的儀表板統計（依資料版本快取）
+
+    Args:
+        table: data_version 中的資料表名稱（green_bean / raw_material）
+    """
+    today = datetime.now().date().isoformat()
+    key = f'erp:dashboard_stats:{table}:{get_data_version(table)}:{today}'
+    return _cached(key, _STATS_FUNCTIONS[table])
+
+
+def get_dashboard_charts_data(days=14):
+    """
+    取得儀表板每日記錄數折線圖資料（兩個資料表共用一份快取）
+
+    Args:
+        days: 天數範圍（activity_logger.CHART_WINDOW_CHOICES 其中之一）
+    """
+    from app.utils.activity_logger import get_weekly_charts_data
+
+    versions = get_data_versions()
+    today = datetime.now().date().isoformat()
+    key = f"erp:dashboard_charts:{days}:{versions[GREEN_BEAN]}:{versions[RAW_MATERIAL]}:{today}"
+    return _cached(key, lambda: get_weekly_charts_data(days))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+資料版本
+每個業務資料表維護一個版本號，新增、修改、刪除記錄時遞增。
+版本號存放在預設快取中，多個 worker 共用；快取鍵包含版本號即可在資料異動後自動失效
+
+預設快取必須是所有 worker 共用的後端（檔案、資料庫或 Redis 快取，見 settings.CACHES），
+不可使用行程內的 LocMemCache，否則其他 worker 看不到版本遞增，快取不會失效、ETag 也不一致
+
+版本號取「舊版本 + 1」與「目前時間（毫秒）」較大者，因此也可作為資料最後異動時間使用
+"""
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+
+GREEN_BEAN = 'green_bean'
+RAW_MATERIAL = 'raw_material'
+DATA_TABLES = (GREEN_BEAN, RAW_MATERIAL)
+
+# 版本號在快取中不過期
+VERSION_CACHE_TIMEOUT = None
+
+
+def _version_key(table):
+    return f'erp:data_version:{table}'
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_data_version(table):
+    """
+    取得資料表目前的版本號
+
+    快取中沒有版本號時（首次使用或快取被清除）以目前時間初始化，
+    確保新的版本號大於先前任何版本
+    """
+    version = cache.get(_version_key(table))
+    if version is None:
+        version = _now_ms()
+        cache.add(_version_key(table), version, VERSION_CACHE_TIMEOUT)
+        version = cache.get(_version_key(table), version)
+    return version
+
+
+def get_data_versions(tables=DATA_TABLES):
+    """取得多個資料表的版本號，回傳 {table: version}"""
+    return {table: get_data_version(table) for table in tables}
+
+
+def bump_data_version(table):
+    """立即遞增資料表版本號"""
+    current = cache.get(_version_key(table)) or 0
+    version = max(current + 1, _now_ms())
+    cache.set(_version_key(table), version, VERSION_CACHE_TIMEOUT)
+    return version
+
+
+# 每個資料表使用固定的回呼函數，方便判斷同一交易中是否已登記過
+_BUMP_CALLBACKS = {
+    table: (lambda table=table: bump_data_version(table))
+    for table in DATA_TABLES
+}
+
+
+def mark_records_changed(table):
+    """
+    標記資料表已異動
+
+    在交易中呼叫時於提交後才遞增版本號，且同一交易只遞增一次
+    （大量匯入時每筆記錄的 post_save 不會各自寫入快取）
+    """
+    callback = _BUMP_CALLBACKS[table]
+    if connection.in_atomic_block:
+        if any(entry[1] is callback for entry in connection.run_on_commit):
+            return
+    transaction.on_commit(callback)
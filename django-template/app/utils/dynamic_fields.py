@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+原料倉日期動態欄位解析
+dynamic_fields 的日期欄位名稱只有月、日（11/1_入庫、10/31掛11/1帳_入庫），
+XLSX 匯出與 BI 匯出共用同一套解析與年份推算，同一筆記錄在兩種匯出中的日期一致
+"""
+import re
+from datetime import date
+
+
+# 10/31掛11/1帳_入庫：跨月掛帳欄位，以入帳日為異動日期
+CARRY_OVER_KEY = re.compile(r'^(\d+)/(\d+)掛(\d+)/(\d+)帳_(.+)$')
+# 11/1_入庫
+DATE_KEY = re.compile(r'^(\d+)/(\d+)_(.+)$')
+
+
+def parse_date_key(key):
+    """
+    解析日期動態欄位
+
+    Returns:
+        tuple: (月, 日, 異動類型, 是否為跨月掛帳欄位)，非日期欄位回傳 None
+    """
+    match = CARRY_OVER_KEY.match(key)
+    if match:
+        return int(match.group(3)), int(match.group(4)), match.group(5), True
+    match = DATE_KEY.match(key)
+    if match:
+        return int(match.group(1)), int(match.group(2)), match.group(3), False
+    return None
+
+
+def get_record_day(row):
+    """推算日期欄位年份所用的記錄日期：record_date，沒有時為建立日期"""
+    if row['record_date']:
+        return row['record_date']
+    return row['created_at'].date() if row['created_at'] else None
+
+
+def infer_key_year(month, record_day):
+    """
+    日期欄位的年份
+
+    年份由記錄日期推得；與記錄月份相差超過半年的欄位屬於相鄰年度
+    （例如一月記錄中的 12/31 欄位屬於前一年，十二月記錄中的 1/1 欄位屬於下一年）
+
+    Args:
+        month: 欄位的月份
+        record_day: 記錄日期，沒有時回傳 None
+    """
+    if record_day is None:
+        return None
+    year = record_day.year
+    if month - record_day.month > 6:
+        year -= 1
+    elif record_day.month - month > 6:
+        year += 1
+    return year
+
+
+def key_date(key, record_day):
+    """日期欄位對應的日期，非日期欄位、沒有記錄日期或日期無效時回傳 None"""
+    parsed = parse_date_key(key)
+    if parsed is None:
+        return None
+    month, day, _, _ = parsed
+    year = infer_key_year(month, record_day)
+    if year is None:
+        return None
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+生豆入庫記錄記憶體 OLAP Cube
+每筆記錄以欄式 NumPy 陣列保存：維度以字典編碼為整數代碼，量測值為數值陣列。
+切片（slice）、切塊（dice）以布林遮罩完成，彙總（roll-up）以 np.unique + np.bincount 分組，
+不需再對資料表下新的聚合查詢
+
+Cube 在每個 worker 行程中建立一次，之後在資料版本改變時依 updated_at 增量更新
+（水位線不超過 change_feed.get_safe_until()，尚未提交的較早 updated_at 不會被跳過），
+並依刪除墓碑（RecordTombstone）將已刪除的記錄標記為無效；
+墓碑可能已被清除或無效的記錄過多時才整個重建
+"""
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from app.utils.change_feed import get_retention_cutoff, get_safe_until
+from app.utils.data_version import GREEN_BEAN, get_data_version
+
+
+# 字典編碼的維度（欄位名稱）
+CATEGORICAL_DIMENSIONS = ('green_bean_name', 'green_bean_storage_silo', 'execution_status', 'is_abnormal')
+# 日期維度可彙總的粒度
+DAY_GRANULARITIES = ('day', 'month', 'year')
+DIMENSIONS = CATEGORICAL_DIMENSIONS + ('day',)
+
+# 沒有記錄時間的日期代碼
+NO_DAY = -1
+# 1970-01-01 的序數，用於轉換為 numpy datetime64
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# 讀取墓碑時往前重疊的時間（不同行程寫入墓碑的時間可能略有先後，重複套用不影響結果）
+TOMBSTONE_OVERLAP = timedelta(seconds=60)
+
+_FIELDS = (
+    'id', 'green_bean_name', 'green_bean_storage_silo',
+    'execution_status', 'is_abnormal', 'record_time', 'measured_weight_kg',
+)
+
+
+class _Dictionary:
+    """維度值與整數代碼的對照"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class GreenBeanCube:
+    """生豆入庫記錄的欄式 Cube"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.dictionaries = {name: _Dictionary() for name in CATEGORICAL_DIMENSIONS}
+        self.codes = {name: np.zeros(0, dtype=np.int32) for name in CATEGORICAL_DIMENSIONS}
+        self.days = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float64)
+        self.weighed = np.zeros(0, dtype=bool)
+        self.alive = np.zeros(0, dtype=bool)
+        self.positions = {}
+        self.watermark = None
+        self.tombstone_watermark = None
+        self.version = None
+        self.built_at = None
+        self.refreshed_at = None
+
+    @property
+    def size(self):
+        return len(self.days)
+
+    @property
+    def record_count(self):
+        """有效（未刪除）的記錄數"""
+        return len(self.positions)
+
+    def _encode_rows(self, rows):
+        """將 values_list 資料列轉為各欄陣列"""
+        columns = {name: [] for name in CATEGORICAL_DIMENSIONS}
+        days, weights, weighed = [], [], []
+        for row in rows:
+            record = dict(zip(_FIELDS, row))
+            for name in CATEGORICAL_DIMENSIONS:
+                value = record[name]
+                if name != 'is_abnormal':
+                    value = value or ''
+                columns[name].append(self.dictionaries[name].encode(value))
+            record_time = record['record_time']
+            days.append(record_time.date().toordinal() if record_time else NO_DAY)
+            weight = record['measured_weight_kg']
+            weights.append(float(weight) if weight is not None else 0.0)
+            weighed.append(weight is not None)
+        return (
+            {name: np.array(values, dtype=np.int32) for name, values in columns.items()},
+            np.array(days, dtype=np.int32),
+            np.array(weights, dtype=np.float64),
+            np.array(weighed, dtype=bool),
+        )
+
+    def _load(self, queryset):
+        """讀取記錄並併入 Cube：已存在的記錄就地更新，新記錄附加在尾端"""
+        rows = list(queryset.values_list(*_FIELDS).iterator(chunk_size=5000))
+        if not rows:
+            return 0
+
+        existing, appended = [], []
+        for row in rows:
+            (existing if row[0] in self.positions else appended).append(row)
+
+        if existing:
+            positions = np.array([self.positions[row[0]] for row in existing], dtype=np.int64)
+            codes, days, weights, weighed = self._encode_rows(existing)
+            for name in CATEGORICAL_DIMENSIONS:
+                self.codes[name][positions] = codes[name]
+            self.days[positions] = days
+            self.weights[positions] = weights
+            self.weighed[positions] = weighed
+
+        if appended:
+            start = self.size
+            codes, days, weights, weighed = self._encode_rows(appended)
+            for name in CATEGORICAL_DIMENSIONS:
+                self.codes[name] = np.concatenate([self.codes[name], codes[name]])
+            self.days = np.concatenate([self.days, days])
+            self.weights = np.concatenate([self.weights, weights])
+            self.weighed = np.concatenate([self.weighed, weighed])
+            self.alive = np.concatenate([self.alive, np.ones(len(appended), dtype=bool)])
+            for offset, row in enumerate(appended):
+                self.positions[row[0]] = start + offset
+
+        return len(rows)
+
+    def _apply_tombstones(self):
+        """
+        將墓碑水位線之後刪除的記錄標記為無效
+
+        Returns:
+            bool: 墓碑可能已超過保留期限被清除，無法確定哪些記錄已刪除（需要重建）
+        """
+        from app.models.models import RecordTombstone
+
+        scanned_at = datetime.now()
+        if self.tombstone_watermark < get_retention_cutoff():
+            return True
+        record_ids = RecordTombstone.objects.filter(
+            table=GREEN_BEAN, deleted_at__gte=self.tombstone_watermark - TOMBSTONE_OVERLAP
+        ).values_list('record_id', flat=True)
+        for record_id in record_ids.iterator(chunk_size=5000):
+            position = self.positions.pop(record_id, None)
+            if position is not None:
+                self.alive[position] = False
+        self.tombstone_watermark = scanned_at
+        return False
+
+    def rebuild(self):
+        """由資料表完整重建 Cube"""
+        from app.models.models import GreenBeanInboundRecord
+
+        with self._lock:
+            version = get_data_version(GREEN_BEAN)
+            self._reset()
+            # 之後的刪除由墓碑得知（先記錄時間，再讀取記錄）
+            self.tombstone_watermark = datetime.now()
+            safe_until = get_safe_until()
+            self._load(GreenBeanInboundRecord.objects.order_by())
+            self.watermark = safe_until
+            self.version = version
+            self.built_at = self.refreshed_at = datetime.now()
+
+    def refresh(self):
+        """
+        資料版本改變時依 updated_at 增量更新
+
+        讀取 updated_at 不早於水位線的記錄，之後水位線移到讀取前的 get_safe_until()，
+        而不是讀到的最大 updated_at：updated_at 在儲存時決定，較晚提交的長交易（例如上傳）
+        可能帶有較早的 updated_at，必須在下次更新時重新讀取。
+        刪除的記錄無法從 updated_at 得知，改由墓碑標記為無效；墓碑可能已被清除，
+        或無效的記錄超過一半時改為完整重建
+        """
+        from app.models.models import GreenBeanInboundRecord
+
+        version = get_data_version(GREEN_BEAN)
+        if self.built_at is None:
+            self.rebuild()
+            return
+        if version == self.version:
+            return
+
+        with self._lock:
+            if version == self.version:
+                return
+            safe_until = get_safe_until()
+            queryset = GreenBeanInboundRecord.objects.order_by()
+            if self.watermark is not None:
+                queryset = queryset.filter(updated_at__gte=self.watermark)
+            self._load(queryset)
+            self.watermark = safe_until
+            needs_rebuild = self._apply_tombstones() or self.record_count * 2 < self.size
+            if not needs_rebuild:
+                self.version = version
+                self.refreshed_at = datetime.now()
+
+        if needs_rebuild:
+            self.rebuild()
+
+    def _day_keys(self, granularity):
+        """將日期序數轉換為指定粒度的分組鍵"""
+        if granularity == 'day':
+            return self.days.astype(np.int64)
+        dates = (self.days.astype(np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]')
+        unit = 'M' if granularity == 'month' else 'Y'
+        keys = dates.astype(f'datetime64[{unit}]').astype(np.int64)
+        # 沒有日期的記錄保留為 NO_DAY
+        return np.where(self.days == NO_DAY, NO_DAY, keys)
+
+    def _decode_day(self, key, granularity):
+        if key == NO_DAY:
+            return None
+        if granularity == 'day':
+            return date.fromordinal(int(key)).isoformat()
+        unit = 'M' if granularity == 'month' else 'Y'
+        return str(np.datetime64(int(key), unit))
+
+    def query(self, group_by=(), filters=None, start_date=None, end_date=None, day_granularity='day'):
+        """
+        Slice / dice / roll-up 查詢
+
+        Args:
+            group_by: 分組維度（DIMENSIONS 的子集合），空值表示全部彙總為一列
+            filters: {維度: [值, ...]}，同一維度多個值為 OR（dice），單一值即 slice
+            start_date / end_date: 日期範圍（date，含頭含尾）
+            day_granularity: 以 day 分組時的粒度 day / month / year
+
+        Returns:
+            list: 每組一個字典，包含分組維度值與 count、weight、weighed_count、avg_weight
+        """
+        self.refresh()
+
+        with self._lock:
+            mask = self.alive.copy()
+            for name, values in (filters or {}).items():
+                dictionary = self.dictionaries[name]
+                wanted = [dictionary.codes[value] for value in values if value in dictionary.codes]
+                mask &= np.isin(self.codes[name], wanted)
+            if start_date is not None:
+                mask &= self.days >= start_date.toordinal()
+            if end_date is not None:
+                mask &= (self.days <= end_date.toordinal()) & (self.days != NO_DAY)
+
+            weights = self.weights[mask]
+            weighed = self.weighed[mask]
+
+            key_columns = []
+            for name in group_by:
+                if name == 'day':
+                    key_columns.append(self._day_keys(day_granularity)[mask])
+                else:
+                    key_columns.append(self.codes[name][mask].astype(np.int64))
+
+            if not key_columns:
+                groups = np.zeros((1 if mask.any() else 0, 0), dtype=np.int64)
+                inverse = np.zeros(int(mask.sum()), dtype=np.int64)
+            else:
+                groups, inverse = np.unique(np.stack(key_columns, axis=1), axis=0, return_inverse=True)
+                inverse = inverse.reshape(-1)
+
+            group_count = len(groups)
+            counts = np.bincount(inverse, minlength=group_count)
+            weight_sums = np.bincount(inverse, weights=weights, minlength=group_count)
+            weighed_counts = np.bincount(inverse, weights=weighed.astype(np.float64), minlength=group_count)
+
+            results = []
+            for index in range(group_count):
+                row = {}
+                for column, name in enumerate(group_by):
+                    key = groups[index][column]
+                    if name == 'day':
+                        row[name] = self._decode_day(key, day_granularity)
+                    else:
+                        row[name] = self.dictionaries[name].values[int(key)]
+                weighed_count = int(weighed_counts[index])
+                row.update({
+                    'count': int(counts[index]),
+                    'weight': round(float(weight_sums[index]), 2),
+                    'weighed_count': weighed_count,
+                    'avg_weight': round(float(weight_sums[index]) / weighed_count, 2) if weighed_count else None,
+                })
+                results.append(row)
+            return results
+
+    def info(self):
+        return {
+            'records': self.record_count,
+            'built_at': self.built_at,
+            'refreshed_at': self.refreshed_at,
+        }
+
+
+_cube = None
+_cube_lock = threading.Lock()
+
+
+def get_green_bean_cube():
+    """取得本行程的 Cube（第一次使用時建立）"""
+    global _cube
+    if _cube is None:
+        with _cube_lock:
+            if _cube is None:
+                _cube = GreenBeanCube()
+    return _cube
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Keyset（游標）分頁工具
+以 (排序欄位, id) 作為游標，避免 OFFSET 掃描與每頁的 COUNT(*)
+游標對前端為不透明字串（base64 編碼的 JSON）
+"""
+import base64
+import json
+import uuid
+from datetime import date, datetime
+
+from django.db.models import F, Q
+
+
+def encode_cursor(values):
+    """將游標內容編碼為不透明字串"""
+    payload = json.dumps(values, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, fields=None):
+    """
+    解碼游標字串
+
+    Args:
+        cursor: 游標字串
+        fields: {欄位名稱: 轉換函式}（可選）；指定時每個欄位都必須存在，
+            非 None 的值以轉換函式轉為查詢用的型別（例如 datetime.fromisoformat、uuid.UUID）
+
+    Raises:
+        ValueError: 游標格式錯誤（包含被竄改而無法轉換的欄位值）
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError):
+        raise ValueError('無效的分頁游標')
+    if not isinstance(values, dict):
+        raise ValueError('無效的分頁游標')
+    if fields is None:
+        return values
+
+    decoded = {}
+    for name, convert in fields.items():
+        if name not in values:
+            raise ValueError('無效的分頁游標')
+        value = values[name]
+        try:
+            decoded[name] = None if value is None else convert(value)
+        except (TypeError, ValueError, AttributeError, OverflowError):
+            raise ValueError('無效的分頁游標')
+    return decoded
+
+
+def _get_value(row, name):
+    """同時支援 values() 字典、values_list(named=True) 資料列與模型實例"""
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+def _serialize_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return None if value is None else str(value)
+
+
+def keyset_paginate(queryset, order_field, cursor=None, page_size=20, descending=True, is_date=False):
+    """
+    依 (order_field, id) 進行 keyset 分頁
+
+    遞減排序時 order_field 為 NULL 的資料排在最後；遞增排序不支援 NULL 值。主鍵需為 UUID
+
+    Args:
+        queryset: 尚未排序的 QuerySet（可為 values() 查詢，需包含 order_field 與 id）
+        order_field: 排序欄位名稱（DateTimeField 或 DateField）
+        cursor: 上一頁回傳的游標字串（可選）
+        page_size: 每頁筆數
+        descending: 是否遞減排序
+        is_date: order_field 是否為 DateField
+
+    Returns:
+        tuple: (本頁資料列表, 下一頁游標或 None)
+
+    Raises:
+        ValueError: 游標格式錯誤
+    """
+    if descending:
+        queryset = queryset.order_by(F(order_field).desc(nulls_last=True), '-id')
+    else:
+        queryset = queryset.order_by(order_field, 'id')
+
+    if cursor:
+        values = decode_cursor(cursor, {
+            'v': date.fromisoformat if is_date else datetime.fromisoformat,
+            'id': uuid.UUID,
+        })
+        last_value = values['v']
+        last_id = values['id']
+        if last_id is None:
+            raise ValueError('無效的分頁游標')
+
+        if descending and last_value is None:
+            # 已進入 NULL 區段，只需比較 id
+            queryset = queryset.filter(**{f'{order_field}__isnull': True, 'id__lt': last_id})
+        elif descending:
+            queryset = queryset.filter(
+                Q(**{f'{order_field}__lt': last_value}) |
+                Q(**{order_field: last_value, 'id__lt': last_id}) |
+                Q(**{f'{order_field}__isnull': True})
+            )
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{order_field}__gt': last_value}) |
+                Q(**{order_field: last_value, 'id__gt': last_id})
+            )
+
+    # 多取一筆用來判斷是否還有下一頁
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last_row = rows[-1]
+        next_cursor = encode_cursor({
+            'v': _serialize_value(_get_value(last_row, order_field)),
+            'id': str(_get_value(last_row, 'id')),
+        })
+
+    return rows, next_cursor
+
+
+def parse_page_size(value, default=20, maximum=100):
+    """解析每頁筆數參數，限制在 1 ~ maximum 之間"""
+    try:
+        page_size = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, maximum))
+
+
+# 總筆數模式：none 不計算、estimate 最多數到 ESTIMATE_COUNT_CAP、exact 精確 COUNT(*)
+TOTAL_COUNT_MODES = ('none', 'estimate', 'exact')
+ESTIMATE_COUNT_CAP = 10000
+
+
+def count_total(queryset, mode='none', unfiltered_count=None, cap=ESTIMATE_COUNT_CAP):
+    """
+    依模式計算分頁的總筆數
+
+    Args:
+        queryset: 篩選後的 QuerySet
+        mode: TOTAL_COUNT_MODES 其中之一
+        unfiltered_count: 沒有篩選條件時可直接取得總筆數的函式（例如讀取彙總表），可選
+        cap: estimate 模式最多計算的筆數
+
+    Returns:
+        dict: {'total_count': 筆數或 None, 'total_count_exact': 是否為精確值}
+
+    Raises:
+        ValueError: 不支援的模式
+    """
+    if mode not in TOTAL_COUNT_MODES:
+        raise ValueError(f'不支援的總筆數模式: {mode}')
+    if mode == 'none':
+        return {'total_count': None, 'total_count_exact': False}
+    if unfiltered_count is not None:
+        return {'total_count': unfiltered_count(), 'total_count_exact': True}
+    if mode == 'exact':
+        return {'total_count': queryset.count(), 'total_count_exact': True}
+
+    # 以 LIMIT 子查詢計數，成本不超過 cap 筆
+    count = queryset.order_by().values('pk')[:cap + 1].count()
+    return {'total_count': min(count, cap), 'total_count_exact': count <= cap}
+
+
+def iterate_keyset(queryset, order_field, batch_size=2000, descending=True, is_date=False):
+    """
+    以 keyset 分批讀取整個查詢結果（匯出用）
+
+    每批是一個獨立的 LIMIT 查詢，不論資料庫驅動是否在用戶端緩衝整個結果集，
+    記憶體用量都只與 batch_size 有關
+
+    Yields:
+        每一筆資料（values() 字典或模型實例）
+    """
+    cursor = None
+    while True:
+        rows, cursor = keyset_paginate(
+            queryset, order_field, cursor=cursor, page_size=batch_size,
+            descending=descending, is_date=is_date
+        )
+        yield from rows
+        if cursor is None:
+            return
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+記錄查詢篩選
+記錄 API 與匯出共用的篩選條件，參數名稱與記錄 API 的查詢參數相同
+"""
+from datetime import datetime, timedelta
+
+from app.models.models import GreenBeanInboundRecord, RawMaterialWarehouseRecord
+from app.utils.search import search_green_bean_records, search_raw_material_records
+
+
+def filter_green_bean_records(params):
+    """
+    依查詢參數篩選生豆入庫記錄
+
+    Args:
+        params: 查詢參數（request.GET），支援 search、order_number、start_date、end_date、is_abnormal
+
+    Raises:
+        ValueError: 日期格式錯誤
+    """
+    search = params.get('search', '')
+    order_number = params.get('order_number', '')
+    start_date = params.get('start_date', '')
+    end_date = params.get('end_date', '')
+    is_abnormal = params.get('is_abnormal', '')
+
+    queryset = GreenBeanInboundRecord.objects.all()
+
+    if search:
+        queryset = search_green_bean_records(queryset, search)
+
+    if order_number:
+        queryset = queryset.filter(order_number__icontains=order_number)
+
+    if start_date:
+        start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
+        queryset = queryset.filter(record_time__gte=start_datetime)
+
+    if end_date:
+        end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+        queryset = queryset.filter(record_time__lt=end_datetime)
+
+    if is_abnormal:
+        queryset = queryset.filter(is_abnormal=(is_abnormal.lower() == 'true'))
+
+    return queryset
+
+
+def filter_raw_material_records(params):
+    """
+    依查詢參數篩選原料倉記錄
+
+    Args:
+        params: 查詢參數（request.GET），支援 search、product_code、low_inventory
+
+    Raises:
+        ValueError: low_inventory 不是整數
+    """
+    search = params.get('search', '')
+    product_code = params.get('product_code', '')
+    low_inventory = params.get('low_inventory', '')
+
+    queryset = RawMaterialWarehouseRecord.objects.all()
+
+    if search:
+        queryset = search_raw_material_records(queryset, search)
+
+    if product_code:
+        queryset = queryset.filter(product_code__icontains=product_code)
+
+    if low_inventory:
+        threshold = int(low_inventory)
+        queryset = queryset.filter(
+            current_inventory__lt=threshold,
+            current_inventory__gt=0
+        )
+
+    return queryset
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+彙總表維護
+生豆入庫（日期 × 生豆名稱 × 筒倉）與原料倉（日期 × 品項）的每日彙總，以及原料月度統計，
+在記錄新增、修改、刪除時由 signals 以增量方式更新，統計 API 直接讀取彙總表
+
+大量匯入或刪除時以 rollup_batch() 包住，同一彙總列的增量會先在記憶體中合併，
+離開時每個彙總列只執行一次 UPDATE
+"""
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear, TruncDate
+
+from app.models.models import (
+    GreenBeanDailyRollup,
+    GreenBeanInboundRecord,
+    RawMaterialDailyRollup,
+    RawMaterialMonthlySummary,
+    RawMaterialWarehouseRecord,
+)
+
+
+_local = threading.local()
+
+TWO_PLACES = Decimal('0.01')
+
+
+def _to_decimal(value):
+    """將數值轉換為兩位小數的 Decimal，無法轉換時視為 0"""
+    if value is None:
+        return Decimal('0')
+    try:
+        return Decimal(str(value)).quantize(TWO_PLACES)
+    except (InvalidOperation, ValueError):
+        return Decimal('0')
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def green_bean_daily_contribution(record):
+    """生豆入庫記錄對每日彙總的貢獻：(彙總模型, 鍵, 數值)"""
+    key = {
+        'day': _to_date(record.record_time),
+        'green_bean_name': record.green_bean_name or '',
+        'green_bean_storage_silo': record.green_bean_storage_silo or '',
+    }
+    weighed = record.measured_weight_kg is not None
+    values = {
+        'record_count': 1,
+        'weighed_count': 1 if weighed else 0,
+        'total_measured_weight_kg': _to_decimal(record.measured_weight_kg),
+        'abnormal_count': 1 if record.is_abnormal else 0,
+    }
+    return GreenBeanDailyRollup, key, values
+
+
+def raw_material_day(record):
+    """原料倉記錄歸屬的日期：記錄日期，沒有時使用建立日期"""
+    return _to_date(record.record_date) or _to_date(record.created_at) or datetime.now().date()
+
+
+def raw_material_daily_contribution(record):
+    """原料倉記錄對每日彙總的貢獻：(彙總模型, 鍵, 數值)"""
+    key = {
+        'day': raw_material_day(record),
+        'product_code': record.product_code or '',
+        'product_name': record.product_name or '',
+    }
+    values = {
+        'record_count': 1,
+        'inventory_count': 1 if record.current_inventory is not None else 0,
+        'total_incoming_stock': _to_decimal(record.incoming_stock),
+        'total_outgoing_stock': _to_decimal(record.outgoing_stock),
+        'total_current_inventory': _to_decimal(record.current_inventory),
+    }
+    return RawMaterialDailyRollup, key, values
+
+
+def raw_material_monthly_contribution(record):
+    """原料倉記錄對月度統計的貢獻：(彙總模型, 鍵, 數值)"""
+    day = raw_material_day(record)
+    key = {
+        'year': day.year,
+        'month': day.month,
+    }
+    values = {
+        'record_count': 1,
+        'inventory_count': 1 if record.current_inventory is not None else 0,
+        'total_incoming_stock': _to_decimal(record.incoming_stock),
+        'total_outgoing_stock': _to_decimal(record.outgoing_stock),
+        'total_current_inventory': _to_decimal(record.current_inventory),
+    }
+    return RawMaterialMonthlySummary, key, values
+
+
+# 每種記錄模型會影響的彙總
+ROLLUP_CONTRIBUTIONS = {
+    GreenBeanInboundRecord: [green_bean_daily_contribution],
+    RawMaterialWarehouseRecord: [raw_material_daily_contribution, raw_material_monthly_contribution],
+}
+
+# 記錄數歸零時刪除的彙總（月度統計可能有手動輸入的庫存價值，保留資料列）
+PRUNE_EMPTY_ROLLUPS = (GreenBeanDailyRollup, RawMaterialDailyRollup)
+
+
+def _add_delta(pending, record, sign):
+    for contribution in ROLLUP_CONTRIBUTIONS[type(record)]:
+        rollup_model, key, values = contribution(record)
+        bucket = pending.setdefault((rollup_model, tuple(key.items())), {})
+        for field_name, value in values.items():
+            bucket[field_name] = bucket.get(field_name, 0) + sign * value
+
+
+def _apply_deltas(pending):
+    """將合併後的增量寫入彙總表"""
+    for (rollup_model, key_items), delta in pending.items():
+        delta = {field_name: value for field_name, value in delta.items() if value}
+        if not delta:
+            continue
+
+        key = dict(key_items)
+        # 月度統計的合計欄位可為 NULL，以 0 起算
+        updates = {
+            field_name: Coalesce(
+                F(field_name), Value(0), output_field=rollup_model._meta.get_field(field_name)
+            ) + value
+            for field_name, value in delta.items()
+        }
+        updated = rollup_model.objects.filter(**key).update(**updates)
+
+        if not updated:
+            if delta.get('record_count', 0) <= 0:
+                # 彙總列不存在卻要扣除，代表彙總已不一致，留給重建指令處理
+                print(f"彙總缺少資料列，略過扣除: {rollup_model.__name__} {key}")
+                continue
+            try:
+                with transaction.atomic():
+                    rollup_model.objects.create(**key, **delta)
+            except IntegrityError:
+                # 同時有其他請求建立了同一彙總列
+                rollup_model.objects.filter(**key).update(**updates)
+        elif delta.get('record_count', 0) < 0 and rollup_model in PRUNE_EMPTY_ROLLUPS:
+            rollup_model.objects.filter(**key, record_count__lte=0).delete()
+
+
+def _record_deltas(changes):
+    """
+    登記記錄異動的增量：批次中併入批次，否則立即寫入
+
+    Args:
+        changes: [(記錄, +1 或 -1), ...]
+    """
+    pending = getattr(_local, 'pending', None)
+    target = pending if pending is not None else {}
+    for record, sign in changes:
+        _add_delta(target, record, sign)
+    if pending is None:
+        _apply_deltas(target)
+
+
+@contextmanager
+def rollup_batch():
+    """
+    合併區塊內所有記錄異動對彙總表的增量，離開時一次寫入
+
+    應在 transaction.atomic() 之內使用；區塊拋出例外時不寫入（交易也會回滾）
+    """
+    if getattr(_local, 'pending', None) is not None:
+        # 已在批次中，直接併入外層批次
+        yield
+        return
+
+    _local.pending = {}
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    _apply_deltas(pending)
+
+
+def track_record_pre_save(instance):
+    """記錄修改前讀取資料庫中的舊值，儲存後用來扣除舊的貢獻"""
+    instance._rollup_previous = None
+    if instance._state.adding:
+        return
+    instance._rollup_previous = type(instance).objects.filter(pk=instance.pk).first()
+
+
+def track_record_post_save(instance):
+    """記錄儲存後更新彙總：扣除舊值、加入新值"""
+    previous = getattr(instance, '_rollup_previous', None)
+    instance._rollup_previous = None
+
+    changes = [(instance, 1)]
+    if previous is not None:
+        changes.insert(0, (previous, -1))
+    _record_deltas(changes)
+
+
+def track_record_post_delete(instance):
+    """記錄刪除後扣除其貢獻"""
+    _record_deltas([(instance, -1)])
+
+
+def rebuild_green_bean_daily_rollups():
+    """
+    由生豆入庫記錄重新產生每日彙總
+
+    Returns:
+        int: 產生的彙總列數
+    """
+    rows = (
+        GreenBeanInboundRecord.objects
+        .annotate(day=TruncDate('record_time'))
+        .values('day', 'green_bean_name', 'green_bean_storage_silo')
+        .annotate(
+            record_count=Count('id'),
+            weighed_count=Count('measured_weight_kg'),
+            total_measured_weight_kg=Sum('measured_weight_kg'),
+            abnormal_count=Count('id', filter=Q(is_abnormal=True)),
+        )
+        .order_by()
+    )
+    rollups = [
+        GreenBeanDailyRollup(
+            day=row['day'],
+            green_bean_name=row['green_bean_name'] or '',
+            green_bean_storage_silo=row['green_bean_storage_silo'] or '',
+            record_count=row['record_count'],
+            weighed_count=row['weighed_count'],
+            total_measured_weight_kg=row['total_measured_weight_kg'] or 0,
+            abnormal_count=row['abnormal_count'],
+        )
+        for row in rows.iterator()
+    ]
+
+    with transaction.atomic():
+        GreenBeanDailyRollup.objects.all().delete()
+        GreenBeanDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def rebuild_raw_material_daily_rollups():
+    """
+    由原料倉記錄重新產生每日彙總
+
+    Returns:
+        int: 產生的彙總列數
+    """
+    rows = (
+        RawMaterialWarehouseRecord.objects
+        .annotate(day=Coalesce('record_date', TruncDate('created_at')))
+        .values('day', 'product_code', 'product_name')
+        .annotate(
+            record_count=Count('id'),
+            inventory_count=Count('current_inventory'),
+            total_incoming_stock=Sum('incoming_stock'),
+            total_outgoing_stock=Sum('outgoing_stock'),
+            total_current_inventory=Sum('current_inventory'),
+        )
+        .order_by()
+    )
+    rollups = [
+        RawMaterialDailyRollup(
+            day=row['day'],
+            product_code=row['product_code'] or '',
+            product_name=row['product_name'] or '',
+            record_count=row['record_count'],
+            inventory_count=row['inventory_count'],
+            total_incoming_stock=row['total_incoming_stock'] or 0,
+            total_outgoing_stock=row['total_outgoing_stock'] or 0,
+            total_current_inventory=row['total_current_inventory'] or 0,
+        )
+        for row in rows.iterator()
+    ]
+
+    with transaction.atomic():
+        RawMaterialDailyRollup.objects.all().delete()
+        RawMaterialDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def backfill_raw_material_monthly_summary():
+    """
+    由原料倉記錄重新計算月度統計
+
+    已存在的月份更新統計欄位（保留手動輸入的總庫存價值），
+    沒有記錄的月份統計歸零
+
+    Returns:
+        int: 有記錄的月份數
+    """
+    rows = (
+        RawMaterialWarehouseRecord.objects
+        .annotate(day=Coalesce('record_date', TruncDate('created_at')))
+        .annotate(year=ExtractYear('day'), month=ExtractMonth('day'))
+        .values('year', 'month')
+        .annotate(
+            record_count=Count('id'),
+            inventory_count=Count('current_inventory'),
+            total_incoming_stock=Sum('incoming_stock'),
+            total_outgoing_stock=Sum('outgoing_stock'),
+            total_current_inventory=Sum('current_inventory'),
+        )
+        .order_by()
+    )
+
+    months = set()
+    with transaction.atomic():
+        for row in rows.iterator():
+            months.add((row['year'], row['month']))
+            RawMaterialMonthlySummary.objects.update_or_create(
+                year=row['year'],
+                month=row['month'],
+                defaults={
+                    'record_count': row['record_count'],
+                    'inventory_count': row['inventory_count'],
+                    'total_incoming_stock': row['total_incoming_stock'] or 0,
+                    'total_outgoing_stock': row['total_outgoing_stock'] or 0,
+                    'total_current_inventory': row['total_current_inventory'] or 0,
+                },
+            )
+
+        for summary in RawMaterialMonthlySummary.objects.all():
+            if (summary.year, summary.month) in months:
+                continue
+            summary.record_count = 0
+            summary.inventory_count = 0
+            summary.total_incoming_stock = 0
+            summary.total_outgoing_stock = 0
+            summary.total_current_inventory = 0
+            summary.save()
+
+    return len(months)
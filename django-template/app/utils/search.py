@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+記錄文字搜尋
+MySQL 上以 ngram FULLTEXT 索引搜尋（見 migration 0017），中文子字串也能使用索引；
+其他資料庫、索引不存在或關鍵字短於 n-gram 長度時改用 icontains
+"""
+from django.db import connections
+from django.db.models import F, FloatField, Func, Q, Value
+from django.db.utils import NotSupportedError
+
+
+# FULLTEXT 索引名稱與欄位（MATCH 的欄位必須與索引完全相同）
+GREEN_BEAN_SEARCH_INDEX = 'ft_green_bean_search'
+GREEN_BEAN_SEARCH_FIELDS = (
+    'green_bean_name', 'order_number', 'green_bean_code', 'green_bean_batch_number', 'ico_code',
+)
+RAW_MATERIAL_SEARCH_INDEX = 'ft_raw_material_search'
+RAW_MATERIAL_SEARCH_FIELDS = (
+    'product_name', 'product_code', 'factory_batch_number', 'international_batch_number',
+)
+
+# MySQL ngram_token_size 預設值，短於此長度的關鍵字無法以索引搜尋
+NGRAM_TOKEN_SIZE = 2
+
+# (資料庫別名, 資料表, 索引名稱) -> 索引是否存在
+_index_cache = {}
+
+
+class MatchAgainst(Func):
+    """MySQL MATCH (...) AGAINST (... IN BOOLEAN MODE)，回傳相關度分數"""
+
+    output_field = FloatField()
+
+    def __init__(self, fields, query):
+        super().__init__(*[F(field) for field in fields], Value(query))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError('MATCH ... AGAINST 只支援 MySQL')
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        *columns, query = self.get_source_expressions()
+        column_sql = []
+        params = []
+        for column in columns:
+            sql, column_params = compiler.compile(column)
+            column_sql.append(sql)
+            params.extend(column_params)
+        query_sql, query_params = compiler.compile(query)
+        params.extend(query_params)
+        return f"MATCH ({', '.join(column_sql)}) AGAINST ({query_sql} IN BOOLEAN MODE)", params
+
+
+def _has_fulltext_index(connection, table, index_name):
+    key = (connection.alias, table, index_name)
+    if key not in _index_cache:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+                [table, index_name]
+            )
+            _index_cache[key] = cursor.fetchone() is not None
+    return _index_cache[key]
+
+
+def _boolean_phrase(term):
+    """將關鍵字轉為 BOOLEAN MODE 片語（ngram 的連續 token，等同子字串比對）"""
+    return '"' + term.replace('"', ' ').strip() + '"'
+
+
+def text_search(queryset, fields, index_name, term):
+    """
+    以關鍵字搜尋多個欄位（任一欄位包含關鍵字即符合）
+
+    Args:
+        queryset: 要篩選的 QuerySet
+        fields: 搜尋欄位（需與 FULLTEXT 索引的欄位相同）
+        index_name: FULLTEXT 索引名稱
+        term: 搜尋關鍵字
+    """
+    term = (term or '').strip()
+    if not term:
+        return queryset
+
+    connection = connections[queryset.db]
+    phrase = term.replace('"', ' ').strip()
+    if (
+        connection.vendor == 'mysql'
+        and len(phrase) >= NGRAM_TOKEN_SIZE
+        and _has_fulltext_index(connection, queryset.model._meta.db_table, index_name)
+    ):
+        return queryset.alias(
+            search_score=MatchAgainst(fields, _boolean_phrase(phrase))
+        ).filter(search_score__gt=0)
+
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': term})
+    return queryset.filter(condition)
+
+
+def search_green_bean_records(queryset, term):
+    """搜尋生豆入庫記錄（名稱、單號、料號、批號、ICO）"""
+    return text_search(queryset, GREEN_BEAN_SEARCH_FIELDS, GREEN_BEAN_SEARCH_INDEX, term)
+
+
+def search_raw_material_records(queryset, term):
+    """搜尋原料倉記錄（品名、品號、工廠批號、國際批號）"""
+    return text_search(queryset, RAW_MATERIAL_SEARCH_FIELDS, RAW_MATERIAL_SEARCH_INDEX, term)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+時間序列降採樣
+提供 LTTB（Largest-Triangle-Three-Buckets）與 min/max 兩種降採樣，
+回傳保留點的索引，讓多個序列可以共用同一組時間點
+"""
+import numpy as np
+
+
+def lttb_indices(x, y, threshold):
+    """
+    LTTB 降採樣，保留最能代表曲線形狀的點
+
+    Args:
+        x: 遞增的數值座標（例如日期序數）
+        y: 對應數值
+        threshold: 目標點數（至少 3）
+
+    Returns:
+        numpy.ndarray: 保留點的索引（遞增）
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # 第一點與最後一點固定保留，中間分成 threshold - 2 個區間
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    selected = 0
+
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if end <= start:
+            end = start + 1
+
+        # 下一個區間的平均點（最後一個區間以最後一點代替）
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], max(edges[bucket + 2], edges[bucket + 1] + 1)
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[selected] - avg_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (avg_y - y[selected])
+        )
+        selected = start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+
+    return indices
+
+
+def minmax_indices(y, threshold):
+    """
+    min/max 降採樣，每個區間保留最小值與最大值，保證尖峰不會被抹平
+
+    Args:
+        y: 數值序列
+        threshold: 目標點數（回傳的點數不超過此值）
+
+    Returns:
+        numpy.ndarray: 保留點的索引（遞增、不重複）
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 2:
+        return np.arange(n)
+
+    # 頭尾固定保留，中間 threshold - 2 個名額每個區間取兩點；
+    # 名額為奇數時最後一個區間只保留離區間平均值較遠的一點
+    slots = threshold - 2
+    bucket_count = (slots + 1) // 2
+    kept = [0, n - 1]
+    if bucket_count == 0:
+        return np.array(kept)
+    buckets = np.array_split(np.arange(1, n - 1), bucket_count)
+    for number, bucket in enumerate(buckets):
+        if len(bucket) == 0:
+            continue
+        values = y[bucket]
+        low, high = bucket[int(np.argmin(values))], bucket[int(np.argmax(values))]
+        if slots % 2 and number == len(buckets) - 1:
+            mean = values.mean()
+            kept.append(low if mean - y[low] > y[high] - mean else high)
+        else:
+            kept.extend([low, high])
+
+    return np.unique(kept)
+
+
+DOWNSAMPLE_METHODS = {
+    'lttb': lambda x, y, threshold: lttb_indices(x, y, threshold),
+    'minmax': lambda x, y, threshold: minmax_indices(y, threshold),
+}
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+上傳准入控制
+限制同時處理的上傳數量（全域與每位使用者），超過時發給排隊票證並立即回傳 429，
+不在 view 中阻塞等待，避免大量上傳佔滿所有 worker
+
+名額與佇列存放在資料庫（UploadAdmission），多個 worker 共用同一組上限：
+處理中的上傳各佔一個全域名額（slot）與一個使用者名額（user_slot），排隊中的票證各佔一個佇列位置（queue_slot），
+唯一限制保證同時到達的請求也不會超過上限。
+排隊中的請求以票證輪詢上傳佇列狀態 API，輪到時帶著票證重新送出上傳；
+未持續輪詢的票證在 QUEUE_TIMEOUT 秒後失效，處理中的名額在 UPLOAD_IN_FLIGHT_STALE_SECONDS 後視為殘留
+"""
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils import timezone
+
+
+DEFAULT_UPLOAD_ADMISSION = {
+    'GLOBAL_LIMIT': 2,      # 同時處理的上傳數量上限
+    'PER_USER_LIMIT': 1,    # 每位使用者同時處理的上傳數量上限
+    'QUEUE_SIZE': 4,        # 等待佇列長度上限
+    'QUEUE_TIMEOUT': 30,    # 排隊票證未輪詢時保留的秒數
+    'QUEUE_POLL': 2,        # 排隊中建議的輪詢間隔秒數
+    'RETRY_AFTER': 15,      # 佇列已滿時 429 回應建議的重試秒數
+}
+
+
+def get_admission_config():
+    """取得准入控制設定（settings.UPLOAD_ADMISSION 覆蓋預設值）"""
+    config = dict(DEFAULT_UPLOAD_ADMISSION)
+    config.update(getattr(settings, 'UPLOAD_ADMISSION', {}))
+    return config
+
+
+def _purge_expired():
+    """清除失效的票證與殘留的處理中名額"""
+    from app.models.models import UploadAdmission
+
+    UploadAdmission.objects.filter(expires_at__lt=timezone.now()).delete()
+
+
+def _queued_before(ticket):
+    """排在票證之前的其他票證"""
+    return Q(created_at__lt=ticket.created_at) | Q(created_at=ticket.created_at, id__lt=ticket.id)
+
+
+def _queue_state(ticket, config):
+    """
+    計算票證的排隊位置與是否可以開始處理
+
+    依先到先處理；排在前面但因每人上限而無法開始的票證不會阻擋後面其他使用者
+
+    Returns:
+        tuple: (排隊位置（從 1 開始）, 是否可以開始處理)
+    """
+    from app.models.models import UploadAdmission
+
+    active_users = Counter(
+        UploadAdmission.objects.filter(slot__isnull=False).values_list('user_id', flat=True)
+    )
+    free_slots = config['GLOBAL_LIMIT'] - sum(active_users.values())
+    ahead = [
+        user_id for user_id in UploadAdmission.objects.filter(slot__isnull=True)
+        .filter(_queued_before(ticket)).values_list('user_id', flat=True)
+    ]
+    runnable_ahead = sum(
+        1 for user_id in ahead if active_users[user_id] < config['PER_USER_LIMIT']
+    )
+    can_start = (
+        active_users[ticket.user_id] < config['PER_USER_LIMIT']
+        and runnable_ahead < free_slots
+    )
+    return len(ahead) + 1, can_start
+
+
+def _claim_slot(ticket, config):
+    """
+    為票證取得全域名額與使用者名額
+
+    其他 worker 同時取得同一名額時唯一限制會拒絕，改試下一個名額
+
+    Returns:
+        bool: 是否取得
+    """
+    from app.models.models import UploadAdmission
+
+    active = UploadAdmission.objects.filter(slot__isnull=False).values_list('slot', 'user_id', 'user_slot')
+    taken_slots = {slot for slot, _, _ in active}
+    taken_user_slots = {user_slot for _, user_id, user_slot in active if user_id == ticket.user_id}
+    free_slots = [slot for slot in range(config['GLOBAL_LIMIT']) if slot not in taken_slots]
+    free_user_slots = [slot for slot in range(config['PER_USER_LIMIT']) if slot not in taken_user_slots]
+    if not free_user_slots:
+        return False
+
+    stale_seconds = getattr(settings, 'UPLOAD_IN_FLIGHT_STALE_SECONDS', 600)
+    for slot in free_slots:
+        try:
+            with transaction.atomic():
+                now = timezone.now()
+                updated = UploadAdmission.objects.filter(pk=ticket.pk, slot__isnull=True).update(
+                    slot=slot,
+                    user_slot=free_user_slots[0],
+                    queue_slot=None,
+                    started_at=now,
+                    expires_at=now + timedelta(seconds=stale_seconds),
+                )
+            return bool(updated)
+        except IntegrityError:
+            continue
+    return False
+
+
+def _enqueue(user, config):
+    """
+    建立排隊票證
+
+    每張票證佔一個佇列位置（queue_slot），唯一限制保證佇列長度不超過 QUEUE_SIZE；
+    其他 worker 同時取得同一位置時唯一限制會拒絕，改試下一個位置
+
+    Returns:
+        UploadAdmission 或 None（佇列已滿）
+    """
+    from app.models.models import UploadAdmission
+
+    taken = set(
+        UploadAdmission.objects.filter(queue_slot__isnull=False).values_list('queue_slot', flat=True)
+    )
+    for queue_slot in range(config['QUEUE_SIZE']):
+        if queue_slot in taken:
+            continue
+        try:
+            with transaction.atomic():
+                return UploadAdmission.objects.create(
+                    user=user,
+                    queue_slot=queue_slot,
+                    expires_at=timezone.now() + timedelta(seconds=config['QUEUE_TIMEOUT'])
+                )
+        except IntegrityError:
+            continue
+    return None
+
+
+def _get_ticket(user, ticket_id):
+    """取得使用者仍有效的排隊票證，票證不存在或格式錯誤時回傳 None"""
+    from app.models.models import UploadAdmission
+
+    if not ticket_id:
+        return None
+    try:
+        ticket_id = uuid.UUID(str(ticket_id))
+    except ValueError:
+        return None
+    return UploadAdmission.objects.filter(
+        pk=ticket_id, user=user, slot__isnull=True, expires_at__gte=timezone.now()
+    ).first()
+
+
+def _touch(ticket, config):
+    """延長排隊票證的有效時間"""
+    from app.models.models import UploadAdmission
+
+    ticket.expires_at = timezone.now() + timedelta(seconds=config['QUEUE_TIMEOUT'])
+    UploadAdmission.objects.filter(pk=ticket.pk, slot__isnull=True).update(expires_at=ticket.expires_at)
+
+
+def acquire_upload_slot(user, ticket_id, config):
+    """
+    取得上傳處理名額
+
+    Args:
+        user: 上傳者
+        ticket_id: 先前 429 回應發給的排隊票證（可選）
+        config: get_admission_config() 的設定
+
+    Returns:
+        tuple: (UploadAdmission 或 None, 排隊位置（取得名額時為 None，佇列已滿時為 0）)
+            取得名額時回傳處理中的資料列；否則回傳排隊票證（佇列已滿時為 None）
+    """
+    _purge_expired()
+
+    ticket = _get_ticket(user, ticket_id)
+    if ticket is None:
+        ticket = _enqueue(user, config)
+        if ticket is None:
+            return None, 0
+
+    position, can_start = _queue_state(ticket, config)
+    if can_start and _claim_slot(ticket, config):
+        return ticket, None
+
+    _touch(ticket, config)
+    return ticket, position
+
+
+def release_upload_slot(admission):
+    """釋放處理中的名額"""
+    from app.models.models import UploadAdmission
+
+    try:
+        UploadAdmission.objects.filter(pk=admission.pk).delete()
+    except Exception as e:
+        print(f"釋放上傳名額失敗: {e}")
+
+
+def get_upload_queue_status(user, ticket_id=None):
+    """
+    取得目前的上傳處理與佇列狀態
+
+    帶入排隊票證時同時延長票證有效時間，並回傳票證的排隊位置與是否已可重新送出上傳
+
+    Returns:
+        dict: 處理中數量、佇列長度、此使用者在佇列中的位置等
+    """
+    from app.models.models import UploadAdmission
+
+    config = get_admission_config()
+    _purge_expired()
+
+    admissions = list(UploadAdmission.objects.order_by('created_at', 'id').values_list('user_id', 'slot'))
+    queued_users = [user_id for user_id, slot in admissions if slot is None]
+    status = {
+        'active_uploads': sum(1 for _, slot in admissions if slot is not None),
+        'queued_uploads': len(queued_users),
+        'user_active_uploads': sum(1 for user_id, slot in admissions if slot is not None and user_id == user.pk),
+        'user_queue_positions': [
+            index + 1 for index, user_id in enumerate(queued_users) if user_id == user.pk
+        ],
+        'global_limit': config['GLOBAL_LIMIT'],
+        'per_user_limit': config['PER_USER_LIMIT'],
+        'queue_size': config['QUEUE_SIZE'],
+    }
+
+    ticket = _get_ticket(user, ticket_id)
+    if ticket_id:
+        if ticket is None:
+            status['ticket'] = None
+        else:
+            _touch(ticket, config)
+            position, can_start = _queue_state(ticket, config)
+            status['ticket'] = {'id': str(ticket.pk), 'position': position, 'ready': can_start}
+    return status
+
+
+def _too_many_uploads_response(config, ticket, position):
+    if ticket is None:
+        message = f"目前上傳處理佇列已滿，請稍後再試（約 {config['RETRY_AFTER']} 秒後）"
+        retry_after = config['RETRY_AFTER']
+    else:
+        message = f'上傳排隊中：第 {position} 位'
+        retry_after = config['QUEUE_POLL']
+
+    response = JsonResponse({
+        'success': False,
+        'message': message,
+        'retry_after': retry_after,
+        'queue_full': ticket is None,
+        'ticket': str(ticket.pk) if ticket is not None else None,
+        'queue_position': position or None,
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+@contextmanager
+def upload_admission(request):
+    """
+    上傳准入控制
+
+    取得名額時 yield None，離開時釋放名額；沒有名額時 yield 429 回應，由呼叫端直接回傳。
+    應在權限與 HTTP 方法檢查、相同檔案的 single-flight 鎖定之後使用，被拒絕與重複的請求不佔用名額。
+    排隊中的回應帶有 ticket，客戶端輪詢上傳佇列狀態 API（?ticket=）直到 ready 後，
+    以表單欄位 upload_ticket 或 X-Upload-Ticket 標頭帶入票證重新送出。
+    """
+    config = get_admission_config()
+    ticket_id = request.POST.get('upload_ticket') or request.headers.get('X-Upload-Ticket')
+
+    admission, position = acquire_upload_slot(request.user, ticket_id, config)
+    if position is not None:
+        yield _too_many_uploads_response(config, admission, position)
+        return
+
+    try:
+        yield None
+    finally:
+        release_upload_slot(admission)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+檔案上傳工具
+提供上傳統計計算等與檔案匯入流程相關的共用函數
+"""
+import logging
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+def compute_green_bean_upload_stats(records, rejected_rows=0):
+    """
+    由匯入時已建立的生豆記錄（記憶體中）計算上傳統計
+
+    Args:
+        records: 本次匯入建立的 GreenBeanInboundRecord 列表
+        rejected_rows: 被略過或處理失敗的列數
+
+    Returns:
+        dict: 可直接設定到 FileUploadRecord 的統計欄位
+    """
+    record_times = [record.record_time for record in records if record.record_time is not None]
+    weights = [
+        Decimal(str(record.measured_weight_kg))
+        for record in records if record.measured_weight_kg is not None
+    ]
+
+    return {
+        'record_time_min': min(record_times) if record_times else None,
+        'record_time_max': max(record_times) if record_times else None,
+        'total_measured_weight_kg': round(sum(weights, Decimal('0')), 2) if weights else None,
+        'abnormal_count': sum(1 for record in records if record.is_abnormal),
+        'distinct_item_count': len({record.green_bean_name for record in records if record.green_bean_name}),
+        'rejected_rows': rejected_rows,
+    }
+
+
+def compute_raw_material_upload_stats(records, rejected_rows=0):
+    """
+    由匯入時已建立的原料倉記錄（記憶體中）計算上傳統計
+    原料倉記錄沒有記錄時間與量測重量，僅統計品項數與略過列數
+
+    Args:
+        records: 本次匯入建立的 RawMaterialWarehouseRecord 列表
+        rejected_rows: 被略過或處理失敗的列數
+
+    Returns:
+        dict: 可直接設定到 FileUploadRecord 的統計欄位
+    """
+    return {
+        'distinct_item_count': len({record.product_code or record.product_name for record in records}),
+        'rejected_rows': rejected_rows,
+    }
+
+
+def apply_upload_stats(upload_record, stats):
+    """將統計結果寫入上傳記錄物件（不儲存）"""
+    for field_name, value in stats.items():
+        setattr(upload_record, field_name, value)
+
+
+# 上傳歷史使用的欄位投影：只取顯示需要的欄位，不讀取 created_record_ids
+UPLOAD_HISTORY_FIELDS = (
+    'id', 'file_name', 'file_size', 'file_hash', 'file_type', 'upload_time',
+    'uploaded_by_id', 'uploaded_by__username', 'records_count', 'status', 'error_message',
+    'record_time_min', 'record_time_max', 'total_measured_weight_kg',
+    'abnormal_count', 'distinct_item_count', 'rejected_rows',
+)
+
+
+def get_upload_history_queryset(file_types):
+    """
+    取得上傳歷史的投影查詢（values），上傳者名稱以 JOIN 一次取得
+
+    Args:
+        file_types: 要包含的檔案類型列表
+
+    Returns:
+        QuerySet: values() 查詢，尚未排序
+    """
+    from app.models.models import FileUploadRecord
+
+    return FileUploadRecord.objects.filter(file_type__in=file_types).values(*UPLOAD_HISTORY_FIELDS)
+
+
+def serialize_upload_history_row(row, user):
+    """
+    將上傳歷史投影資料轉換為前端使用的 JSON 格式
+
+    Args:
+        row: get_upload_history_queryset 回傳的字典
+        user: 目前使用者，用於判斷是否可刪除
+    """
+    from app.models.models import FileUploadRecord
+
+    status_choices = dict(FileUploadRecord._meta.get_field('status').choices)
+    total_weight = row['total_measured_weight_kg']
+
+    return {
+        'id': str(row['id']),
+        'file_name': row['file_name'],
+        'file_size': row['file_size'],
+        'file_hash': row['file_hash'],
+        'file_type': row['file_type'],
+        'upload_time': row['upload_time'].strftime('%Y-%m-%d %H:%M'),
+        'uploaded_by': row['uploaded_by__username'] or '未知',
+        'records_count': row['records_count'] or 0,
+        'record_time_min': row['record_time_min'].strftime('%Y-%m-%d %H:%M') if row['record_time_min'] else None,
+        'record_time_max': row['record_time_max'].strftime('%Y-%m-%d %H:%M') if row['record_time_max'] else None,
+        'total_measured_weight_kg': float(total_weight) if total_weight is not None else None,
+        'abnormal_count': row['abnormal_count'],
+        'distinct_item_count': row['distinct_item_count'],
+        'rejected_rows': row['rejected_rows'],
+        'status': row['status'],
+        'status_display': status_choices.get(row['status'], row['status']),
+        'error_message': row['error_message'],
+        'can_delete': row['uploaded_by_id'] == user.pk or user.is_superuser,
+    }
+
+
+def _acquire_in_flight_row(file_hash, file_type, user):
+    """
+    嘗試建立處理中鎖定列
+
+    Returns:
+        UploadInFlight 或 None（已有其他請求在處理）
+    """
+    from app.models.models import UploadInFlight
+
+    stale_seconds = getattr(settings, 'UPLOAD_IN_FLIGHT_STALE_SECONDS', 600)
+
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return UploadInFlight.objects.create(
+                    file_hash=file_hash,
+                    file_type=file_type,
+                    started_by=user if user and user.is_authenticated else None,
+                )
+        except IntegrityError:
+            # 處理請求的 worker 若中途終止，鎖定列會殘留；逾時後由下一個請求接手
+            stale_before = timezone.now() - timedelta(seconds=stale_seconds)
+            deleted, _ = UploadInFlight.objects.filter(
+                file_hash=file_hash, started_at__lt=stale_before
+            ).delete()
+            if not deleted:
+                return None
+    return None
+
+
+@contextmanager
+def upload_single_flight(file_hash, file_type, user):
+    """
+    以檔案雜湊值合併同時進行的相同上傳
+
+    第一個請求取得鎖定列後負責解析檔案（yield True）；
+    其餘請求不等待，立即 yield False，由呼叫端回覆「處理中」或沿用已完成的 FileUploadRecord 結果。
+    鎖定列存於資料庫，因此同一 worker 與多個 worker 之間同樣有效。
+    應在取得上傳准入名額之前使用，重複的上傳不佔用名額。
+
+    Args:
+        file_hash: 檔案 SHA256 雜湊值
+        file_type: 檔案類型（green_bean / raw_material）
+        user: 上傳者
+    """
+    from app.models.models import UploadInFlight
+
+    in_flight = _acquire_in_flight_row(file_hash, file_type, user)
+    if in_flight is None:
+        yield False
+        return
+
+    try:
+        yield True
+    finally:
+        try:
+            UploadInFlight.objects.filter(pk=in_flight.pk, token=in_flight.token).delete()
+        except Exception:
+            logger.exception('清除上傳鎖定列失敗: %s', file_hash)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+儀表板元件（widget）統計
+每個元件是一個以 (參數, WidgetContext) 計算結果的函式；同一請求中的元件共用 WidgetContext，
+相同的彙總資料只查詢一次，再由各元件在記憶體中分組
+
+inventory_statistics_api、production_statistics_api 與複合統計 API 都由這些元件組成
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import F
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from app.utils.dashboard_stats import LOW_INVENTORY_THRESHOLD, get_dashboard_stats
+from app.utils.data_version import GREEN_BEAN, RAW_MATERIAL
+
+
+# 複合統計一次最多可查詢的元件數
+MAX_WIDGETS = 20
+
+
+def _int_param(params, name, default, minimum=1, maximum=None):
+    """讀取整數參數，超出範圍時拋出 ValueError"""
+    value = params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'參數 {name} 必須是整數')
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ValueError(f'參數 {name} 超出範圍')
+    return value
+
+
+class WidgetContext:
+    """單一請求內元件共用的資料（依鍵快取查詢結果）"""
+
+    def __init__(self, user):
+        from app.utils.permission_utils import get_user_accessible_sections
+
+        self.user = user
+        self.permissions = get_user_accessible_sections(user)
+        self._shared = {}
+
+    def shared(self, key, compute):
+        if key not in self._shared:
+            self._shared[key] = compute()
+        return self._shared[key]
+
+    def green_bean_rollup_rows(self, days):
+        """最近 days 天的生豆每日彙總列 (day, 生豆名稱, 筆數, 有重量筆數, 重量, 異常筆數)"""
+        def compute():
+            from app.models.models import GreenBeanDailyRollup
+
+            start_day = (datetime.now() - timedelta(days=days)).date()
+            return list(
+                GreenBeanDailyRollup.objects.filter(day__gte=start_day).values_list(
+                    'day', 'green_bean_name', 'record_count', 'weighed_count',
+                    'total_measured_weight_kg', 'abnormal_count'
+                )
+            )
+        return self.shared(('green_bean_rollups', days), compute)
+
+    def monthly_summary_rows(self):
+        """有記錄的原料月度統計（新到舊）"""
+        def compute():
+            from app.models.models import RawMaterialMonthlySummary
+
+            return list(
+                RawMaterialMonthlySummary.objects.filter(record_count__gt=0)
+                .order_by('-year', '-month')
+                .values(
+                    'year', 'month', 'record_count', 'inventory_count', 'total_incoming_stock',
+                    'total_outgoing_stock', 'total_current_inventory', 'total_inventory_value'
+                )
+            )
+        return self.shared('monthly_summaries', compute)
+
+
+def _sum(values):
+    return sum((value or 0 for value in values), Decimal('0'))
+
+
+def production_totals(params, context):
+    """生產統計總計"""
+    rows = context.green_bean_rollup_rows(_int_param(params, 'days', 30, minimum=0))
+    total_weight = _sum(row[4] for row in rows) if rows else None
+    weighed_count = sum(row[3] for row in rows)
+    return {
+        'total_records': sum(row[2] for row in rows),
+        'total_weight': total_weight,
+        'avg_weight': total_weight / weighed_count if weighed_count else None,
+        'abnormal_count': sum(row[5] for row in rows),
+    }
+
+
+def daily_production(params, context):
+    """每日生產量"""
+    rows = context.green_bean_rollup_rows(_int_param(params, 'days', 30, minimum=0))
+    days = {}
+    for day, _, record_count, _, weight, _ in rows:
+        entry = days.setdefault(day, {'day': day, 'daily_weight': Decimal('0'), 'daily_count': 0})
+        entry['daily_weight'] += weight or 0
+        entry['daily_count'] += record_count
+    return [days[day] for day in sorted(days, key=lambda value: (value is None, value))]
+
+
+def bean_type_stats(params, context):
+    """按生豆類型統計（重量前 limit 名）"""
+    rows = context.green_bean_rollup_rows(_int_param(params, 'days', 30, minimum=0))
+    limit = _int_param(params, 'limit', 10, maximum=100)
+    beans = {}
+    for _, name, record_count, _, weight, _ in rows:
+        entry = beans.setdefault(name, {'green_bean_name': name, 'total_weight': Decimal('0'), 'record_count': 0})
+        entry['total_weight'] += weight or 0
+        entry['record_count'] += record_count
+    return sorted(beans.values(), key=lambda entry: entry['total_weight'], reverse=True)[:limit]
+
+
+# 生產時間序列可用的粒度：名稱 -> 截斷函式（None 表示直接使用彙總表的日期）
+PRODUCTION_GRANULARITIES = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def _period_start(day, granularity):
+    """粒度區間的第一天，讓第一個區間不會只有部分天數"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def production_series(params, context):
+    """
+    生產時間序列（重量、筆數、有重量筆數、異常筆數、平均重量）
+
+    每個粒度以單一 GROUP BY 查詢每日彙總表取得所有數值；日期條件為範圍比較，可使用彙總表的日期索引。
+    granularity 可用逗號指定多個粒度（day / week / month），回傳 {粒度: [...]}
+    """
+    from django.db.models import Sum
+    from app.models.models import GreenBeanDailyRollup
+
+    days = _int_param(params, 'days', 30, minimum=0)
+    granularities = [value for value in str(params.get('granularity') or 'day').split(',') if value]
+    for granularity in granularities:
+        if granularity not in PRODUCTION_GRANULARITIES:
+            raise ValueError(f'不支援的粒度: {granularity}')
+
+    def compute(granularity):
+        start_day = _period_start((datetime.now() - timedelta(days=days)).date(), granularity)
+        trunc = PRODUCTION_GRANULARITIES[granularity]
+        rows = (
+            GreenBeanDailyRollup.objects.filter(day__gte=start_day)
+            .annotate(period=trunc('day') if trunc is not None else F('day'))
+            .values('period')
+            .annotate(
+                weight=Sum('total_measured_weight_kg'),
+                record_count=Sum('record_count'),
+                weighed_count=Sum('weighed_count'),
+                abnormal_count=Sum('abnormal_count'),
+            )
+            .order_by('period')
+        )
+        return [
+            {
+                **row,
+                'avg_weight': row['weight'] / row['weighed_count'] if row['weighed_count'] else None,
+            }
+            for row in rows
+        ]
+
+    return {
+        granularity: context.shared(('production_series', days, granularity), lambda: compute(granularity))
+        for granularity in dict.fromkeys(granularities)
+    }
+
+
+def inventory_totals(params, context):
+    """總庫存統計（由月度統計合計）"""
+    rows = context.monthly_summary_rows()
+    if not rows:
+        return {'total_inventory': None, 'total_incoming': None, 'total_outgoing': None, 'avg_inventory': None}
+    total_inventory = _sum(row['total_current_inventory'] for row in rows)
+    inventory_count = sum(row['inventory_count'] for row in rows)
+    return {
+        'total_inventory': total_inventory,
+        'total_incoming': _sum(row['total_incoming_stock'] for row in rows),
+        'total_outgoing': _sum(row['total_outgoing_stock'] for row in rows),
+        'avg_inventory': total_inventory / inventory_count if inventory_count else None,
+    }
+
+
+def monthly_summary(params, context):
+    """近幾個月的月度統計與前月比較"""
+    months = _int_param(params, 'months', 12, minimum=0)
+    rows = context.monthly_summary_rows()
+    result = []
+    for index, row in enumerate(rows[:months]):
+        previous = rows[index + 1] if index + 1 < len(rows) else None
+        month_row = {key: value for key, value in row.items() if key != 'inventory_count'}
+        month_row['current_inventory_change'] = (
+            (row['total_current_inventory'] or 0) - (previous['total_current_inventory'] or 0)
+            if previous else None
+        )
+        result.append(month_row)
+    return result
+
+
+def low_inventory_items(params, context):
+    """低庫存商品"""
+    from app.models.models import RawMaterialWarehouseRecord
+
+    threshold = _int_param(params, 'threshold', LOW_INVENTORY_THRESHOLD)
+    limit = _int_param(params, 'limit', 20, maximum=100)
+    return list(
+        RawMaterialWarehouseRecord.objects.filter(
+            current_inventory__lt=threshold,
+            current_inventory__gt=0
+        ).values('product_code', 'product_name', 'current_inventory').order_by('current_inventory')[:limit]
+    )
+
+
+def product_stats(params, context):
+    """按產品類別統計（庫存前 limit 名）"""
+    from django.db.models import Sum
+    from app.models.models import RawMaterialDailyRollup
+
+    limit = _int_param(params, 'limit', 10, maximum=100)
+    result = []
+    for row in RawMaterialDailyRollup.objects.values('product_name').annotate(
+        item_count=Sum('record_count'),
+        total_inventory=Sum('total_current_inventory'),
+        inventory_count=Sum('inventory_count')
+    ).order_by('-total_inventory')[:limit]:
+        inventory_count = row.pop('inventory_count')
+        row['avg_inventory'] = row['total_inventory'] / inventory_count if inventory_count else None
+        result.append(row)
+    return result
+
+
+def recent_green_bean_records(params, context):
+    """最近的生豆入庫記錄"""
+    from app.models.models import GreenBeanInboundRecord
+
+    limit = _int_param(params, 'limit', 10, maximum=50)
+    return list(
+        GreenBeanInboundRecord.objects.order_by('-record_time').values(
+            'id', 'record_time', 'order_number', 'green_bean_name', 'green_bean_storage_silo',
+            'measured_weight_kg', 'execution_status', 'is_abnormal'
+        )[:limit]
+    )
+
+
+def recent_raw_material_records(params, context):
+    """最近的原料倉記錄"""
+    from app.models.models import RawMaterialWarehouseRecord
+
+    limit = _int_param(params, 'limit', 10, maximum=50)
+    return list(
+        RawMaterialWarehouseRecord.objects.order_by('-created_at').values(
+            'id', 'product_code', 'product_name', 'incoming_stock', 'outgoing_stock',
+            'current_inventory', 'record_date', 'created_at'
+        )[:limit]
+    )
+
+
+def dashboard_cards(params, context):
+    """儀表板統計卡片（依權限，使用快取）"""
+    return get_dashboard_stats(context.permissions)
+
+
+# 元件名稱 -> (需要的資料表權限，None 表示登入即可, 計算函式)
+WIDGETS = {
+    'production_totals': (GREEN_BEAN, production_totals),
+    'daily_production': (GREEN_BEAN, daily_production),
+    'bean_type_stats': (GREEN_BEAN, bean_type_stats),
+    'production_series': (GREEN_BEAN, production_series),
+    'recent_green_bean_records': (GREEN_BEAN, recent_green_bean_records),
+    'inventory_totals': (RAW_MATERIAL, inventory_totals),
+    'monthly_summary': (RAW_MATERIAL, monthly_summary),
+    'low_inventory_items': (RAW_MATERIAL, low_inventory_items),
+    'product_stats': (RAW_MATERIAL, product_stats),
+    'recent_raw_material_records': (RAW_MATERIAL, recent_raw_material_records),
+    'dashboard_cards': (None, dashboard_cards),
+}
+
+
+def compute_widget(name, params, context, check_permission=True):
+    """
+    計算單一元件
+
+    Raises:
+        ValueError: 元件名稱或參數錯誤
+        PermissionError: 沒有該元件資料表的查看權限
+    """
+    if name not in WIDGETS:
+        raise ValueError(f'不支援的元件: {name}')
+    section, compute = WIDGETS[name]
+    if check_permission and section is not None and not context.permissions.get(section):
+        raise PermissionError('沒有查看權限')
+    return compute(params or {}, context)
+
+
+def compute_widgets(queries, context):
+    """
+    依序計算多個元件，單一元件失敗不影響其他元件
+
+    Args:
+        queries: [{'key': 結果鍵, 'widget': 元件名稱, 'params': {...}}, ...]
+                 key 省略時使用元件名稱
+
+    Returns:
+        dict: {key: {'success': True, 'data': ...} 或 {'success': False, 'error': ...}}
+
+    Raises:
+        ValueError: 查詢清單格式錯誤
+    """
+    if not isinstance(queries, list) or not queries:
+        raise ValueError('widgets 必須是非空的列表')
+    if len(queries) > MAX_WIDGETS:
+        raise ValueError(f'一次最多查詢 {MAX_WIDGETS} 個元件')
+
+    results = {}
+    for query in queries:
+        if isinstance(query, str):
+            query = {'widget': query}
+        if not isinstance(query, dict) or not query.get('widget'):
+            raise ValueError('每個元件查詢都必須指定 widget')
+        key = str(query.get('key') or query['widget'])
+        if key in results:
+            raise ValueError(f'結果鍵重複: {key}')
+        params = query.get('params') or {}
+        if not isinstance(params, dict):
+            raise ValueError(f'{key} 的 params 必須是物件')
+
+        try:
+            results[key] = {'success': True, 'data': compute_widget(query['widget'], params, context)}
+        except (ValueError, PermissionError) as e:
+            results[key] = {'success': False, 'error': str(e)}
+        except Exception as e:
+            print(f"元件統計計算失敗 ({key}): {e}")
+            results[key] = {'success': False, 'error': str(e)}
+    return results
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ERP 分析 API
+長期趨勢、作業時段分布等分析用途的端點
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, ExtractHour, ExtractIsoWeekDay, TruncMonth, TruncWeek
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from app.models.models import GreenBeanDailyRollup, GreenBeanInboundRecord
+from app.utils.green_bean_cube import CATEGORICAL_DIMENSIONS, DAY_GRANULARITIES, DIMENSIONS, get_green_bean_cube
+from app.utils.permission_utils import require_green_bean_permission
+from app.utils.timeseries import DOWNSAMPLE_METHODS
+
+
+# 時間序列可用的彙總粒度（由細到粗）
+TIMESERIES_BUCKETS = (
+    ('day', None, 1),
+    ('week', TruncWeek, 7),
+    ('month', TruncMonth, 30),
+)
+# 彙總後的點數最多為目標點數的幾倍，再由降採樣縮減到目標點數
+TIMESERIES_OVERSAMPLE = 8
+TIMESERIES_DEFAULT_POINTS = 200
+TIMESERIES_MAX_POINTS = 2000
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def _choose_bucket(span_days, points):
+    """選擇彙總後點數不超過 points × TIMESERIES_OVERSAMPLE 的最細粒度"""
+    for name, trunc, days_per_bucket in TIMESERIES_BUCKETS:
+        if span_days / days_per_bucket <= points * TIMESERIES_OVERSAMPLE:
+            return name, trunc
+    name, trunc, _ = TIMESERIES_BUCKETS[-1]
+    return name, trunc
+
+
+@api_view(['GET'])
+@require_green_bean_permission('view')
+def green_bean_timeseries_api(request):
+    """
+    生豆入庫時間序列 API（重量與筆數），依目標點數在伺服器端降採樣
+
+    查詢參數：
+        start_date / end_date: 日期範圍 YYYY-MM-DD（可選，預設為全部資料）
+        points: 目標點數（預設 200，最多 2000）
+        method: 降採樣方式 lttb / minmax（預設 lttb）
+        metric: 降採樣依據的數值 weight / count（預設 weight）
+        green_bean_name / silo: 篩選條件（可選）
+    """
+    try:
+        start_date = _parse_date(request.GET.get('start_date'))
+        end_date = _parse_date(request.GET.get('end_date'))
+        points = min(max(int(request.GET.get('points', TIMESERIES_DEFAULT_POINTS)), 3), TIMESERIES_MAX_POINTS)
+        method = request.GET.get('method', 'lttb')
+        metric = request.GET.get('metric', 'weight')
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f'不支援的降採樣方式: {method}')
+        if metric not in ('weight', 'count'):
+            raise ValueError(f'不支援的數值: {metric}')
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        rollups = GreenBeanDailyRollup.objects.filter(day__isnull=False)
+        if start_date:
+            rollups = rollups.filter(day__gte=start_date)
+        if end_date:
+            rollups = rollups.filter(day__lte=end_date)
+        if request.GET.get('green_bean_name'):
+            rollups = rollups.filter(green_bean_name=request.GET['green_bean_name'])
+        if request.GET.get('silo'):
+            rollups = rollups.filter(green_bean_storage_silo=request.GET['silo'])
+
+        # 未指定範圍時以資料的實際範圍決定彙總粒度
+        if not (start_date and end_date):
+            first_day = rollups.order_by('day').values_list('day', flat=True).first()
+            last_day = rollups.order_by('-day').values_list('day', flat=True).first()
+            start_date = start_date or first_day
+            end_date = end_date or last_day
+
+        if start_date is None or end_date is None:
+            span_days = 0
+        else:
+            span_days = (end_date - start_date).days + 1
+        bucket, trunc = _choose_bucket(span_days, points)
+
+        rollups = rollups.annotate(bucket=trunc('day') if trunc is not None else F('day'))
+        rows = list(
+            rollups.values('bucket')
+            .annotate(weight=Sum('total_measured_weight_kg'), count=Sum('record_count'))
+            .order_by('bucket')
+            .values_list('bucket', 'weight', 'count')
+        )
+
+        source_points = len(rows)
+        if source_points > points:
+            x = np.array([row[0].toordinal() for row in rows], dtype=float)
+            y = np.array([
+                float(row[1] or 0) if metric == 'weight' else row[2]
+                for row in rows
+            ], dtype=float)
+            rows = [rows[index] for index in DOWNSAMPLE_METHODS[method](x, y, points)]
+
+        return Response({
+            'success': True,
+            'data': {
+                'bucket': bucket,
+                'method': method if source_points > points else None,
+                'source_points': source_points,
+                'points': [
+                    {
+                        'date': bucket_date.isoformat(),
+                        'weight': round(float(weight or 0), 2),
+                        'count': count
+                    }
+                    for bucket_date, weight, count in rows
+                ]
+            }
+        })
+
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+HEATMAP_WEEKDAY_LABELS = ['週一', '週二', '週三', '週四', '週五', '週六', '週日']
+
+
+@api_view(['GET'])
+@require_green_bean_permission('view')
+def green_bean_intake_heatmap_api(request):
+    """
+    生豆入庫時段熱力圖 API（24 小時 × 7 天）
+
+    時間以作業開始時間為準，沒有時使用記錄時間；
+    以單一 GROUP BY (小時, 星期) 查詢取得資料，再以 NumPy 轉為矩陣
+
+    查詢參數：
+        start_date / end_date: 日期範圍 YYYY-MM-DD（可選）
+        green_bean_name / silo: 篩選條件（可選）
+    """
+    try:
+        start_date = _parse_date(request.GET.get('start_date'))
+        end_date = _parse_date(request.GET.get('end_date'))
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        queryset = GreenBeanInboundRecord.objects.annotate(
+            intake_time=Coalesce('work_start_time', 'record_time')
+        ).filter(intake_time__isnull=False)
+        if start_date:
+            queryset = queryset.filter(intake_time__gte=datetime.combine(start_date, datetime.min.time()))
+        if end_date:
+            queryset = queryset.filter(
+                intake_time__lt=datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+            )
+        if request.GET.get('green_bean_name'):
+            queryset = queryset.filter(green_bean_name=request.GET['green_bean_name'])
+        if request.GET.get('silo'):
+            queryset = queryset.filter(green_bean_storage_silo=request.GET['silo'])
+
+        rows = list(
+            queryset.annotate(
+                hour=ExtractHour('intake_time'),
+                weekday=ExtractIsoWeekDay('intake_time')
+            )
+            .values('hour', 'weekday')
+            .annotate(count=Count('id'), weight=Sum('measured_weight_kg'))
+            .order_by()
+            .values_list('hour', 'weekday', 'count', 'weight')
+        )
+
+        counts = np.zeros((24, 7), dtype=np.int64)
+        weights = np.zeros((24, 7), dtype=float)
+        if rows:
+            hours, weekdays, row_counts, row_weights = zip(*rows)
+            # ISO 星期：1 = 週一 ... 7 = 週日
+            index = (np.array(hours, dtype=int), np.array(weekdays, dtype=int) - 1)
+            np.add.at(counts, index, np.array(row_counts, dtype=np.int64))
+            np.add.at(weights, index, np.array([float(w or 0) for w in row_weights]))
+
+        return Response({
+            'success': True,
+            'data': {
+                'hours': list(range(24)),
+                'weekdays': HEATMAP_WEEKDAY_LABELS,
+                'counts': counts.tolist(),
+                'weights': np.round(weights, 2).tolist(),
+                'total_count': int(counts.sum()),
+                'total_weight': round(float(weights.sum()), 2)
+            }
+        })
+
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _parse_cube_filter(name, raw):
+    """解析 Cube 篩選值（逗號分隔）；is_abnormal 轉為布林"""
+    values = [value.strip() for value in raw.split(',')]
+    if name == 'is_abnormal':
+        return [value.lower() in ('1', 'true', 'yes') for value in values]
+    return values
+
+
+@api_view(['GET'])
+@require_green_bean_permission('view')
+def green_bean_cube_api(request):
+    """
+    生豆入庫多維分析 API（記憶體 Cube 上的 slice / dice / roll-up）
+
+    查詢參數：
+        group_by: 分組維度，逗號分隔（green_bean_name、green_bean_storage_silo、
+                  execution_status、is_abnormal、day），省略時彙總為一列
+        day_granularity: day 維度的粒度 day / month / year（預設 day）
+        green_bean_name / green_bean_storage_silo / execution_status / is_abnormal:
+                  篩選值，逗號分隔可指定多個值
+        start_date / end_date: 記錄日期範圍 YYYY-MM-DD（可選）
+    """
+    try:
+        group_by = [name for name in request.GET.get('group_by', '').split(',') if name]
+        for name in group_by:
+            if name not in DIMENSIONS:
+                raise ValueError(f'不支援的維度: {name}')
+        if len(set(group_by)) != len(group_by):
+            raise ValueError('分組維度重複')
+        day_granularity = request.GET.get('day_granularity', 'day')
+        if day_granularity not in DAY_GRANULARITIES:
+            raise ValueError(f'不支援的日期粒度: {day_granularity}')
+        filters = {
+            name: _parse_cube_filter(name, request.GET[name])
+            for name in CATEGORICAL_DIMENSIONS
+            if request.GET.get(name)
+        }
+        start_date = _parse_date(request.GET.get('start_date'))
+        end_date = _parse_date(request.GET.get('end_date'))
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        cube = get_green_bean_cube()
+        rows = cube.query(
+            group_by=group_by,
+            filters=filters,
+            start_date=start_date,
+            end_date=end_date,
+            day_granularity=day_granularity,
+        )
+
+        return Response({
+            'success': True,
+            'data': {
+                'group_by': group_by,
+                'day_granularity': day_granularity if 'day' in group_by else None,
+                'rows': rows,
+                'cube': cube.info()
+            }
+        })
+
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
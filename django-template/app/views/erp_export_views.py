@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ERP 資料匯出
+匯出以串流回應逐批產生內容，記憶體用量與資料筆數無關
+"""
+import csv
+import tempfile
+from datetime import datetime
+
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+
+from app.models.models import GreenBeanInboundRecord, RawMaterialWarehouseRecord
+from app.serializers.user_serializer import GreenBeanInboundRecordSerializer
+from app.utils.activity_logger import log_user_activity
+from app.utils.dynamic_fields import get_record_day, infer_key_year, parse_date_key
+from app.utils.pagination import iterate_keyset
+from app.utils.permission_utils import require_green_bean_permission, require_raw_material_permission
+from app.utils.record_filters import filter_green_bean_records, filter_raw_material_records
+
+
+# 每批讀取的筆數
+EXPORT_BATCH_SIZE = 2000
+
+# 生豆匯出欄位（與記錄 API 相同，不含內部 id）
+GREEN_BEAN_EXPORT_FIELDS = [
+    name for name in GreenBeanInboundRecordSerializer.Meta.fields if name != 'id'
+]
+
+
+class _Echo:
+    """csv.writer 使用的虛擬檔案，write 直接回傳寫入的內容"""
+
+    def write(self, value):
+        return value
+
+
+def _format_csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool):
+        return '是' if value else '否'
+    return value
+
+
+def _export_filters(params):
+    """記錄在活動日誌中的篩選條件"""
+    return {
+        name: params[name]
+        for name in ('search', 'order_number', 'start_date', 'end_date', 'is_abnormal')
+        if params.get(name)
+    }
+
+
+@require_green_bean_permission('view')
+@require_http_methods(["GET"])
+def export_green_bean_records_csv(request):
+    """
+    匯出生豆入庫記錄 CSV（串流）
+
+    篩選參數與生豆入庫記錄 API 相同：search、order_number、start_date、end_date、is_abnormal
+    """
+    try:
+        queryset = filter_green_bean_records(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    user = request.user
+    filters = _export_filters(request.GET)
+    filename = f"green_bean_records_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    rows_queryset = queryset.values('id', *GREEN_BEAN_EXPORT_FIELDS)
+
+    def generate_rows():
+        writer = csv.writer(_Echo())
+        row_count = 0
+        completed = False
+        try:
+            # BOM 讓 Excel 以 UTF-8 開啟中文內容
+            yield '\ufeff'
+            yield writer.writerow([
+                GreenBeanInboundRecord._meta.get_field(name).verbose_name
+                for name in GREEN_BEAN_EXPORT_FIELDS
+            ])
+            for row in iterate_keyset(rows_queryset, 'record_time', batch_size=EXPORT_BATCH_SIZE):
+                row_count += 1
+                yield writer.writerow([_format_csv_value(row[name]) for name in GREEN_BEAN_EXPORT_FIELDS])
+            completed = True
+        finally:
+            log_user_activity(
+                user=user,
+                action='export',
+                description=f'匯出生豆入庫記錄 CSV（{row_count} 筆）' + ('' if completed else '，未完成'),
+                request=request,
+                details={
+                    'format': 'csv',
+                    'filename': filename,
+                    'row_count': row_count,
+                    'completed': completed,
+                    'filters': filters,
+                }
+            )
+
+    response = StreamingHttpResponse(generate_rows(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# 原料倉匯出的基本欄位（動態欄位接在後面）
+RAW_MATERIAL_EXPORT_FIELDS = [
+    'product_code', 'product_name', 'factory_batch_number', 'international_batch_number',
+    'standard_weight_kg', 'previous_month_inventory', 'incoming_stock', 'outgoing_stock',
+    'current_inventory', 'record_date',
+]
+
+# 日期動態欄位中同一天的異動類型順序（與月報表相同）
+DYNAMIC_MOVEMENT_ORDER = {'入庫': 0, '領用': 1, '轉出': 2}
+# 日期欄位之後的彙總欄位順序
+DYNAMIC_TRAILING_PREFIXES = ('盤盈虧(外賣)_', '小計_', '領用_小計', '*月**日 庫存_after', '包數_after')
+
+def dynamic_column(key, record_day):
+    """
+    動態欄位對應的匯出欄位：(年, 欄位名稱)
+
+    年份由 infer_key_year() 依記錄日期推得（與 BI 匯出相同）；非日期欄位與沒有日期的記錄年份為 None
+
+    Args:
+        key: dynamic_fields 的鍵
+        record_day: 記錄日期（記錄日期，沒有時為建立日期）
+    """
+    parsed = parse_date_key(key)
+    if parsed is None:
+        return None, key
+    return infer_key_year(parsed[0], record_day), key
+
+
+def dynamic_column_sort_key(column):
+    """
+    動態欄位的欄位順序
+
+    column 為 dynamic_column() 回傳的 (年, 欄位名稱)。日期欄位依年、月、日排序，
+    跨月掛帳欄位（10/31掛11/1帳_入庫）排在入帳日當天之前，同一天依異動類型排序；
+    其後是小計等彙總欄位，其他欄位依名稱排在最後
+    """
+    year, key = column
+    year = year or 0
+    parsed = parse_date_key(key)
+    if parsed:
+        month, day, movement, carry_over = parsed
+        return (
+            0, year, month, day, 0 if carry_over else 1,
+            DYNAMIC_MOVEMENT_ORDER.get(movement, len(DYNAMIC_MOVEMENT_ORDER)), key
+        )
+    for index, prefix in enumerate(DYNAMIC_TRAILING_PREFIXES):
+        if key.startswith(prefix):
+            return (1, 0, index, 0, 0, 0, key)
+    return (2, 0, 0, 0, 0, 0, key)
+
+
+def dynamic_column_header(column, multiple_years):
+    """欄位標題：匯出範圍跨年度時在日期欄位前加上年份"""
+    year, key = column
+    if multiple_years and year is not None:
+        return f'{year}/{key}'
+    return key
+
+
+def _filter_raw_material_export(params):
+    """原料倉匯出篩選：記錄 API 的篩選條件，加上記錄日期的年、月"""
+    queryset = filter_raw_material_records(params)
+    if params.get('year'):
+        queryset = queryset.filter(record_date__year=int(params['year']))
+    if params.get('month'):
+        queryset = queryset.filter(record_date__month=int(params['month']))
+    return queryset
+
+
+@require_raw_material_permission('view')
+@require_http_methods(["GET"])
+def export_raw_material_records_xlsx(request):
+    """
+    匯出原料倉記錄 XLSX（動態欄位展開為欄位）
+
+    以 openpyxl write_only 模式逐列寫入暫存檔：第一次掃描只讀取 dynamic_fields 取得所有動態欄位，
+    第二次掃描逐批寫入資料列，記憶體用量只與動態欄位數及每批筆數有關
+
+    篩選參數：search、product_code、low_inventory（同原料倉記錄 API），year、month（記錄日期）
+    """
+    from openpyxl import Workbook
+
+    try:
+        queryset = _filter_raw_material_export(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    # 第一次掃描：動態欄位聯集（依 (年, 欄位名稱) 區分不同年度的同一日期）
+    dynamic_keys = set()
+    for row in iterate_keyset(
+        queryset.values('id', 'created_at', 'record_date', 'dynamic_fields'), 'created_at',
+        batch_size=EXPORT_BATCH_SIZE, descending=False
+    ):
+        record_day = get_record_day(row)
+        dynamic_keys.update(dynamic_column(key, record_day) for key in (row['dynamic_fields'] or {}))
+    dynamic_columns = sorted(dynamic_keys, key=dynamic_column_sort_key)
+    multiple_years = len({year for year, _ in dynamic_columns if year is not None}) > 1
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('原料倉記錄')
+    sheet.append(
+        [str(RawMaterialWarehouseRecord._meta.get_field(name).verbose_name) for name in RAW_MATERIAL_EXPORT_FIELDS]
+        + [dynamic_column_header(column, multiple_years) for column in dynamic_columns]
+    )
+
+    # 第二次掃描：逐列寫入
+    row_count = 0
+    for row in iterate_keyset(
+        queryset.values('id', 'created_at', 'dynamic_fields', *RAW_MATERIAL_EXPORT_FIELDS), 'created_at',
+        batch_size=EXPORT_BATCH_SIZE, descending=False
+    ):
+        record_day = get_record_day(row)
+        values = {
+            dynamic_column(key, record_day): value
+            for key, value in (row['dynamic_fields'] or {}).items()
+        }
+        sheet.append(
+            [row[name] for name in RAW_MATERIAL_EXPORT_FIELDS]
+            + [values.get(column) for column in dynamic_columns]
+        )
+        row_count += 1
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+
+    filename = f"raw_material_records_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    log_user_activity(
+        user=request.user,
+        action='export',
+        description=f'匯出原料倉記錄 XLSX（{row_count} 筆）',
+        request=request,
+        details={
+            'format': 'xlsx',
+            'filename': filename,
+            'row_count': row_count,
+            'dynamic_column_count': len(dynamic_columns),
+            'filters': {
+                name: request.GET[name]
+                for name in ('search', 'product_code', 'low_inventory', 'year', 'month')
+                if request.GET.get(name)
+            },
+        }
+    )
+
+    # FileResponse 以區塊讀取暫存檔，傳送完畢後關閉（暫存檔隨之刪除）
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
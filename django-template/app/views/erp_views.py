@@ -1,11 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from django.db.models import Q, Sum, Avg, Count
+from django.db.models import Sum
 from django.utils.decorators import method_decorator
 from django.views import View
 from rest_framework import generics, status
@@ -22,19 +22,40 @@ import re
 import math
 import io
 import calendar
+from contextlib import ExitStack
 
-from app.models.models import GreenBeanInboundRecord, RawMaterialWarehouseRecord, RawMaterialMonthlySummary, UserActivityLog, FileUploadRecord, UploadRecordRelation
+from app.models.models import GreenBeanInboundRecord, RawMaterialWarehouseRecord, RawMaterialMonthlySummary, UserActivityLog, FileUploadRecord, UploadRecordRelation, UploadInFlight, GreenBeanDailyRollup, RawMaterialDailyRollup
 from app.serializers.user_serializer import (
     GreenBeanInboundRecordSerializer,
     RawMaterialWarehouseRecordSerializer,
-    RawMaterialMonthlySummarySerializer
+    RawMaterialMonthlySummarySerializer,
+    parse_field_projection,
+    serialize_columnar,
+    serialize_values
 )
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from app.utils.activity_logger import log_user_activity, get_recent_user_activities, get_important_user_activities, _log_to_django_admin
+from app.utils.activity_logger import log_user_activity, get_recent_user_activities, get_important_user_activities, _log_to_django_admin, parse_chart_window, CHART_WINDOW_CHOICES
 from django.db import transaction
 from django.core.files.storage import default_storage
 from app.utils.permission_utils import get_user_accessible_sections, require_green_bean_permission, require_raw_material_permission
+from app.utils.upload_utils import (
+    apply_upload_stats,
+    compute_green_bean_upload_stats,
+    compute_raw_material_upload_stats,
+    get_upload_history_queryset,
+    serialize_upload_history_row,
+    upload_single_flight
+)
+from app.utils.pagination import count_total, keyset_paginate, parse_page_size
+from app.utils.record_filters import filter_green_bean_records, filter_raw_material_records
+from app.utils.upload_admission import get_upload_queue_status, upload_admission
+from app.utils.rollups import rollup_batch
+from app.utils.dashboard_stats import LOW_INVENTORY_THRESHOLD, get_dashboard_charts_data, get_dashboard_stats
+from app.utils.widget_stats import WidgetContext, compute_widget, compute_widgets
+from app.utils.change_feed import CursorExpired, get_changes
+from app.utils.conditional import conditional_on_data
+from app.utils.data_version import GREEN_BEAN, RAW_MATERIAL
 
 
 class ERPDashboardView(LoginRequiredMixin, PermissionRequiredMixin, View):
@@ -58,76 +79,8 @@ class ERPDashboardView(LoginRequiredMixin, PermissionRequiredMixin, View):
         # 獲取使用者權限
         user_permissions = get_user_accessible_sections(request.user)
         
-        # 根據權限過濾統計數據
-        stats = {}
-        
-        if user_permissions['green_bean']:
-            # 今日入庫記錄數量
-            today = datetime.now().date()
-            today_records = GreenBeanInboundRecord.objects.filter(
-                record_time__date=today
-            ).count()
-            
-            # 總生豆入庫量（所有時間的總重量）
-            total_weight = GreenBeanInboundRecord.objects.filter(
-                measured_weight_kg__isnull=False
-            ).aggregate(total=Sum('measured_weight_kg'))['total'] or 0
-            
-            # 本週總重量
-            week_start = today - timedelta(days=today.weekday())
-            week_weight = GreenBeanInboundRecord.objects.filter(
-                record_time__date__gte=week_start,
-                measured_weight_kg__isnull=False
-            ).aggregate(total=Sum('measured_weight_kg'))['total'] or 0
-            
-            # 異常記錄數量
-            abnormal_count = GreenBeanInboundRecord.objects.filter(is_abnormal=True).count()
-            
-            # 本月平均重量
-            current_month_avg = GreenBeanInboundRecord.objects.filter(
-                record_time__month=datetime.now().month,
-                record_time__year=datetime.now().year,
-                measured_weight_kg__isnull=False
-            ).aggregate(avg=Avg('measured_weight_kg'))['avg'] or 0
-            
-            stats.update({
-                'total_green_bean_records': GreenBeanInboundRecord.objects.count(),
-                'recent_abnormal_records': abnormal_count,
-                'current_month_records': GreenBeanInboundRecord.objects.filter(
-                    record_time__month=datetime.now().month,
-                    record_time__year=datetime.now().year
-                ).count(),
-                'today_green_bean_records': today_records,
-                'total_green_bean_weight': round(float(total_weight), 2),
-                'week_total_weight': round(float(week_weight), 2),
-                'month_avg_weight': round(float(current_month_avg), 2)
-            })
-        
-        if user_permissions['raw_material']:
-            # 低庫存商品數量
-            low_inventory_threshold = 100
-            low_inventory_count = RawMaterialWarehouseRecord.objects.filter(
-                current_inventory__lt=low_inventory_threshold,
-                current_inventory__gt=0
-            ).count()
-            
-            # 總庫存價值（假設有單價欄位，這裡用庫存數量代替）
-            total_inventory = RawMaterialWarehouseRecord.objects.aggregate(
-                total=Sum('current_inventory')
-            )['total'] or 0
-            
-            # 本月出入庫次數
-            current_month_transactions = RawMaterialWarehouseRecord.objects.filter(
-                record_time__month=datetime.now().month,
-                record_time__year=datetime.now().year
-            ).count()
-            
-            stats.update({
-                'total_raw_material_records': RawMaterialWarehouseRecord.objects.count(),
-                'current_month_raw_material_records': current_month_transactions,
-                'low_inventory_count': low_inventory_count,
-                'total_inventory_amount': total_inventory
-            })
+        # 根據權限過濾統計數據（由快取的統計服務提供）
+        stats = get_dashboard_stats(user_permissions)
         
         # 根據權限獲取最近的記錄
         recent_green_bean_records = []
@@ -140,16 +93,14 @@ class ERPDashboardView(LoginRequiredMixin, PermissionRequiredMixin, View):
         if user_permissions['raw_material']:
             recent_raw_material_records = RawMaterialWarehouseRecord.objects.order_by('-created_at')[:10]
             # 庫存警示（低庫存商品）
-            low_inventory_threshold = 100
             low_inventory_items = RawMaterialWarehouseRecord.objects.filter(
-                current_inventory__lt=low_inventory_threshold,
+                current_inventory__lt=LOW_INVENTORY_THRESHOLD,
                 current_inventory__gt=0
             ).order_by('current_inventory')[:10]
         
-        # 獲取圖表數據
-        from app.utils.activity_logger import get_weekly_charts_data
-        import json
-        weekly_charts_data = json.dumps(get_weekly_charts_data())
+        # 獲取圖表數據（天數範圍可由 chart_days 參數指定）
+        chart_days = parse_chart_window(request.GET.get('chart_days'))
+        weekly_charts_data = json.dumps(get_dashboard_charts_data(chart_days))
         
         context = {
             'stats': stats,
@@ -157,6 +108,8 @@ class ERPDashboardView(LoginRequiredMixin, PermissionRequiredMixin, View):
             'recent_raw_material_records': recent_raw_material_records,
             'low_inventory_items': low_inventory_items,
             'weekly_charts_data': weekly_charts_data,
+            'chart_days': chart_days,
+            'chart_window_choices': CHART_WINDOW_CHOICES,
             'user_permissions': user_permissions,
         }
         
@@ -187,76 +140,8 @@ class ERPCleanDashboardView(LoginRequiredMixin, PermissionRequiredMixin, View):
         # 獲取使用者權限
         user_permissions = get_user_accessible_sections(request.user)
 
-        # 根據權限過濾統計數據
-        stats = {}
-
-        if user_permissions['green_bean']:
-            # 今日入庫記錄數量
-            today = datetime.now().date()
-            today_records = GreenBeanInboundRecord.objects.filter(
-                record_time__date=today
-            ).count()
-            
-            # 總生豆入庫量（所有時間的總重量）
-            total_weight = GreenBeanInboundRecord.objects.filter(
-                measured_weight_kg__isnull=False
-            ).aggregate(total=Sum('measured_weight_kg'))['total'] or 0
-            
-            # 本週總重量
-            week_start = today - timedelta(days=today.weekday())
-            week_weight = GreenBeanInboundRecord.objects.filter(
-                record_time__date__gte=week_start,
-                measured_weight_kg__isnull=False
-            ).aggregate(total=Sum('measured_weight_kg'))['total'] or 0
-            
-            # 異常記錄數量
-            abnormal_count = GreenBeanInboundRecord.objects.filter(is_abnormal=True).count()
-            
-            # 本月平均重量
-            current_month_avg = GreenBeanInboundRecord.objects.filter(
-                record_time__month=datetime.now().month,
-                record_time__year=datetime.now().year,
-                measured_weight_kg__isnull=False
-            ).aggregate(avg=Avg('measured_weight_kg'))['avg'] or 0
-            
-            stats.update({
-                'total_green_bean_records': GreenBeanInboundRecord.objects.count(),
-                'recent_abnormal_records': abnormal_count,
-                'current_month_records': GreenBeanInboundRecord.objects.filter(
-                    record_time__month=datetime.now().month,
-                    record_time__year=datetime.now().year
-                ).count(),
-                'today_green_bean_records': today_records,
-                'total_green_bean_weight': round(float(total_weight), 2),
-                'week_total_weight': round(float(week_weight), 2),
-                'month_avg_weight': round(float(current_month_avg), 2)
-            })
-
-        if user_permissions['raw_material']:
-            # 低庫存商品數量
-            low_inventory_threshold = 100
-            low_inventory_count = RawMaterialWarehouseRecord.objects.filter(
-                current_inventory__lt=low_inventory_threshold,
-                current_inventory__gt=0
-            ).count()
-            
-            # 總庫存數量
-            total_inventory = RawMaterialWarehouseRecord.objects.aggregate(
-                total=Sum('current_inventory')
-            )['total'] or 0
-            
-            # 本月出入庫次數
-            current_month_transactions = RawMaterialWarehouseRecord.objects.filter(
-                created_at__month=datetime.now().month,
-                created_at__year=datetime.now().year
-            ).count()
-            
-            stats.update({
-                'total_raw_material_records': RawMaterialWarehouseRecord.objects.count(),
-                'current_month_raw_material_records': current_month_transactions,
-                'low_inventory_count': low_inventory_count,
-                'total_inventory_amount': total_inventory
-            })
+        # 根據權限過濾統計數據（由快取的統計服務提供）
+        stats = get_dashboard_stats(user_permissions)
 
         # 根據權限獲取記錄
         recent_records = []
@@ -267,9 +152,8 @@ class ERPCleanDashboardView(LoginRequiredMixin, PermissionRequiredMixin, View):
 
         if user_permissions['raw_material']:
             # 庫存警示（低庫存商品）
-            low_inventory_threshold = 100  # 可以設定為設置項
             low_inventory_items = RawMaterialWarehouseRecord.objects.filter(
-                current_inventory__lt=low_inventory_threshold,
+                current_inventory__lt=LOW_INVENTORY_THRESHOLD,
                 current_inventory__gt=0
             ).order_by('current_inventory')[:10]
 
@@ -277,10 +161,10 @@ class ERPCleanDashboardView(LoginRequiredMixin, PermissionRequiredMixin, View):
         recent_activities = get_important_user_activities(limit=30)
 
         # 獲取本週記錄統計
-        from app.utils.activity_logger import get_weekly_records_comparison, get_weekly_charts_data
-        import json
+        from app.utils.activity_logger import get_weekly_records_comparison
         weekly_comparison = get_weekly_records_comparison()
-        weekly_charts_data = json.dumps(get_weekly_charts_data())
+        chart_days = parse_chart_window(request.GET.get('chart_days'))
+        weekly_charts_data = json.dumps(get_dashboard_charts_data(chart_days))
 
         context = {
             'stats': stats,
@@ -289,70 +173,95 @@ class ERPCleanDashboardView(LoginRequiredMixin, PermissionRequiredMixin, View):
             'recent_activities': recent_activities,
             'weekly_comparison': weekly_comparison,
             'weekly_charts_data': weekly_charts_data,
+            'chart_days': chart_days,
+            'chart_window_choices': CHART_WINDOW_CHOICES,
             'user_permissions': user_permissions,
         }
 
         return render(request, self.template_name, context)
 
 
+RECORD_RESPONSE_LAYOUTS = ('objects', 'columnar')
+
+
+def _record_page(request, queryset, serializer_class, order_field, cursor, page_size):
+    """
+    取得記錄 API 的一頁資料並序列化
+    
+    依 fields 與 layout 參數選擇查詢方式：
+        columnar: values_list() 直接輸出欄位名稱與資料列
+        指定 fields: values() 查詢後以輕量方式序列化
+        其他: 完整的 ModelSerializer（只載入序列化器需要的欄位）
+    
+    Returns:
+        tuple: (回應的 data, 下一頁游標)
+    """
+    layout = request.GET.get('layout', 'objects')
+    if layout not in RECORD_RESPONSE_LAYOUTS:
+        raise ValueError(f'不支援的回應格式: {layout}')
+    fields = parse_field_projection(request.GET.get('fields'), serializer_class)
+    
+    if layout == 'columnar':
+        columns = fields or list(serializer_class.Meta.fields)
+        # 分頁另外需要排序欄位與 id，附加在輸出欄位之後
+        page_queryset = queryset.values_list(*dict.fromkeys(columns + [order_field, 'id']), named=True)
+        records, next_cursor = keyset_paginate(page_queryset, order_field, cursor=cursor, page_size=page_size)
+        return serialize_columnar(records, columns), next_cursor
+    
+    if fields:
+        # 只查詢需要的欄位（分頁另外需要排序欄位與 id）
+        page_queryset = queryset.values(*dict.fromkeys(fields + [order_field, 'id']))
+        records, next_cursor = keyset_paginate(page_queryset, order_field, cursor=cursor, page_size=page_size)
+        return serialize_values(records, fields), next_cursor
+    
+    page_queryset = queryset.only(*serializer_class.Meta.fields)
+    records, next_cursor = keyset_paginate(page_queryset, order_field, cursor=cursor, page_size=page_size)
+    return serializer_class(records, many=True).data, next_cursor
+
+
 @api_view(['GET'])
 @require_green_bean_permission('view')
+@conditional_on_data(GREEN_BEAN)
 def green_bean_records_api(request):
-    """生豆入庫記錄 API - 需要ERP查看權限"""
+    """
+    生豆入庫記錄 API - 需要ERP查看權限
+    
+    以 (record_time, id) keyset 分頁：第一頁不帶 cursor，之後帶入上一頁回傳的 next_cursor
+    
+    查詢參數：
+        cursor: 分頁游標（可選）
+        page_size: 每頁筆數（預設 20，最多 100）
+        total: 總筆數模式 none / estimate / exact（預設 none）
+        fields: 回傳欄位，逗號分隔（可選，指定時以 values() 查詢並以輕量方式序列化）
+        layout: objects（預設，每筆一個物件）/ columnar（{columns: [...], rows: [[...], ...]}）
+            （不使用 format：DRF 將 format 參數視為回應格式覆寫）
+        search / order_number / start_date / end_date / is_abnormal: 篩選條件
+    """
     try:
         # 查詢參數
-        page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', 20))
-        search = request.GET.get('search', '')
-        order_number = request.GET.get('order_number', '')
-        start_date = request.GET.get('start_date', '')
-        end_date = request.GET.get('end_date', '')
-        is_abnormal = request.GET.get('is_abnormal', '')
-        
-        # 基本查詢
-        queryset = GreenBeanInboundRecord.objects.all()
+        cursor = request.GET.get('cursor')
+        page_size = parse_page_size(request.GET.get('page_size'))
+        total_mode = request.GET.get('total', 'none')
         
         # 應用過濾條件
-        if search:
-            queryset = queryset.filter(
-                Q(green_bean_name__icontains=search) |
-                Q(green_bean_code__icontains=search) |
-                Q(order_number__icontains=search)
-            )
-        
-        if order_number:
-            queryset = queryset.filter(order_number__icontains=order_number)
-        
-        if start_date:
-            start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
-            queryset = queryset.filter(record_time__gte=start_datetime)
+        queryset = filter_green_bean_records(request.GET)
         
-        if end_date:
-            end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-            queryset = queryset.filter(record_time__lt=end_datetime)
+        # 分頁與序列化（依記錄時間新到舊）
+        data, next_cursor = _record_page(request, queryset, GreenBeanInboundRecordSerializer, 'record_time', cursor, page_size)
         
-        if is_abnormal:
-            queryset = queryset.filter(is_abnormal=(is_abnormal.lower() == 'true'))
-        
-        # 排序
-        queryset = queryset.order_by('-record_time')
-        
-        # 分頁
-        paginator = Paginator(queryset, page_size)
-        page_obj = paginator.get_page(page)
-        
-        # 序列化數據
-        serializer = GreenBeanInboundRecordSerializer(page_obj.object_list, many=True)
+        # 沒有篩選條件時總筆數直接由每日彙總表取得
+        unfiltered_count = None
+        if not queryset.query.has_filters():
+            unfiltered_count = lambda: GreenBeanDailyRollup.objects.aggregate(total=Sum('record_count'))['total'] or 0
         
         return Response({
             'success': True,
-            'data': serializer.data,
+            'data': data,
             'pagination': {
-                'current_page': page_obj.number,
-                'total_pages': paginator.num_pages,
-                'total_count': paginator.count,
-                'has_next': page_obj.has_next(),
-                'has_previous': page_obj.has_previous()
+                'page_size': page_size,
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None,
+                **count_total(queryset, total_mode, unfiltered_count)
             }
         })
         
@@ -365,56 +274,47 @@ def green_bean_records_api(request):
 
 @api_view(['GET'])
 @require_raw_material_permission('view')
+@conditional_on_data(RAW_MATERIAL)
 def raw_material_records_api(request):
-    """原料倉記錄 API - 需要ERP查看權限"""
+    """
+    原料倉記錄 API - 需要ERP查看權限
+    
+    以 (created_at, id) keyset 分頁：第一頁不帶 cursor，之後帶入上一頁回傳的 next_cursor
+    
+    查詢參數：
+        cursor: 分頁游標（可選）
+        page_size: 每頁筆數（預設 20，最多 100）
+        total: 總筆數模式 none / estimate / exact（預設 none）
+        fields: 回傳欄位，逗號分隔（可選，指定時以 values() 查詢並以輕量方式序列化）
+        layout: objects（預設，每筆一個物件）/ columnar（{columns: [...], rows: [[...], ...]}）
+            （不使用 format：DRF 將 format 參數視為回應格式覆寫）
+        search / product_code / low_inventory: 篩選條件
+    """
     try:
         # 查詢參數
-        page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', 20))
-        search = request.GET.get('search', '')
-        product_code = request.GET.get('product_code', '')
-        low_inventory = request.GET.get('low_inventory', '')
-        
-        # 基本查詢
-        queryset = RawMaterialWarehouseRecord.objects.all()
+        cursor = request.GET.get('cursor')
+        page_size = parse_page_size(request.GET.get('page_size'))
+        total_mode = request.GET.get('total', 'none')
         
         # 應用過濾條件
-        if search:
-            queryset = queryset.filter(
-                Q(product_name__icontains=search) |
-                Q(product_code__icontains=search) |
-                Q(factory_batch_number__icontains=search)
-            )
+        queryset = filter_raw_material_records(request.GET)
         
-        if product_code:
-            queryset = queryset.filter(product_code__icontains=product_code)
+        # 分頁與序列化（依建立時間新到舊）
+        data, next_cursor = _record_page(request, queryset, RawMaterialWarehouseRecordSerializer, 'created_at', cursor, page_size)
         
-        if low_inventory:
-            threshold = int(low_inventory)
-            queryset = queryset.filter(
-                current_inventory__lt=threshold,
-                current_inventory__gt=0
-            )
-        
-        # 排序
-        queryset = queryset.order_by('-created_at')
-        
-        # 分頁
-        paginator = Paginator(queryset, page_size)
-        page_obj = paginator.get_page(page)
-        
-        # 序列化數據
-        serializer = RawMaterialWarehouseRecordSerializer(page_obj.object_list, many=True)
+        # 沒有篩選條件時總筆數直接由每日彙總表取得
+        unfiltered_count = None
+        if not queryset.query.has_filters():
+            unfiltered_count = lambda: RawMaterialDailyRollup.objects.aggregate(total=Sum('record_count'))['total'] or 0
         
         return Response({
             'success': True,
-            'data': serializer.data,
+            'data': data,
             'pagination': {
-                'current_page': page_obj.number,
-                'total_pages': paginator.num_pages,
-                'total_count': paginator.count,
-                'has_next': page_obj.has_next(),
-                'has_previous': page_obj.has_previous()
+                'page_size': page_size,
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None,
+                **count_total(queryset, total_mode, unfiltered_count)
             }
         })
         
@@ -425,39 +325,88 @@ def raw_material_records_api(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def inventory_statistics_api(request):
-    """庫存統計 API - 需要ERP查看權限"""
+def _changes_response(request, model, table, serializer_class):
+    """變更摘要 API 的共用處理"""
     try:
-        # 總庫存統計
-        total_stats = RawMaterialWarehouseRecord.objects.aggregate(
-            total_inventory=Sum('current_inventory'),
-            total_incoming=Sum('incoming_stock'),
-            total_outgoing=Sum('outgoing_stock'),
-            avg_inventory=Avg('current_inventory')
+        limit = parse_page_size(request.GET.get('limit'), default=500, maximum=2000)
+        feed = get_changes(
+            model, table, serializer_class.Meta.fields,
+            cursor=request.GET.get('cursor'), limit=limit
         )
+        feed['changes'] = serialize_values(feed['changes'], serializer_class.Meta.fields)
+        
+        return Response({
+            'success': True,
+            'data': feed
+        })
         
-        # 低庫存商品
-        low_inventory_threshold = int(request.GET.get('threshold', 100))
-        low_inventory_items = RawMaterialWarehouseRecord.objects.filter(
-            current_inventory__lt=low_inventory_threshold,
-            current_inventory__gt=0
-        ).values('product_code', 'product_name', 'current_inventory').order_by('current_inventory')[:20]
+    except CursorExpired as e:
+        # 客戶端需捨棄本地資料並不帶 cursor 重新同步
+        return Response({
+            'success': False,
+            'error': str(e),
+            'resync': True
+        }, status=status.HTTP_410_GONE)
         
-        # 按產品類別統計
-        product_stats = RawMaterialWarehouseRecord.objects.values('product_name').annotate(
-            item_count=Count('id'),
-            total_inventory=Sum('current_inventory'),
-            avg_inventory=Avg('current_inventory')
-        ).order_by('-total_inventory')[:10]
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@require_green_bean_permission('view')
+def green_bean_changes_api(request):
+    """
+    生豆入庫記錄變更摘要 API - 需要ERP查看權限
+    
+    回傳游標之後新增或修改的記錄（changes）與已刪除的記錄 ID（deleted）；
+    第一次不帶 cursor 會從頭讀取全部記錄，之後帶入上一次回傳的 next_cursor。
+    has_more 為 true 時應立即再次呼叫，否則可稍後輪詢。
+    游標早於刪除記錄的保留期限時回傳 410 與 resync: true，客戶端需不帶 cursor 重新完整同步
+    
+    查詢參數：
+        cursor: 上一次回傳的 next_cursor（可選）
+        limit: 每次最多回傳的異動與刪除筆數（預設 500，最多 2000）
+    """
+    return _changes_response(request, GreenBeanInboundRecord, GREEN_BEAN, GreenBeanInboundRecordSerializer)
+
+
+@api_view(['GET'])
+@require_raw_material_permission('view')
+def raw_material_changes_api(request):
+    """
+    原料倉記錄變更摘要 API - 需要ERP查看權限
+    
+    參數與回傳格式同 green_bean_changes_api
+    """
+    return _changes_response(request, RawMaterialWarehouseRecord, RAW_MATERIAL, RawMaterialWarehouseRecordSerializer)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on_data(RAW_MATERIAL)
+def inventory_statistics_api(request):
+    """
+    庫存統計 API - 需要ERP查看權限
+    
+    查詢參數：
+        threshold: 低庫存門檻（預設 100）
+        months: 月度統計回傳的月份數（預設 12）
+    """
+    try:
+        # 總庫存統計與月度統計共用同一次月度統計查詢
+        context = WidgetContext(request.user)
+        params = request.GET.dict()
         
         return Response({
             'success': True,
             'data': {
-                'total_stats': total_stats,
-                'low_inventory_items': list(low_inventory_items),
-                'product_stats': list(product_stats)
+                'total_stats': compute_widget('inventory_totals', params, context, check_permission=False),
+                'monthly_summary': compute_widget('monthly_summary', params, context, check_permission=False),
+                'low_inventory_items': compute_widget('low_inventory_items', params, context, check_permission=False),
+                'product_stats': compute_widget('product_stats', params, context, check_permission=False)
             }
         })
         
@@ -470,47 +419,28 @@ def inventory_statistics_api(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_on_data(GREEN_BEAN, daily=True)
 def production_statistics_api(request):
-    """生產統計 API - 需要ERP查看權限"""
+    """
+    生產統計 API - 需要ERP查看權限
+    
+    查詢參數：
+        days: 統計最近幾天（預設 30）
+        granularity: 時間序列粒度 day / week / month，可用逗號指定多個（預設 day）
+    """
     try:
-        # 時間範圍
-        days = int(request.GET.get('days', 30))
-        start_date = datetime.now() - timedelta(days=days)
-        
-        # 生產統計
-        production_stats = GreenBeanInboundRecord.objects.filter(
-            record_time__gte=start_date
-        ).aggregate(
-            total_records=Count('id'),
-            total_weight=Sum('measured_weight_kg'),
-            avg_weight=Avg('measured_weight_kg'),
-            abnormal_count=Count('id', filter=Q(is_abnormal=True))
-        )
-        
-        # 每日生產量
-        daily_production = GreenBeanInboundRecord.objects.filter(
-            record_time__gte=start_date
-        ).extra(
-            select={'day': 'DATE(record_time)'}
-        ).values('day').annotate(
-            daily_weight=Sum('measured_weight_kg'),
-            daily_count=Count('id')
-        ).order_by('day')
-        
-        # 按生豆類型統計
-        bean_type_stats = GreenBeanInboundRecord.objects.filter(
-            record_time__gte=start_date
-        ).values('green_bean_name').annotate(
-            total_weight=Sum('measured_weight_kg'),
-            record_count=Count('id')
-        ).order_by('-total_weight')[:10]
+        # 三個統計共用同一次每日彙總表查詢
+        context = WidgetContext(request.user)
+        params = request.GET.dict()
         
         return Response({
             'success': True,
             'data': {
-                'production_stats': production_stats,
-                'daily_production': list(daily_production),
-                'bean_type_stats': list(bean_type_stats)
+                'production_stats': compute_widget('production_totals', params, context, check_permission=False),
+                'daily_production': compute_widget('daily_production', params, context, check_permission=False),
+                'bean_type_stats': compute_widget('bean_type_stats', params, context, check_permission=False),
+                'granularity': params.get('granularity') or 'day',
+                'production_series': compute_widget('production_series', params, context, check_permission=False)
             }
         })
         
@@ -521,6 +451,35 @@ def production_statistics_api(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def dashboard_widgets_api(request):
+    """
+    複合統計 API：一次請求計算多個儀表板元件
+    
+    請求內容（JSON）：
+        {"widgets": [{"key": "prod", "widget": "production_totals", "params": {"days": 7}}, ...]}
+        key 省略時以元件名稱為鍵；可用元件見 app.utils.widget_stats.WIDGETS
+    
+    回傳 data 為 {key: {"success": ..., "data" 或 "error": ...}}，
+    沒有權限或參數錯誤的元件只影響自己的結果
+    """
+    try:
+        context = WidgetContext(request.user)
+        results = compute_widgets(request.data.get('widgets'), context)
+        
+        return Response({
+            'success': True,
+            'data': results
+        })
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
 @require_green_bean_permission('view')
 def green_bean_records_view(request):
     """生豆入庫記錄頁面視圖"""
@@ -625,215 +584,229 @@ def green_bean_upload_file(request):
                 'duplicate': True
             })
         
-        # 使用事務處理檔案上傳
-        with transaction.atomic():
-            # 創建上傳記錄
-            upload_record = FileUploadRecord.objects.create(
-                file_name=uploaded_file.name,
-                file_hash=file_hash,
-                file_size=uploaded_file.size,
-                uploaded_by=request.user,
-                file_type='green_bean',
-                status='pending'
-            )
+        # 同一檔案同時上傳時只由一個請求解析，其餘請求立即回覆處理中或沿用其結果；
+        # 先取得鎖定再取得准入名額，重複的上傳不佔用名額
+        with upload_single_flight(file_hash, 'green_bean', request.user) as is_leader, ExitStack() as admission_stack:
+            if not is_leader or FileUploadRecord.objects.filter(file_hash=file_hash).exists():
+                return _coalesced_upload_response(file_hash)
+            rejected = admission_stack.enter_context(upload_admission(request))
+            if rejected is not None:
+                return rejected
+            
+            # 使用事務處理檔案上傳
+            with transaction.atomic(), rollup_batch():
+                # 創建上傳記錄
+                upload_record = FileUploadRecord.objects.create(
+                    file_name=uploaded_file.name,
+                    file_hash=file_hash,
+                    file_size=uploaded_file.size,
+                    uploaded_by=request.user,
+                    file_type='green_bean',
+                    status='pending'
+                )
             
-            try:
-                # 處理Excel文件
-                df = pd.read_excel(uploaded_file)
+                try:
+                    # 處理Excel文件
+                    df = pd.read_excel(uploaded_file)
                 
-                print(f"原始欄位名稱: {df.columns.tolist()}")
+                    print(f"原始欄位名稱: {df.columns.tolist()}")
                 
-                # 清理欄位名稱：移除換行符和空格
-                df.columns = df.columns.str.replace('\n', '').str.strip()
+                    # 清理欄位名稱：移除換行符和空格
+                    df.columns = df.columns.str.replace('\n', '').str.strip()
                 
-                print(f"清理後欄位名稱: {df.columns.tolist()}")
+                    print(f"清理後欄位名稱: {df.columns.tolist()}")
                 
-                # 清理數據：移除完全空白的行
-                df = df.dropna(how='all')
+                    # 清理數據：移除完全空白的行
+                    df = df.dropna(how='all')
                 
-                # 清理數據：移除關鍵欄位都是空的行
-                key_columns = ['單號', '生豆名稱', '生豆料號']
-                df = df.dropna(subset=key_columns, how='all')
+                    # 清理數據：移除關鍵欄位都是空的行
+                    key_columns = ['單號', '生豆名稱', '生豆料號']
+                    df = df.dropna(subset=key_columns, how='all')
                 
-                print(f"清理後剩餘 {len(df)} 行數據")
+                    print(f"清理後剩餘 {len(df)} 行數據")
                 
-                # 檢查必要欄位 - 根據實際Excel檔案調整
-                required_columns = ['單號', '生豆名稱', '生豆料號']
-                missing_columns = [col for col in required_columns if col not in df.columns]
+                    # 檢查必要欄位 - 根據實際Excel檔案調整
+                    required_columns = ['單號', '生豆名稱', '生豆料號']
+                    missing_columns = [col for col in required_columns if col not in df.columns]
                 
-                if missing_columns:
-                    upload_record.status = 'failed'
-                    upload_record.error_message = f'缺少必要欄位: {", ".join(missing_columns)}'
-                    upload_record.save()
-                    return JsonResponse({
-                        'success': False, 
-                        'message': f'檔案格式錯誤，缺少必要欄位: {", ".join(missing_columns)}'
-                    })
+                    if missing_columns:
+                        upload_record.status = 'failed'
+                        upload_record.error_message = f'缺少必要欄位: {", ".join(missing_columns)}'
+                        upload_record.save()
+                        return JsonResponse({
+                            'success': False, 
+                            'message': f'檔案格式錯誤，缺少必要欄位: {", ".join(missing_columns)}'
+                        })
                 
-                # 定義helper函數
-                def safe_numeric(value, default=None):
-                    if pd.isna(value) or str(value).strip() in ['', 'nan', 'None']:
-                        return default
-                    try:
-                        result = pd.to_numeric(value, errors='coerce')
-                        if pd.isna(result):
+                    # 定義helper函數
+                    def safe_numeric(value, default=None):
+                        if pd.isna(value) or str(value).strip() in ['', 'nan', 'None']:
+                            return default
+                        try:
+                            result = pd.to_numeric(value, errors='coerce')
+                            if pd.isna(result):
+                                return default
+                            return float(result)  # 確保返回數值類型
+                        except:
                             return default
-                        return float(result)  # 確保返回數值類型
-                    except:
-                        return default
-                
-                def safe_string(value, default=''):
-                    if pd.isna(value) or str(value).strip() in ['nan', 'None']:
-                        return default
-                    return str(value).strip()
                 
-                def safe_string_from_numeric(value, default=''):
-                    """處理可能是數字的字符串欄位"""
-                    if pd.isna(value) or str(value).strip() in ['nan', 'None']:
-                        return default
-                    # 如果是數字，轉換為整數字符串（去掉小數點）
-                    try:
-                        if isinstance(value, (int, float)):
-                            return str(int(value))
-                        return str(value).strip()
-                    except:
+                    def safe_string(value, default=''):
+                        if pd.isna(value) or str(value).strip() in ['nan', 'None']:
+                            return default
                         return str(value).strip()
                 
-                def safe_integer(value, default=None):
-                    """安全轉換為整數"""
-                    if pd.isna(value) or str(value).strip() in ['', 'nan', 'None']:
-                        return default
-                    try:
-                        result = pd.to_numeric(value, errors='coerce')
-                        if pd.isna(result):
+                    def safe_string_from_numeric(value, default=''):
+                        """處理可能是數字的字符串欄位"""
+                        if pd.isna(value) or str(value).strip() in ['nan', 'None']:
                             return default
-                        return int(result)
-                    except:
-                        return default
+                        # 如果是數字，轉換為整數字符串（去掉小數點）
+                        try:
+                            if isinstance(value, (int, float)):
+                                return str(int(value))
+                            return str(value).strip()
+                        except:
+                            return str(value).strip()
                 
-                # 處理資料 - 根據實際Excel欄位對應
-                created_records = []
-                skipped_rows = 0
+                    def safe_integer(value, default=None):
+                        """安全轉換為整數"""
+                        if pd.isna(value) or str(value).strip() in ['', 'nan', 'None']:
+                            return default
+                        try:
+                            result = pd.to_numeric(value, errors='coerce')
+                            if pd.isna(result):
+                                return default
+                            return int(result)
+                        except:
+                            return default
                 
-                for index, row in df.iterrows():
-                    try:
-                        # 檢查必要欄位是否為空或nan
-                        order_number = str(row.get('單號', '')).strip()
-                        green_bean_name = str(row.get('生豆名稱', '')).strip()
-                        green_bean_code = safe_string_from_numeric(row.get('生豆料號', ''))
+                    # 處理資料 - 根據實際Excel欄位對應
+                    created_records = []
+                    skipped_rows = 0
+                    failed_rows = 0
+                
+                    for index, row in df.iterrows():
+                        try:
+                            # 檢查必要欄位是否為空或nan
+                            order_number = str(row.get('單號', '')).strip()
+                            green_bean_name = str(row.get('生豆名稱', '')).strip()
+                            green_bean_code = safe_string_from_numeric(row.get('生豆料號', ''))
                         
-                        print(f"處理第 {index + 1} 行: 單號='{order_number}', 生豆名稱='{green_bean_name}', 料號='{green_bean_code}'")
+                            print(f"處理第 {index + 1} 行: 單號='{order_number}', 生豆名稱='{green_bean_name}', 料號='{green_bean_code}'")
                         
-                        # 跳過空行或nan資料
-                        if (order_number in ['', 'nan', 'None'] or 
-                            green_bean_name in ['', 'nan', 'None'] or 
-                            green_bean_code in ['', 'nan', 'None']):
-                            print(f"跳過第 {index + 1} 行：空白或無效資料")
-                            skipped_rows += 1
-                            continue
+                            # 跳過空行或nan資料
+                            if (order_number in ['', 'nan', 'None'] or 
+                                green_bean_name in ['', 'nan', 'None'] or 
+                                green_bean_code in ['', 'nan', 'None']):
+                                print(f"跳過第 {index + 1} 行：空白或無效資料")
+                                skipped_rows += 1
+                                continue
                         
-                        # 處理日期時間欄位
-                        record_time = None
-                        if pd.notna(row.get('記錄時間')):
-                            try:
-                                record_time = pd.to_datetime(row.get('記錄時間'))
-                            except:
+                            # 處理日期時間欄位
+                            record_time = None
+                            if pd.notna(row.get('記錄時間')):
+                                try:
+                                    record_time = pd.to_datetime(row.get('記錄時間'))
+                                except:
+                                    record_time = datetime.now()
+                            else:
                                 record_time = datetime.now()
-                        else:
-                            record_time = datetime.now()
                         
-                        work_start_time = None
-                        if pd.notna(row.get('作業開始時間')):
-                            try:
-                                work_start_time = pd.to_datetime(row.get('作業開始時間'))
-                            except:
-                                work_start_time = None
+                            work_start_time = None
+                            if pd.notna(row.get('作業開始時間')):
+                                try:
+                                    work_start_time = pd.to_datetime(row.get('作業開始時間'))
+                                except:
+                                    work_start_time = None
                         
-                        work_end_time = None
-                        if pd.notna(row.get('作業結束時間')):
-                            try:
-                                work_end_time = pd.to_datetime(row.get('作業結束時間'))
-                            except:
-                                work_end_time = None
+                            work_end_time = None
+                            if pd.notna(row.get('作業結束時間')):
+                                try:
+                                    work_end_time = pd.to_datetime(row.get('作業結束時間'))
+                                except:
+                                    work_end_time = None
                         
-                        # 建立記錄
-                        record = GreenBeanInboundRecord.objects.create(
-                            # 基本資訊
-                            order_number=order_number,
-                            roasted_item_sequence=safe_integer(row.get('炒豆項次')),
-                            green_bean_item_sequence=safe_integer(row.get('生豆項次')),
-                            batch_sequence=safe_integer(row.get('波次')),
-                            execution_status=safe_string(row.get('執行狀態')),
+                            # 建立記錄
+                            record = GreenBeanInboundRecord.objects.create(
+                                # 基本資訊
+                                order_number=order_number,
+                                roasted_item_sequence=safe_integer(row.get('炒豆項次')),
+                                green_bean_item_sequence=safe_integer(row.get('生豆項次')),
+                                batch_sequence=safe_integer(row.get('波次')),
+                                execution_status=safe_string(row.get('執行狀態')),
                             
-                            # 生豆資訊
-                            green_bean_code=safe_string_from_numeric(row.get('生豆料號')),
-                            green_bean_name=green_bean_name,
-                            green_bean_batch_number=safe_string_from_numeric(row.get('生豆批號')),
-                            green_bean_storage_silo=safe_string(row.get('生豆入庫筒倉')),
+                                # 生豆資訊
+                                green_bean_code=safe_string_from_numeric(row.get('生豆料號')),
+                                green_bean_name=green_bean_name,
+                                green_bean_batch_number=safe_string_from_numeric(row.get('生豆批號')),
+                                green_bean_storage_silo=safe_string(row.get('生豆入庫筒倉')),
                             
-                            # 重量和數量
-                            bag_weight_kg=safe_numeric(row.get('一袋重量(kg)')),
-                            input_bag_count=safe_integer(row.get('投入袋數')),
-                            required_weight_kg=safe_numeric(row.get('需求重量(kg)')),
-                            measured_weight_kg=safe_numeric(row.get('生豆量測重量(kg)')),
-                            manual_input_weight_kg=safe_numeric(row.get('手動投入重量(kg)')),
+                                # 重量和數量
+                                bag_weight_kg=safe_numeric(row.get('一袋重量(kg)')),
+                                input_bag_count=safe_integer(row.get('投入袋數')),
+                                required_weight_kg=safe_numeric(row.get('需求重量(kg)')),
+                                measured_weight_kg=safe_numeric(row.get('生豆量測重量(kg)')),
+                                manual_input_weight_kg=safe_numeric(row.get('手動投入重量(kg)')),
                             
-                            # 時間資訊
-                            record_time=record_time,
-                            work_start_time=work_start_time,
-                            work_end_time=work_end_time,
-                            work_duration=safe_string(row.get('作業時間')),
+                                # 時間資訊
+                                record_time=record_time,
+                                work_start_time=work_start_time,
+                                work_end_time=work_end_time,
+                                work_duration=safe_string(row.get('作業時間')),
                             
-                            # 其他
-                            ico_code=safe_string(row.get('ICO')),
-                            remark=safe_string(row.get('備註')),
-                            is_abnormal=bool(row.get('異常') == 'Y') if pd.notna(row.get('異常')) else False
-                        )
-                        created_records.append(record)
-                        print(f"成功創建記錄: {record.order_number} - {record.green_bean_name}")
+                                # 其他
+                                ico_code=safe_string(row.get('ICO')),
+                                remark=safe_string(row.get('備註')),
+                                is_abnormal=bool(row.get('異常') == 'Y') if pd.notna(row.get('異常')) else False
+                            )
+                            created_records.append(record)
+                            print(f"成功創建記錄: {record.order_number} - {record.green_bean_name}")
                         
-                        # 創建關聯記錄
-                        UploadRecordRelation.objects.create(
-                            upload_record=upload_record,
-                            content_type='green_bean',
-                            object_id=record.id
-                        )
+                            # 創建關聯記錄
+                            UploadRecordRelation.objects.create(
+                                upload_record=upload_record,
+                                content_type='green_bean',
+                                object_id=record.id
+                            )
                         
-                    except Exception as e:
-                        print(f"處理第 {index + 1} 行時發生錯誤: {str(e)}")
-                        continue
+                        except Exception as e:
+                            print(f"處理第 {index + 1} 行時發生錯誤: {str(e)}")
+                            failed_rows += 1
+                            continue
                 
-                print(f"總共處理了 {len(df)} 行，跳過了 {skipped_rows} 行，成功創建了 {len(created_records)} 筆記錄")
+                    print(f"總共處理了 {len(df)} 行，跳過了 {skipped_rows} 行，成功創建了 {len(created_records)} 筆記錄")
                 
-                # 更新上傳記錄狀態和創建的記錄ID
-                upload_record.status = 'success'
-                upload_record.records_count = len(created_records)
-                upload_record.created_record_ids = [str(record.id) for record in created_records]
-                upload_record.save()
+                    # 更新上傳記錄狀態和創建的記錄ID
+                    upload_record.status = 'success'
+                    upload_record.records_count = len(created_records)
+                    upload_record.created_record_ids = [str(record.id) for record in created_records]
+                    apply_upload_stats(upload_record, compute_green_bean_upload_stats(
+                        created_records, rejected_rows=skipped_rows + failed_rows
+                    ))
+                    upload_record.save()
                 
-                # 記錄用戶活動
-                log_user_activity(
-                    request.user,
-                    'upload',
-                    f'上傳生豆入庫記錄檔案: {uploaded_file.name}',
-                    request=request,
-                    details={'records_count': len(created_records)}
-                )
+                    # 記錄用戶活動
+                    log_user_activity(
+                        request.user,
+                        'upload',
+                        f'上傳生豆入庫記錄檔案: {uploaded_file.name}',
+                        request=request,
+                        details={'records_count': len(created_records)}
+                    )
                 
-                return JsonResponse({
-                    'success': True,
-                    'message': f'檔案上傳成功！共處理了 {len(created_records)} 筆記錄',
-                    'records_count': len(created_records)
-                })
+                    return JsonResponse({
+                        'success': True,
+                        'message': f'檔案上傳成功！共處理了 {len(created_records)} 筆記錄',
+                        'records_count': len(created_records)
+                    })
                 
-            except Exception as e:
-                upload_record.status = 'failed'
-                upload_record.error_message = str(e)
-                upload_record.save()
-                return JsonResponse({
-                    'success': False,
-                    'message': f'檔案處理失敗: {str(e)}'
-                })
+                except Exception as e:
+                    upload_record.status = 'failed'
+                    upload_record.error_message = str(e)
+                    upload_record.save()
+                    return JsonResponse({
+                        'success': False,
+                        'message': f'檔案處理失敗: {str(e)}'
+                    })
                 
     except Exception as e:
         return JsonResponse({
@@ -842,6 +815,45 @@ def green_bean_upload_file(request):
         })
 
 
+def _coalesced_upload_response(file_hash):
+    """相同檔案已由其他請求處理時，回傳該請求的處理結果"""
+    upload_record = FileUploadRecord.objects.filter(file_hash=file_hash).first()
+    
+    if upload_record is None and UploadInFlight.objects.filter(file_hash=file_hash).exists():
+        return JsonResponse({
+            'success': False,
+            'message': '相同檔案正由其他上傳請求處理中，請稍後於上傳記錄中確認結果',
+            'coalesced': True
+        })
+    
+    if upload_record is None:
+        return JsonResponse({
+            'success': False,
+            'message': '相同檔案的另一個上傳請求處理失敗，請重新上傳'
+        })
+    
+    if upload_record.status == 'success':
+        return JsonResponse({
+            'success': True,
+            'message': f'此檔案已由其他上傳請求處理完成，共處理了 {upload_record.records_count} 筆記錄',
+            'records_count': upload_record.records_count,
+            'coalesced': True
+        })
+    
+    if upload_record.status == 'pending':
+        return JsonResponse({
+            'success': False,
+            'message': '相同檔案正由其他上傳請求處理中，請稍後於上傳記錄中確認結果',
+            'coalesced': True
+        })
+    
+    return JsonResponse({
+        'success': False,
+        'message': f'相同檔案的另一個上傳請求處理失敗: {upload_record.error_message or upload_record.get_status_display()}',
+        'coalesced': True
+    })
+
+
 def calculate_file_hash(file):
     """計算檔案的MD5雜湊值"""
     hash_md5 = hashlib.md5()
@@ -931,8 +943,9 @@ def batch_delete_green_bean_records(request):
             details={'record_ids': record_ids}
         )
         
-        # 刪除記錄
-        records.delete()
+        # 刪除記錄（每日彙總在同一交易中一次更新）
+        with transaction.atomic(), rollup_batch():
+            records.delete()
         
         return JsonResponse({
             'success': True,
@@ -962,7 +975,7 @@ def delete_upload_record(request, upload_id):
             }, status=403)
         
         # 使用事務確保資料一致性
-        with transaction.atomic():
+        with transaction.atomic(), rollup_batch():
             deleted_count = 0
             deleted_record_ids = []
             relation_count = 0
@@ -1072,35 +1085,107 @@ def delete_upload_record(request, upload_id):
         }, status=500)
 
 
+def _upload_records_response(request, file_type):
+    """回傳指定類型的所有上傳記錄（舊版 AJAX 端點共用）"""
+    try:
+        uploads = get_upload_history_queryset([file_type]).order_by('-upload_time')
+        upload_data = [serialize_upload_history_row(row, request.user) for row in uploads]
+        
+        return JsonResponse({
+            'success': True,
+            'uploads': upload_data,
+            'total_count': len(upload_data)
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'獲取上傳記錄時發生錯誤: {str(e)}'
+        }, status=500)
+
+
 @login_required
 def get_upload_records(request):
     """獲取上傳記錄列表（用於AJAX刷新）"""
+    return _upload_records_response(request, 'green_bean')
+
+
+@login_required
+@require_http_methods(["GET"])
+def dashboard_events_unavailable(request):
+    """
+    儀表板 SSE 端點的 WSGI 後備
+    
+    串流只在 ASGI 部署時由 DjangoTemplate/asgi.py 提供；WSGI 部署時回傳 204，
+    瀏覽器的 EventSource 收到 204 會停止重新連線
+    """
+    return HttpResponse(status=204)
+
+
+@login_required
+@require_http_methods(["GET"])
+def upload_queue_status(request):
+    """
+    上傳佇列狀態 API - 供上傳頁面顯示排隊位置
+    
+    查詢參數：
+        ticket: 上傳回應 429 時發給的排隊票證（可選，輪詢時會延長票證有效時間，
+            回傳的 ticket.ready 為 true 時即可帶著票證重新送出上傳）
+    """
+    return JsonResponse({
+        'success': True,
+        **get_upload_queue_status(request.user, request.GET.get('ticket'))
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def upload_history_api(request):
+    """
+    上傳歷史 API - 依檔案類型篩選並以游標分頁
+    
+    查詢參數：
+        file_type: green_bean / raw_material（可選，預設為使用者有權限的所有類型）
+        cursor: 上一頁回傳的 next_cursor（可選）
+        page_size: 每頁筆數（預設 20，最多 100）
+    """
     try:
-        # 獲取所有生豆上傳記錄，不限制數量
-        recent_uploads = FileUploadRecord.objects.filter(
-            file_type='green_bean'
-        ).order_by('-upload_time')
-        
-        upload_data = []
-        for upload in recent_uploads:
-            upload_data.append({
-                'id': str(upload.id),
-                'file_name': upload.file_name,
-                'file_size': upload.file_size,
-                'file_hash': upload.file_hash,
-                'upload_time': upload.upload_time.strftime('%Y-%m-%d %H:%M'),
-                'uploaded_by': upload.uploaded_by.username if upload.uploaded_by else '未知',
-                'records_count': upload.records_count or 0,
-                'status': upload.status,
-                'status_display': upload.get_status_display(),
-                'error_message': upload.error_message,
-                'can_delete': upload.uploaded_by == request.user or request.user.is_superuser
-            })
+        user_permissions = get_user_accessible_sections(request.user)
+        allowed_types = [
+            file_type for file_type in ('green_bean', 'raw_material')
+            if user_permissions[file_type]
+        ]
+        
+        file_type = request.GET.get('file_type', '')
+        if file_type:
+            if file_type not in allowed_types:
+                return JsonResponse({
+                    'success': False,
+                    'message': '您沒有權限查看此類型的上傳記錄'
+                }, status=403)
+            file_types = [file_type]
+        else:
+            file_types = allowed_types
+        
+        page_size = parse_page_size(request.GET.get('page_size'))
+        try:
+            rows, next_cursor = keyset_paginate(
+                get_upload_history_queryset(file_types),
+                'upload_time',
+                cursor=request.GET.get('cursor'),
+                page_size=page_size
+            )
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
         
         return JsonResponse({
             'success': True,
-            'uploads': upload_data,
-            'total_count': len(upload_data)
+            'uploads': [serialize_upload_history_row(row, request.user) for row in rows],
+            'pagination': {
+                'page_size': page_size,
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None
+            }
         })
         
     except Exception as e:
@@ -1559,553 +1644,567 @@ def raw_material_upload_file(request):
                 'duplicate': True
             })
         
-        # 將檔案內容讀取到記憶體中（在事務外）
-        file_content = uploaded_file.read()
-        uploaded_file.seek(0)  # 重置檔案指針
-        
-        # 使用事務處理整個上傳過程
-        with transaction.atomic():
-            # 創建上傳記錄
-            upload_record = FileUploadRecord.objects.create(
-                file_name=uploaded_file.name,
-                file_hash=file_hash,
-                file_size=uploaded_file.size,
-                uploaded_by=request.user,
-                file_type='raw_material',
-                status='pending'
-            )
-            
-            # 使用 openpyxl 處理 Excel 檔案（與 test_excel_to_json.py 相同的邏輯）
-            from openpyxl import load_workbook
-            
-            wb = load_workbook(io.BytesIO(file_content), data_only=True)
-            ws = wb.active
-            
-            # 展開合併的儲存格
-            def expand_merged_cells(ws):
-                merged_ranges = list(ws.merged_cells.ranges)
-                for merged_range in merged_ranges:
-                    min_col, min_row, max_col, max_row = merged_range.bounds
-                    value = ws.cell(row=min_row, column=min_col).value
-                    ws.unmerge_cells(start_row=min_row, start_column=min_col, end_row=max_row, end_column=max_col)
-                    for row in range(min_row, max_row + 1):
-                        for col in range(min_col, max_col + 1):
-                            ws.cell(row=row, column=col).value = value
-            
-            expand_merged_cells(ws)
+        # 同一檔案同時上傳時只由一個請求解析，其餘請求立即回覆處理中或沿用其結果；
+        # 先取得鎖定再取得准入名額，重複的上傳不佔用名額
+        with upload_single_flight(file_hash, 'raw_material', request.user) as is_leader, ExitStack() as admission_stack:
+            if not is_leader or FileUploadRecord.objects.filter(file_hash=file_hash).exists():
+                return _coalesced_upload_response(file_hash)
+            rejected = admission_stack.enter_context(upload_admission(request))
+            if rejected is not None:
+                return rejected
+            
+            # 將檔案內容讀取到記憶體中（在事務外）
+            file_content = uploaded_file.read()
+            uploaded_file.seek(0)  # 重置檔案指針
+        
+            # 使用事務處理整個上傳過程
+            with transaction.atomic(), rollup_batch():
+                # 創建上傳記錄
+                upload_record = FileUploadRecord.objects.create(
+                    file_name=uploaded_file.name,
+                    file_hash=file_hash,
+                    file_size=uploaded_file.size,
+                    uploaded_by=request.user,
+                    file_type='raw_material',
+                    status='pending'
+                )
             
-            # 從檔案名稱提取月份資訊（與 test_excel_to_json.py 相同）
-            def extract_month_from_filename(filename: str) -> int:
-                """從檔案名稱提取月份資訊"""
-                # 匹配模式：原料倉進出a2023-11.xlsx 中的 11
-                pattern = r'原料倉進出a\d{4}-(\d{1,2})'
-                match = re.search(pattern, filename)
-                if match:
-                    return int(match.group(1))
-                else:
-                    # 如果沒有匹配到，嘗試其他模式
-                    pattern2 = r'-(\d{1,2})\.'
-                    match2 = re.search(pattern2, filename)
-                    if match2:
-                        return int(match2.group(1))
+                # 使用 openpyxl 處理 Excel 檔案（與 test_excel_to_json.py 相同的邏輯）
+                from openpyxl import load_workbook
+            
+                wb = load_workbook(io.BytesIO(file_content), data_only=True)
+                ws = wb.active
+            
+                # 展開合併的儲存格
+                def expand_merged_cells(ws):
+                    merged_ranges = list(ws.merged_cells.ranges)
+                    for merged_range in merged_ranges:
+                        min_col, min_row, max_col, max_row = merged_range.bounds
+                        value = ws.cell(row=min_row, column=min_col).value
+                        ws.unmerge_cells(start_row=min_row, start_column=min_col, end_row=max_row, end_column=max_col)
+                        for row in range(min_row, max_row + 1):
+                            for col in range(min_col, max_col + 1):
+                                ws.cell(row=row, column=col).value = value
+            
+                expand_merged_cells(ws)
+            
+                # 從檔案名稱提取月份資訊（與 test_excel_to_json.py 相同）
+                def extract_month_from_filename(filename: str) -> int:
+                    """從檔案名稱提取月份資訊"""
+                    # 匹配模式：原料倉進出a2023-11.xlsx 中的 11
+                    pattern = r'原料倉進出a\d{4}-(\d{1,2})'
+                    match = re.search(pattern, filename)
+                    if match:
+                        return int(match.group(1))
                     else:
-                        raise ValueError(f"無法從檔案名稱 {filename} 提取月份資訊")
+                        # 如果沒有匹配到，嘗試其他模式
+                        pattern2 = r'-(\d{1,2})\.'
+                        match2 = re.search(pattern2, filename)
+                        if match2:
+                            return int(match2.group(1))
+                        else:
+                            raise ValueError(f"無法從檔案名稱 {filename} 提取月份資訊")
             
-            # 自動尋找標題列和子標題列
-            def find_header_rows(ws) -> tuple[int, int]:
-                header_row = None
-                sub_header_row = None
+                # 自動尋找標題列和子標題列
+                def find_header_rows(ws) -> tuple[int, int]:
+                    header_row = None
+                    sub_header_row = None
                 
-                for row_num in range(1, 15):  # 檢查前15列
-                    row_values = [cell.value for cell in ws[row_num]]
-                    row_str = ' '.join(str(v) for v in row_values if v is not None)
+                    for row_num in range(1, 15):  # 檢查前15列
+                        row_values = [cell.value for cell in ws[row_num]]
+                        row_str = ' '.join(str(v) for v in row_values if v is not None)
                     
-                    # 尋找主標題列（包含品號、品名）
-                    if '品號' in row_str and '品名' in row_str and header_row is None:
-                        header_row = row_num
+                        # 尋找主標題列（包含品號、品名）
+                        if '品號' in row_str and '品名' in row_str and header_row is None:
+                            header_row = row_num
                         
-                    # 尋找子標題列（包含入庫、領用、轉出）
-                    if '入庫' in row_str and '領用' in row_str and '轉出' in row_str:
-                        sub_header_row = row_num
+                        # 尋找子標題列（包含入庫、領用、轉出）
+                        if '入庫' in row_str and '領用' in row_str and '轉出' in row_str:
+                            sub_header_row = row_num
                         
-                    # 如果找到主標題列，檢查下一列是否為子標題
-                    if header_row is not None and sub_header_row is None:
-                        next_row_values = [cell.value for cell in ws[header_row + 1]]
-                        next_row_str = ' '.join(str(v) for v in next_row_values if v is not None)
-                        if '入庫' in next_row_str or '領用' in next_row_str or '轉出' in next_row_str:
-                            sub_header_row = header_row + 1
+                        # 如果找到主標題列，檢查下一列是否為子標題
+                        if header_row is not None and sub_header_row is None:
+                            next_row_values = [cell.value for cell in ws[header_row + 1]]
+                            next_row_str = ' '.join(str(v) for v in next_row_values if v is not None)
+                            if '入庫' in next_row_str or '領用' in next_row_str or '轉出' in next_row_str:
+                                sub_header_row = header_row + 1
                 
-                if header_row is None:
-                    header_row = 2  # 預設第二列
-                if sub_header_row is None:
-                    sub_header_row = header_row + 1  # 預設主標題列後一列
+                    if header_row is None:
+                        header_row = 2  # 預設第二列
+                    if sub_header_row is None:
+                        sub_header_row = header_row + 1  # 預設主標題列後一列
                     
-                return header_row, sub_header_row
-            
-            def find_data_start_row(ws, sub_header_row: int) -> int:
-                for row_num in range(sub_header_row + 1, sub_header_row + 10):
-                    row_values = [cell.value for cell in ws[row_num]]
-                    if any(v is not None for v in row_values):
-                        return row_num
-                return sub_header_row + 2
-            
-            def clean_column_names(columns: list[Any]) -> list[str]:
-                cleaned = []
-                for col in columns:
-                    if col is None:
-                        cleaned.append(None)
-                    else:
-                        cleaned_name = str(col).strip().replace('\n', ' ').replace('\r', ' ')
-                        cleaned_name = ' '.join(cleaned_name.split())
-                        cleaned.append(cleaned_name)
-                return cleaned
-            
-            def merge_headers(main_headers: list[str], sub_headers: list[str]) -> list[str]:
-                """合併主標題和子標題"""
-                merged_headers = []
-                seen_fields = set()  # 追蹤已見過的欄位名稱
+                    return header_row, sub_header_row
+            
+                def find_data_start_row(ws, sub_header_row: int) -> int:
+                    for row_num in range(sub_header_row + 1, sub_header_row + 10):
+                        row_values = [cell.value for cell in ws[row_num]]
+                        if any(v is not None for v in row_values):
+                            return row_num
+                    return sub_header_row + 2
+            
+                def clean_column_names(columns: list[Any]) -> list[str]:
+                    cleaned = []
+                    for col in columns:
+                        if col is None:
+                            cleaned.append(None)
+                        else:
+                            cleaned_name = str(col).strip().replace('\n', ' ').replace('\r', ' ')
+                            cleaned_name = ' '.join(cleaned_name.split())
+                            cleaned.append(cleaned_name)
+                    return cleaned
+            
+                def merge_headers(main_headers: list[str], sub_headers: list[str]) -> list[str]:
+                    """合併主標題和子標題"""
+                    merged_headers = []
+                    seen_fields = set()  # 追蹤已見過的欄位名稱
                 
-                for i, (main_header, sub_header) in enumerate(zip(main_headers, sub_headers)):
-                    if main_header is None or main_header == '':
-                        # 處理只有子標題的情況
-                        if sub_header is None or sub_header == '':
-                            merged_headers.append(None)
+                    for i, (main_header, sub_header) in enumerate(zip(main_headers, sub_headers)):
+                        if main_header is None or main_header == '':
+                            # 處理只有子標題的情況
+                            if sub_header is None or sub_header == '':
+                                merged_headers.append(None)
+                            else:
+                                field_name = sub_header
+                                # 檢查是否應該是小計的子欄位
+                                if sub_header in ['入庫', '轉出'] and i > 0:
+                                    # 檢查前面是否有小計欄位
+                                    prev_main = main_headers[i-1] if i > 0 else None
+                                    if prev_main == '小計':
+                                        field_name = f"小計_{sub_header}"
+                                    elif prev_main == '盤盈虧(外賣)':
+                                        # 如果前面是盤盈虧(外賣)，且當前是入庫或轉出，則視為小計的子欄位
+                                        field_name = f"小計_{sub_header}"
+                            
+                                if field_name in seen_fields:
+                                    field_name = f"{field_name}_after"
+                                seen_fields.add(field_name)
+                                merged_headers.append(field_name)
+                        elif sub_header is None or sub_header == '':
+                            # 處理只有主標題的情況
+                            field_name = main_header
+                            # 過濾掉不存在的欄位
+                            if field_name in ['待處理', '外賣', '盤盈虧(外賣)']:
+                                field_name = None
+                            else:
+                                if field_name in seen_fields:
+                                    field_name = f"{main_header}_after"
+                                seen_fields.add(field_name)
+                            merged_headers.append(field_name)
                         else:
-                            field_name = sub_header
-                            # 檢查是否應該是小計的子欄位
-                            if sub_header in ['入庫', '轉出'] and i > 0:
-                                # 檢查前面是否有小計欄位
-                                prev_main = main_headers[i-1] if i > 0 else None
-                                if prev_main == '小計':
-                                    field_name = f"小計_{sub_header}"
-                                elif prev_main == '盤盈虧(外賣)':
-                                    # 如果前面是盤盈虧(外賣)，且當前是入庫或轉出，則視為小計的子欄位
-                                    field_name = f"小計_{sub_header}"
+                            # 處理主標題和子標題都存在的情況
+                            if any(char.isdigit() for char in str(main_header)) and '/' in str(main_header):
+                                # 日期格式的主標題
+                                field_name = f"{main_header}_{sub_header}"
+                            elif main_header == '盤盈虧(外賣)':
+                                # 盤盈虧(外賣) 下的子欄位
+                                field_name = f"{main_header}_{sub_header}"
+                            elif main_header == '小計':
+                                # 小計欄位下的子欄位
+                                field_name = f"{main_header}_{sub_header}"
+                            elif main_header == '領用' and sub_header == '小計':
+                                # 領用_小計 特殊欄位
+                                field_name = f"{main_header}_{sub_header}"
+                            elif sub_header in ['入庫', '領用', '轉出'] and main_header == '小計':
+                                # 小計下的入庫、領用、轉出子欄位
+                                field_name = f"{main_header}_{sub_header}"
+                            else:
+                                # 一般主標題
+                                field_name = main_header
                             
+                                # 過濾掉不存在的欄位
+                                if field_name in ['待處理', '外賣']:
+                                    field_name = None
+                        
+                            # 檢查是否重複
                             if field_name in seen_fields:
                                 field_name = f"{field_name}_after"
                             seen_fields.add(field_name)
                             merged_headers.append(field_name)
-                    elif sub_header is None or sub_header == '':
-                        # 處理只有主標題的情況
-                        field_name = main_header
-                        # 過濾掉不存在的欄位
-                        if field_name in ['待處理', '外賣', '盤盈虧(外賣)']:
-                            field_name = None
-                        else:
-                            if field_name in seen_fields:
-                                field_name = f"{main_header}_after"
-                            seen_fields.add(field_name)
-                        merged_headers.append(field_name)
-                    else:
-                        # 處理主標題和子標題都存在的情況
-                        if any(char.isdigit() for char in str(main_header)) and '/' in str(main_header):
-                            # 日期格式的主標題
-                            field_name = f"{main_header}_{sub_header}"
-                        elif main_header == '盤盈虧(外賣)':
-                            # 盤盈虧(外賣) 下的子欄位
-                            field_name = f"{main_header}_{sub_header}"
-                        elif main_header == '小計':
-                            # 小計欄位下的子欄位
-                            field_name = f"{main_header}_{sub_header}"
-                        elif main_header == '領用' and sub_header == '小計':
-                            # 領用_小計 特殊欄位
-                            field_name = f"{main_header}_{sub_header}"
-                        elif sub_header in ['入庫', '領用', '轉出'] and main_header == '小計':
-                            # 小計下的入庫、領用、轉出子欄位
-                            field_name = f"{main_header}_{sub_header}"
-                        else:
-                            # 一般主標題
-                            field_name = main_header
-                            
-                            # 過濾掉不存在的欄位
-                            if field_name in ['待處理', '外賣']:
-                                field_name = None
-                        
-                        # 檢查是否重複
-                        if field_name in seen_fields:
-                            field_name = f"{field_name}_after"
-                        seen_fields.add(field_name)
-                        merged_headers.append(field_name)
                 
-                return merged_headers
-            
-            def analyze_column_structure(columns: list[str], file_month: int) -> dict:
-                """分析欄位結構，識別月份欄位等"""
-                analysis = {
-                    'month_inventory': None,  # 月份庫存欄位
-                    'basic_fields': [],       # 基本欄位
-                    'date_fields': [],        # 日期欄位
-                    'summary_fields': [],     # 小計欄位
-                    'file_month': file_month, # 檔案月份
-                    'found_months': []        # 找到的所有月份欄位
-                }
+                    return merged_headers
+            
+                def analyze_column_structure(columns: list[str], file_month: int) -> dict:
+                    """分析欄位結構，識別月份欄位等"""
+                    analysis = {
+                        'month_inventory': None,  # 月份庫存欄位
+                        'basic_fields': [],       # 基本欄位
+                        'date_fields': [],        # 日期欄位
+                        'summary_fields': [],     # 小計欄位
+                        'file_month': file_month, # 檔案月份
+                        'found_months': []        # 找到的所有月份欄位
+                    }
                 
-                # 預期的月份庫存欄位名稱
-                expected_month_inventory = f"{file_month}月庫存"
+                    # 預期的月份庫存欄位名稱
+                    expected_month_inventory = f"{file_month}月庫存"
                 
-                for col in columns:
-                    if col is None:
-                        continue
+                    for col in columns:
+                        if col is None:
+                            continue
                         
-                    col_str = str(col)
+                        col_str = str(col)
                     
-                    # 識別所有月份庫存欄位（只匹配實際存在的格式）
-                    month_match = re.search(r'(\d+)月\s*庫存', col_str)
-                    if month_match:
-                        found_month = int(month_match.group(1))
-                        # 只處理實際存在的月份欄位，避免產生不存在的欄位
-                        if col_str in [f"{found_month}月 庫存", f"{found_month}月庫存"]:
-                            analysis['found_months'].append((col, found_month))
+                        # 識別所有月份庫存欄位（只匹配實際存在的格式）
+                        month_match = re.search(r'(\d+)月\s*庫存', col_str)
+                        if month_match:
+                            found_month = int(month_match.group(1))
+                            # 只處理實際存在的月份欄位，避免產生不存在的欄位
+                            if col_str in [f"{found_month}月 庫存", f"{found_month}月庫存"]:
+                                analysis['found_months'].append((col, found_month))
                             
-                            # 如果是檔案對應的月份，設為主要月份庫存欄位
-                            if found_month == file_month:
-                                analysis['month_inventory'] = col
-                            # 如果還沒找到主要月份欄位，使用找到的第一個
-                            elif analysis['month_inventory'] is None:
-                                analysis['month_inventory'] = col
+                                # 如果是檔案對應的月份，設為主要月份庫存欄位
+                                if found_month == file_month:
+                                    analysis['month_inventory'] = col
+                                # 如果還沒找到主要月份欄位，使用找到的第一個
+                                elif analysis['month_inventory'] is None:
+                                    analysis['month_inventory'] = col
                             
-                    # 識別 *月**日 庫存 欄位
-                    elif col_str == '*月**日 庫存':
-                        analysis['month_inventory'] = col
+                        # 識別 *月**日 庫存 欄位
+                        elif col_str == '*月**日 庫存':
+                            analysis['month_inventory'] = col
                             
-                    # 識別基本欄位
-                    elif col_str in ['品號', '品名', '工廠批號', '國際批號', '公斤', '包數']:
-                        analysis['basic_fields'].append(col)
-                    # 識別日期欄位
-                    elif re.search(r'\d+/\d+', col_str):
-                        analysis['date_fields'].append(col)
-                    # 識別小計欄位
-                    elif '小計' in col_str:
-                        analysis['summary_fields'].append(col)
+                        # 識別基本欄位
+                        elif col_str in ['品號', '品名', '工廠批號', '國際批號', '公斤', '包數']:
+                            analysis['basic_fields'].append(col)
+                        # 識別日期欄位
+                        elif re.search(r'\d+/\d+', col_str):
+                            analysis['date_fields'].append(col)
+                        # 識別小計欄位
+                        elif '小計' in col_str:
+                            analysis['summary_fields'].append(col)
                 
-                return analysis
-            
-            def is_numeric_field(field_name: str) -> bool:
-                """判斷欄位是否為數值型別"""
-                numeric_patterns = [
-                    r'公斤$',
-                    r'進貨$',
-                    r'領用$',
-                    r'轉出$',
-                    r'入庫$',
-                    r'小計$',
-                    r'包數$',
-                    r'盤盈虧',
-                    r'^\d+/\d+',  # 日期格式的數值欄位
-                    r'^\d+/\d+掛\d+/\d+帳',  # 特殊日期格式
-                    r'^\*月\*\*日 庫存',  # 動態月份庫存
-                    r'包數_after$',  # 包數_after
-                    r'\*月\*\*日 庫存_after$',  # 動態月份庫存_after
-                ]
+                    return analysis
+            
+                def is_numeric_field(field_name: str) -> bool:
+                    """判斷欄位是否為數值型別"""
+                    numeric_patterns = [
+                        r'公斤$',
+                        r'進貨$',
+                        r'領用$',
+                        r'轉出$',
+                        r'入庫$',
+                        r'小計$',
+                        r'包數$',
+                        r'盤盈虧',
+                        r'^\d+/\d+',  # 日期格式的數值欄位
+                        r'^\d+/\d+掛\d+/\d+帳',  # 特殊日期格式
+                        r'^\*月\*\*日 庫存',  # 動態月份庫存
+                        r'包數_after$',  # 包數_after
+                        r'\*月\*\*日 庫存_after$',  # 動態月份庫存_after
+                    ]
                 
-                for pattern in numeric_patterns:
-                    if re.search(pattern, field_name):
-                        return True
-                return False
-            
-            # 從檔案名稱提取月份
-            try:
-                file_month = extract_month_from_filename(uploaded_file.name)
-                print(f"從檔案名稱提取的月份: {file_month}月")
-            except ValueError:
-                file_month = 11  # 預設值
-                print(f"無法從檔案名稱提取月份，使用預設值: {file_month}月")
-            
-            # 自動尋找標題列和子標題列
-            header_row, sub_header_row = find_header_rows(ws)
-            print(f"找到主標題列: 第 {header_row} 列")
-            print(f"找到子標題列: 第 {sub_header_row} 列")
-            
-            # 抓取主標題和子標題
-            main_headers = [cell.value for cell in ws[header_row]]
-            sub_headers = [cell.value for cell in ws[sub_header_row]]
-            
-            # 清理欄位名稱
-            main_headers = clean_column_names(main_headers)
-            sub_headers = clean_column_names(sub_headers)
-            
-            print(f"主標題: {main_headers}")
-            print(f"子標題: {sub_headers}")
-            
-            # 合併標題
-            all_columns = merge_headers(main_headers, sub_headers)
-            print(f"合併後欄位名稱: {all_columns}")
-            
-            # 分析欄位結構（與 test_excel_to_json.py 相同）
-            column_analysis = analyze_column_structure(all_columns, file_month)
-            print(f"\n欄位結構分析:")
-            print(f"檔案月份: {column_analysis['file_month']}月")
-            print(f"主要月份庫存欄位: {column_analysis['month_inventory']}")
-            print(f"找到的所有月份欄位: {column_analysis['found_months']}")
-            print(f"基本欄位: {column_analysis['basic_fields']}")
-            print(f"日期欄位數量: {len(column_analysis['date_fields'])}")
-            print(f"小計欄位: {column_analysis['summary_fields']}")
+                    for pattern in numeric_patterns:
+                        if re.search(pattern, field_name):
+                            return True
+                    return False
             
-            # 尋找資料開始列
-            data_start_row = find_data_start_row(ws, sub_header_row)
-            print(f"資料開始列: 第 {data_start_row} 列")
-            
-            # 定義helper函數（與生豆入庫相同）
-            def safe_numeric(value, default=None):
-                if value is None or str(value).strip() in ['', 'nan', 'None']:
-                    return default
+                # 從檔案名稱提取月份
                 try:
-                    result = float(value)
-                    if math.isnan(result):
+                    file_month = extract_month_from_filename(uploaded_file.name)
+                    print(f"從檔案名稱提取的月份: {file_month}月")
+                except ValueError:
+                    file_month = 11  # 預設值
+                    print(f"無法從檔案名稱提取月份，使用預設值: {file_month}月")
+            
+                # 自動尋找標題列和子標題列
+                header_row, sub_header_row = find_header_rows(ws)
+                print(f"找到主標題列: 第 {header_row} 列")
+                print(f"找到子標題列: 第 {sub_header_row} 列")
+            
+                # 抓取主標題和子標題
+                main_headers = [cell.value for cell in ws[header_row]]
+                sub_headers = [cell.value for cell in ws[sub_header_row]]
+            
+                # 清理欄位名稱
+                main_headers = clean_column_names(main_headers)
+                sub_headers = clean_column_names(sub_headers)
+            
+                print(f"主標題: {main_headers}")
+                print(f"子標題: {sub_headers}")
+            
+                # 合併標題
+                all_columns = merge_headers(main_headers, sub_headers)
+                print(f"合併後欄位名稱: {all_columns}")
+            
+                # 分析欄位結構（與 test_excel_to_json.py 相同）
+                column_analysis = analyze_column_structure(all_columns, file_month)
+                print(f"\n欄位結構分析:")
+                print(f"檔案月份: {column_analysis['file_month']}月")
+                print(f"主要月份庫存欄位: {column_analysis['month_inventory']}")
+                print(f"找到的所有月份欄位: {column_analysis['found_months']}")
+                print(f"基本欄位: {column_analysis['basic_fields']}")
+                print(f"日期欄位數量: {len(column_analysis['date_fields'])}")
+                print(f"小計欄位: {column_analysis['summary_fields']}")
+            
+                # 尋找資料開始列
+                data_start_row = find_data_start_row(ws, sub_header_row)
+                print(f"資料開始列: 第 {data_start_row} 列")
+            
+                # 定義helper函數（與生豆入庫相同）
+                def safe_numeric(value, default=None):
+                    if value is None or str(value).strip() in ['', 'nan', 'None']:
+                        return default
+                    try:
+                        result = float(value)
+                        if math.isnan(result):
+                            return default
+                        return result
+                    except:
                         return default
-                    return result
-                except:
-                    return default
-            
-            def safe_string(value, default=''):
-                if value is None or str(value).strip() in ['nan', 'None']:
-                    return default
-                return str(value).strip()
             
-            def safe_string_from_numeric(value, default=''):
-                """處理可能是數字的字符串欄位"""
-                if value is None or str(value).strip() in ['nan', 'None']:
-                    return default
-                try:
-                    if isinstance(value, (int, float)):
-                        return str(int(value))
-                    return str(value).strip()
-                except:
+                def safe_string(value, default=''):
+                    if value is None or str(value).strip() in ['nan', 'None']:
+                        return default
                     return str(value).strip()
             
-            def safe_integer(value, default=None):
-                """安全轉換為整數"""
-                if value is None or str(value).strip() in ['', 'nan', 'None']:
-                    return default
-                try:
-                    result = float(value)
-                    if math.isnan(result):
+                def safe_string_from_numeric(value, default=''):
+                    """處理可能是數字的字符串欄位"""
+                    if value is None or str(value).strip() in ['nan', 'None']:
                         return default
-                    return int(result)
-                except:
-                    return default
+                    try:
+                        if isinstance(value, (int, float)):
+                            return str(int(value))
+                        return str(value).strip()
+                    except:
+                        return str(value).strip()
             
-            # 處理資料 - 完全使用 test_excel_to_json.py 的邏輯
-            created_records = []
-            skipped_rows = 0
-            row_count = 0
+                def safe_integer(value, default=None):
+                    """安全轉換為整數"""
+                    if value is None or str(value).strip() in ['', 'nan', 'None']:
+                        return default
+                    try:
+                        result = float(value)
+                        if math.isnan(result):
+                            return default
+                        return int(result)
+                    except:
+                        return default
             
-            # 定義 RawMaterialRow.from_row 方法（與 test_excel_to_json.py 完全相同）
-            def from_row(row: list[Any], columns: list[str]) -> dict:
-                data = {}
-                for col_name, value in zip(columns, row):
-                    if col_name is None:
-                        continue
-                    col_name = str(col_name).strip().replace('\n', ' ')  # 清理換行符號
-                    key = '公斤' if col_name == '標準重' else col_name
-                    # 自動型別轉換
-                    if key == '包數':
-                        try:
-                            data[key] = math.ceil(float(value)) if value is not None else None
-                        except (TypeError, ValueError):
-                            data[key] = None
-                    elif is_numeric_field(key):
-                        try:
-                            data[key] = float(value) if value is not None else None
-                        except (TypeError, ValueError):
-                            data[key] = None
-                    else:
-                        data[key] = str(value) if value is not None else None
-                return data
+                # 處理資料 - 完全使用 test_excel_to_json.py 的邏輯
+                created_records = []
+                skipped_rows = 0
+                failed_rows = 0
+                row_count = 0
+            
+                # 定義 RawMaterialRow.from_row 方法（與 test_excel_to_json.py 完全相同）
+                def from_row(row: list[Any], columns: list[str]) -> dict:
+                    data = {}
+                    for col_name, value in zip(columns, row):
+                        if col_name is None:
+                            continue
+                        col_name = str(col_name).strip().replace('\n', ' ')  # 清理換行符號
+                        key = '公斤' if col_name == '標準重' else col_name
+                        # 自動型別轉換
+                        if key == '包數':
+                            try:
+                                data[key] = math.ceil(float(value)) if value is not None else None
+                            except (TypeError, ValueError):
+                                data[key] = None
+                        elif is_numeric_field(key):
+                            try:
+                                data[key] = float(value) if value is not None else None
+                            except (TypeError, ValueError):
+                                data[key] = None
+                        else:
+                            data[key] = str(value) if value is not None else None
+                    return data
             
-            for row in ws.iter_rows(min_row=data_start_row):
-                row_count += 1
-                try:
-                    values = [cell.value for cell in row]
-                    # 若全為 None 則跳過
-                    if all(v is None for v in values):
-                        continue
+                for row in ws.iter_rows(min_row=data_start_row):
+                    row_count += 1
+                    try:
+                        values = [cell.value for cell in row]
+                        # 若全為 None 則跳過
+                        if all(v is None for v in values):
+                            continue
                     
-                    # 使用與 test_excel_to_json.py 完全相同的 from_row 方法
-                    row_data = from_row(values, all_columns)
+                        # 使用與 test_excel_to_json.py 完全相同的 from_row 方法
+                        row_data = from_row(values, all_columns)
                     
-                    # 只保留公斤有值的資料（與 test_excel_to_json.py 完全一致）
-                    if row_data.get('公斤') is None:
-                        print(f"跳過第 {row_count} 行：公斤為空")
-                        skipped_rows += 1
-                        continue
+                        # 只保留公斤有值的資料（與 test_excel_to_json.py 完全一致）
+                        if row_data.get('公斤') is None:
+                            print(f"跳過第 {row_count} 行：公斤為空")
+                            skipped_rows += 1
+                            continue
                     
-                    # 獲取品號和品名（不檢查是否為空，與 test_excel_to_json.py 一致）
-                    product_code = str(row_data.get('品號', '')).strip()
-                    product_name = str(row_data.get('品名', '')).strip()
+                        # 獲取品號和品名（不檢查是否為空，與 test_excel_to_json.py 一致）
+                        product_code = str(row_data.get('品號', '')).strip()
+                        product_name = str(row_data.get('品名', '')).strip()
                     
-                    print(f"處理第 {row_count} 行: 品號='{product_code}', 品名='{product_name}', 公斤='{row_data.get('公斤')}'")
+                        print(f"處理第 {row_count} 行: 品號='{product_code}', 品名='{product_name}', 公斤='{row_data.get('公斤')}'")
                     
-                    # 分離基本欄位和動態欄位
-                    basic_fields = {
-                        'product_code': product_code,
-                        'product_name': product_name,
-                        'factory_batch_number': str(row_data.get('工廠批號', '')) if row_data.get('工廠批號') is not None else '',
-                        'international_batch_number': str(row_data.get('國際批號', '')) if row_data.get('國際批號') is not None else '',
-                        'standard_weight_kg': row_data.get('公斤', 0) or 0,
-                        'record_date': datetime.now().date()
-                    }
+                        # 分離基本欄位和動態欄位
+                        basic_fields = {
+                            'product_code': product_code,
+                            'product_name': product_name,
+                            'factory_batch_number': str(row_data.get('工廠批號', '')) if row_data.get('工廠批號') is not None else '',
+                            'international_batch_number': str(row_data.get('國際批號', '')) if row_data.get('國際批號') is not None else '',
+                            'standard_weight_kg': row_data.get('公斤', 0) or 0,
+                            'record_date': datetime.now().date()
+                        }
                     
-                    # 處理月庫存欄位（根據檔名動態變化）
-                    file_month = extract_month_from_filename(uploaded_file.name)
-                    file_year = int(re.search(r'(\d{4})-\d{1,2}', uploaded_file.name).group(1)) if re.search(r'(\d{4})-\d{1,2}', uploaded_file.name) else datetime.now().year
-                    import calendar
+                        # 處理月庫存欄位（根據檔名動態變化）
+                        file_month = extract_month_from_filename(uploaded_file.name)
+                        file_year = int(re.search(r'(\d{4})-\d{1,2}', uploaded_file.name).group(1)) if re.search(r'(\d{4})-\d{1,2}', uploaded_file.name) else datetime.now().year
+                        import calendar
                     
-                    # 上月庫存為檔名月份-2
-                    prev2_month = (file_month - 2) % 12 or 12
-                    prev2_year = file_year if file_month > 2 else file_year - 1
-                    previous_month_key = f"{prev2_month}月 庫存"
+                        # 上月庫存為檔名月份-2
+                        prev2_month = (file_month - 2) % 12 or 12
+                        prev2_year = file_year if file_month > 2 else file_year - 1
+                        previous_month_key = f"{prev2_month}月 庫存"
                     
-                    # 調試輸出
-                    print(f"檔名月份: {file_month}, 上月庫存欄位: {previous_month_key}")
-                    print(f"可用的欄位: {list(row_data.keys())}")
+                        # 調試輸出
+                        print(f"檔名月份: {file_month}, 上月庫存欄位: {previous_month_key}")
+                        print(f"可用的欄位: {list(row_data.keys())}")
                     
-                    # 將基本欄位也放入基本欄位中
-                    basic_fields.update({
-                        'previous_month_inventory': row_data.get(previous_month_key, 0) or 0,  # 上月庫存
-                        'incoming_stock': row_data.get('進貨', 0) or 0,  # 進貨
-                        'outgoing_stock': row_data.get('領用', 0) or 0,  # 領用
-                        'current_inventory': row_data.get('*月**日 庫存', 0) or 0,  # 當前庫存
-                    })
+                        # 將基本欄位也放入基本欄位中
+                        basic_fields.update({
+                            'previous_month_inventory': row_data.get(previous_month_key, 0) or 0,  # 上月庫存
+                            'incoming_stock': row_data.get('進貨', 0) or 0,  # 進貨
+                            'outgoing_stock': row_data.get('領用', 0) or 0,  # 領用
+                            'current_inventory': row_data.get('*月**日 庫存', 0) or 0,  # 當前庫存
+                        })
                     
-                    # 收集所有動態欄位（只包含上方基本欄位中沒有的內容）
-                    dynamic_fields = {}
+                        # 收集所有動態欄位（只包含上方基本欄位中沒有的內容）
+                        dynamic_fields = {}
                     
-                    # 排除所有基本欄位，只保留日期相關欄位和其他特殊欄位
-                    basic_field_names = [
-                        '品號', '品名', '工廠批號', '國際批號', '公斤', '包數',
-                        '進貨', '領用', previous_month_key, '*月**日 庫存'
-                    ]
+                        # 排除所有基本欄位，只保留日期相關欄位和其他特殊欄位
+                        basic_field_names = [
+                            '品號', '品名', '工廠批號', '國際批號', '公斤', '包數',
+                            '進貨', '領用', previous_month_key, '*月**日 庫存'
+                        ]
                     
-                    # 定義允許的動態欄位模式（更嚴格）
-                    allowed_dynamic_patterns = [
-                        r'^\d+/\d+掛\d+/\d+帳_',  # 10/31掛11/1帳_入庫
-                        r'^\d+/\d+_',  # 11/1_入庫, 11/1_領用, 11/1_轉出
-                        r'^盤盈虧\(外賣\)_',  # 盤盈虧(外賣)_入庫
-                        r'^小計_',  # 小計_入庫, 小計_領用, 小計_轉出
-                        r'^領用_小計$',  # 領用_小計
-                        r'^\*月\*\*日 庫存_after$',  # *月**日 庫存_after
-                        r'^包數_after$',  # 包數_after
-                    ]
+                        # 定義允許的動態欄位模式（更嚴格）
+                        allowed_dynamic_patterns = [
+                            r'^\d+/\d+掛\d+/\d+帳_',  # 10/31掛11/1帳_入庫
+                            r'^\d+/\d+_',  # 11/1_入庫, 11/1_領用, 11/1_轉出
+                            r'^盤盈虧\(外賣\)_',  # 盤盈虧(外賣)_入庫
+                            r'^小計_',  # 小計_入庫, 小計_領用, 小計_轉出
+                            r'^領用_小計$',  # 領用_小計
+                            r'^\*月\*\*日 庫存_after$',  # *月**日 庫存_after
+                            r'^包數_after$',  # 包數_after
+                        ]
                     
-                    # 明確排除的欄位
-                    excluded_fields = {
-                        '待處理', '外賣', '盤盈虧(外賣)',  # 這些欄位不應該存在
-                    }
+                        # 明確排除的欄位
+                        excluded_fields = {
+                            '待處理', '外賣', '盤盈虧(外賣)',  # 這些欄位不應該存在
+                        }
+                    
+                        # 排除所有月份庫存欄位（除了當前動態產生的）
+                        for key in list(row_data.keys()):
+                            if re.match(r'^\d+月\s*庫存$', key) and key != previous_month_key:
+                                excluded_fields.add(key)
                     
-                    # 排除所有月份庫存欄位（除了當前動態產生的）
-                    for key in list(row_data.keys()):
-                        if re.match(r'^\d+月\s*庫存$', key) and key != previous_month_key:
-                            excluded_fields.add(key)
+                        # 產生正確的日期動態欄位名稱（根據檔名）
+                        days_in_month = calendar.monthrange(file_year, file_month)[1]
+                        correct_date_fields = {}
                     
-                    # 產生正確的日期動態欄位名稱（根據檔名）
-                    days_in_month = calendar.monthrange(file_year, file_month)[1]
-                    correct_date_fields = {}
+                        # 產生本月日期欄位
+                        for day in range(1, days_in_month + 1):
+                            for t in ['入庫', '領用', '轉出']:
+                                correct_key = f"{file_month}/{day}_{t}"
+                                # 尋找對應的原始欄位（可能是任何日期的欄位）
+                                for original_key, original_value in row_data.items():
+                                    if re.match(r'^\d+/\d+_' + t + '$', original_key):
+                                        correct_date_fields[correct_key] = original_value
+                                        break
                     
-                    # 產生本月日期欄位
-                    for day in range(1, days_in_month + 1):
+                        # 產生跨月欄位（前一月最後一天掛本月1日帳）
+                        prev_month = (file_month - 1) % 12 or 12
+                        prev_month_year = file_year if file_month > 1 else file_year - 1
+                        prev_month_last_day = calendar.monthrange(prev_month_year, prev_month)[1]
                         for t in ['入庫', '領用', '轉出']:
-                            correct_key = f"{file_month}/{day}_{t}"
-                            # 尋找對應的原始欄位（可能是任何日期的欄位）
+                            correct_key = f"{prev_month}/{prev_month_last_day}掛{file_month}/1帳_{t}"
+                            # 尋找對應的原始跨月欄位
                             for original_key, original_value in row_data.items():
-                                if re.match(r'^\d+/\d+_' + t + '$', original_key):
+                                if re.match(r'^\d+/\d+掛\d+/\d+帳_' + t + '$', original_key):
                                     correct_date_fields[correct_key] = original_value
                                     break
                     
-                    # 產生跨月欄位（前一月最後一天掛本月1日帳）
-                    prev_month = (file_month - 1) % 12 or 12
-                    prev_month_year = file_year if file_month > 1 else file_year - 1
-                    prev_month_last_day = calendar.monthrange(prev_month_year, prev_month)[1]
-                    for t in ['入庫', '領用', '轉出']:
-                        correct_key = f"{prev_month}/{prev_month_last_day}掛{file_month}/1帳_{t}"
-                        # 尋找對應的原始跨月欄位
-                        for original_key, original_value in row_data.items():
-                            if re.match(r'^\d+/\d+掛\d+/\d+帳_' + t + '$', original_key):
-                                correct_date_fields[correct_key] = original_value
-                                break
-                    
-                    for key, value in row_data.items():
-                        # 跳過基本欄位和明確排除的欄位
-                        if key in basic_field_names or key in excluded_fields:
-                            continue
+                        for key, value in row_data.items():
+                            # 跳過基本欄位和明確排除的欄位
+                            if key in basic_field_names or key in excluded_fields:
+                                continue
                             
-                        # 檢查是否為允許的動態欄位
-                        is_allowed = False
-                        for pattern in allowed_dynamic_patterns:
-                            if re.match(pattern, key):
-                                is_allowed = True
-                                break
+                            # 檢查是否為允許的動態欄位
+                            is_allowed = False
+                            for pattern in allowed_dynamic_patterns:
+                                if re.match(pattern, key):
+                                    is_allowed = True
+                                    break
                         
-                        if is_allowed:
-                            # 如果是日期相關欄位，使用正確的欄位名稱
-                            if re.match(r'^\d+/\d+', key) or re.match(r'^\d+/\d+掛\d+/\d+帳_', key):
-                                # 日期欄位已經在 correct_date_fields 中處理
-                                continue
-                            else:
-                                # 非日期欄位，直接使用
-                                if is_numeric_field(key):
-                                    dynamic_fields[key] = float(value) if value is not None else None
+                            if is_allowed:
+                                # 如果是日期相關欄位，使用正確的欄位名稱
+                                if re.match(r'^\d+/\d+', key) or re.match(r'^\d+/\d+掛\d+/\d+帳_', key):
+                                    # 日期欄位已經在 correct_date_fields 中處理
+                                    continue
                                 else:
-                                    dynamic_fields[key] = str(value) if value is not None else None
+                                    # 非日期欄位，直接使用
+                                    if is_numeric_field(key):
+                                        dynamic_fields[key] = float(value) if value is not None else None
+                                    else:
+                                        dynamic_fields[key] = str(value) if value is not None else None
                     
-                    # 將正確的日期欄位加入動態欄位
-                    for correct_key, value in correct_date_fields.items():
-                        if is_numeric_field(correct_key):
-                            dynamic_fields[correct_key] = float(value) if value is not None else None
-                        else:
-                            dynamic_fields[correct_key] = str(value) if value is not None else None
+                        # 將正確的日期欄位加入動態欄位
+                        for correct_key, value in correct_date_fields.items():
+                            if is_numeric_field(correct_key):
+                                dynamic_fields[correct_key] = float(value) if value is not None else None
+                            else:
+                                dynamic_fields[correct_key] = str(value) if value is not None else None
                     
-                    # 調試輸出
-                    print(f"動態欄位數量: {len(dynamic_fields)}")
-                    if dynamic_fields:
-                        print(f"動態欄位範例: {list(dynamic_fields.items())[:3]}")
+                        # 調試輸出
+                        print(f"動態欄位數量: {len(dynamic_fields)}")
+                        if dynamic_fields:
+                            print(f"動態欄位範例: {list(dynamic_fields.items())[:3]}")
                     
-                    # 建立記錄（包含動態欄位）
-                    record = RawMaterialWarehouseRecord.objects.create(
-                        **basic_fields,
-                        dynamic_fields=dynamic_fields
-                    )
+                        # 建立記錄（包含動態欄位）
+                        record = RawMaterialWarehouseRecord.objects.create(
+                            **basic_fields,
+                            dynamic_fields=dynamic_fields
+                        )
                     
-                    created_records.append(record)
-                    print(f"成功創建記錄: {record.product_code} - {record.product_name}")
+                        created_records.append(record)
+                        print(f"成功創建記錄: {record.product_code} - {record.product_name}")
                     
-                    # 創建關聯記錄
-                    UploadRecordRelation.objects.create(
-                        upload_record=upload_record,
-                        content_type='raw_material',
-                        object_id=record.id
-                    )
+                        # 創建關聯記錄
+                        UploadRecordRelation.objects.create(
+                            upload_record=upload_record,
+                            content_type='raw_material',
+                            object_id=record.id
+                        )
                     
-                except Exception as e:
-                    print(f"處理第 {row_count} 行時發生錯誤: {str(e)}")
-                    continue
+                    except Exception as e:
+                        print(f"處理第 {row_count} 行時發生錯誤: {str(e)}")
+                        failed_rows += 1
+                        continue
             
-            print(f"總共處理了 {row_count} 行，跳過了 {skipped_rows} 行，成功創建了 {len(created_records)} 筆記錄")
+                print(f"總共處理了 {row_count} 行，跳過了 {skipped_rows} 行，成功創建了 {len(created_records)} 筆記錄")
             
-            # 更新上傳記錄狀態
-            upload_record.status = 'success'
-            upload_record.records_count = len(created_records)
-            upload_record.created_record_ids = [str(record.id) for record in created_records]
-            upload_record.save()
+                # 更新上傳記錄狀態
+                upload_record.status = 'success'
+                upload_record.records_count = len(created_records)
+                upload_record.created_record_ids = [str(record.id) for record in created_records]
+                apply_upload_stats(upload_record, compute_raw_material_upload_stats(
+                    created_records, rejected_rows=skipped_rows + failed_rows
+                ))
+                upload_record.save()
         
-        # 記錄用戶活動（在事務外）
-        try:
-            log_user_activity(
-                request.user,
-                'upload',
-                f'上傳原料倉管理檔案: {uploaded_file.name}',
-                request=request,
-                details={'records_count': len(created_records)}
-            )
-        except Exception as e:
-            print(f"記錄用戶活動失敗: {e}")
+            # 記錄用戶活動（在事務外）
+            try:
+                log_user_activity(
+                    request.user,
+                    'upload',
+                    f'上傳原料倉管理檔案: {uploaded_file.name}',
+                    request=request,
+                    details={'records_count': len(created_records)}
+                )
+            except Exception as e:
+                print(f"記錄用戶活動失敗: {e}")
         
-        return JsonResponse({
-            'success': True,
-            'message': f'檔案上傳成功！共處理了 {len(created_records)} 筆記錄',
-            'records_count': len(created_records)
-        })
+            return JsonResponse({
+                'success': True,
+                'message': f'檔案上傳成功！共處理了 {len(created_records)} 筆記錄',
+                'records_count': len(created_records)
+            })
         
     except Exception as e:
         return JsonResponse({
@@ -2117,39 +2216,7 @@ def raw_material_upload_file(request):
 @require_raw_material_permission('view')
 def get_raw_material_upload_records(request):
     """獲取原料倉上傳記錄列表（用於AJAX刷新）"""
-    try:
-        # 獲取所有原料倉上傳記錄
-        recent_uploads = FileUploadRecord.objects.filter(
-            file_type='raw_material'
-        ).order_by('-upload_time')
-        
-        upload_data = []
-        for upload in recent_uploads:
-            upload_data.append({
-                'id': str(upload.id),
-                'file_name': upload.file_name,
-                'file_size': upload.file_size,
-                'file_hash': upload.file_hash,
-                'upload_time': upload.upload_time.strftime('%Y-%m-%d %H:%M'),
-                'uploaded_by': upload.uploaded_by.username if upload.uploaded_by else '未知',
-                'records_count': upload.records_count or 0,
-                'status': upload.status,
-                'status_display': upload.get_status_display(),
-                'error_message': upload.error_message,
-                'can_delete': upload.uploaded_by == request.user or request.user.is_superuser
-            })
-        
-        return JsonResponse({
-            'success': True,
-            'uploads': upload_data,
-            'total_count': len(upload_data)
-        })
-        
-    except Exception as e:
-        return JsonResponse({
-            'success': False,
-            'message': f'獲取上傳記錄時發生錯誤: {str(e)}'
-        }, status=500)
+    return _upload_records_response(request, 'raw_material')
 
 
 @require_raw_material_permission('delete')
@@ -2170,7 +2237,7 @@ def delete_raw_material_upload_record(request, upload_id):
         file_name = upload_record.file_name
         upload_id_str = str(upload_record.id)
         
-        with transaction.atomic():
+        with transaction.atomic(), rollup_batch():
             # 刪除相關的原料倉記錄
             relations = UploadRecordRelation.objects.filter(upload_record=upload_record)
             deleted_records = 0